@@ -0,0 +1,86 @@
+"""
+Benchmark: DataFrame from fetchall() row tuples (current dfquery path) vs. typed column buffers filled batch by batch
+(dfquery(columnar=True) / arrow_query).
+
+Rows are generated in memory with the same shape and PG type codes a cursor would return, so no database is needed.
+
+Usage:
+    python -m benchmarks.bench_columnar_fetch --rows 1000000 --batch-size 20000
+"""
+import argparse
+import datetime
+import resource
+import subprocess
+import sys
+import time
+
+import pandas as pd
+
+from pysqldb3.util import PG, arrow_type_from_type_code, rows_to_arrow_arrays, arrow_table_from_chunks
+
+# name, PG type OID
+DESCRIPTION = [('id', 20), ('borough', 1043), ('injured', 23), ('speed', 701), ('crash_date', 1082),
+               ('crash_time', 1114)]
+
+
+def make_row(i):
+    d = datetime.datetime(2020, 1, 1) + datetime.timedelta(minutes=i)
+    return i, 'BOROUGH {}'.format(i % 5), i % 7, i * 0.5, d.date(), d
+
+
+def fetch_batches(rows, batch_size):
+    for start in range(0, rows, batch_size):
+        yield [make_row(i) for i in range(start, min(start + batch_size, rows))]
+
+
+def current_path(rows, batch_size):
+    # cur.fetchall() then pd.DataFrame(list of tuples)
+    data = [r for batch in fetch_batches(rows, batch_size) for r in batch]
+    return pd.DataFrame(data, columns=[d[0] for d in DESCRIPTION])
+
+
+def columnar_path(rows, batch_size):
+    types = [arrow_type_from_type_code(d[1], PG) for d in DESCRIPTION]
+    column_chunks = [list() for _ in DESCRIPTION]
+    for batch in fetch_batches(rows, batch_size):
+        for i, arr in enumerate(rows_to_arrow_arrays(batch, types)):
+            column_chunks[i].append(arr)
+    return arrow_table_from_chunks(column_chunks, [d[0] for d in DESCRIPTION]).to_pandas()
+
+
+PATHS = {'current': current_path, 'columnar': columnar_path}
+
+
+def run_path(name, rows, batch_size):
+    """
+    Runs one path and prints its row. Each path runs in its own process so peak RSS (which includes Arrow's own
+    allocator) is not shared between them.
+    """
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    df = PATHS[name](rows, batch_size)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline
+    print('{:<10} {:>10.2f} {:>14.1f}  {}'.format(name, elapsed, peak / 1024,
+                                                  ', '.join(str(t) for t in df.dtypes)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--batch-size', type=int, default=20000)
+    parser.add_argument('--path', choices=list(PATHS))
+    args = parser.parse_args()
+
+    if args.path:
+        run_path(args.path, args.rows, args.batch_size)
+        return
+
+    print('{:<10} {:>10} {:>14}  dtypes'.format('path', 'seconds', 'peak MB'))
+    for name in PATHS:
+        subprocess.run([sys.executable, '-m', 'benchmarks.bench_columnar_fetch', '--rows', str(args.rows),
+                        '--batch-size', str(args.batch_size), '--path', name], check=True)
+
+
+if __name__ == '__main__':
+    main()
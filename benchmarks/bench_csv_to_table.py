@@ -0,0 +1,91 @@
+"""
+Benchmark: DbConnect.csv_to_table with one worker vs. the file split into parts loaded at the same time
+(workers=N), each on its own connection.
+
+The csv has integer, float, text (with quotes, commas and line breaks) and date columns and is written to a temporary
+folder first. Only parts of at least 16 MB get their own worker, so use enough --rows for the file to be split (about
+250,000 rows per part). Connection parameters are read from the [DEFAULT DATABASE] section of config.cfg unless
+passed. Needs a database the user can create tables in.
+
+Usage:
+    python -m benchmarks.bench_csv_to_table --type PG --server host --database db --user me --schema working
+        --rows 2000000 --workers 8 --batch-size 50000
+"""
+import argparse
+import getpass
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from pysqldb3.pysqldb3 import DbConnect
+
+TABLE = 'bench_csv_to_table_{}'
+
+
+def write_csv(path, rows):
+    """
+    :param path: csv file path
+    :param rows: number of rows
+    :return: file size in bytes
+    """
+    i = np.arange(rows)
+    pd.DataFrame({
+        'id': i,
+        'speed': i * 0.5,
+        'street': ["O'BRIEN AVE, \"{}\"\nREAR".format(n % 100) if n % 7 else None for n in i],
+        'crash_date': (pd.Timestamp('2020-01-01') + pd.to_timedelta(i % 1000, unit='D')).strftime('%Y-%m-%d')
+    }).to_csv(path, index=False)
+    return os.path.getsize(path)
+
+
+def load(db, path, schema, table, workers, batch_size):
+    """
+    Loads the csv into a new table
+    :return: seconds spent, including type inference
+    """
+    start = time.perf_counter()
+    db.csv_to_table(input_file=path, schema=schema, table=table, overwrite=True, workers=workers,
+                    batch_size=batch_size)
+    elapsed = time.perf_counter() - start
+
+    db.drop_table(schema=schema, table=table)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--type')
+    parser.add_argument('--server')
+    parser.add_argument('--database')
+    parser.add_argument('--user')
+    parser.add_argument('--password')
+    parser.add_argument('--schema')
+    parser.add_argument('--rows', type=int, default=2000000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--batch-size', type=int, default=50000)
+    args = parser.parse_args()
+
+    db = DbConnect(type=args.type, server=args.server, database=args.database, user=args.user,
+                   password=args.password, default=not args.server, quiet=True)
+    schema = args.schema or db.default_schema
+    table = TABLE.format(getpass.getuser().lower())
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'bench.csv')
+        size = write_csv(path, args.rows)
+        results = [(w, load(db, path, schema, table, w, args.batch_size)) for w in (1, args.workers)]
+
+    print('{:<10} {:>10} {:>10} {:>12} {:>10}'.format('workers', 'rows', 'seconds', 'rows/s', 'MB/s'))
+    for workers, seconds in results:
+        print('{:<10} {:>10} {:>10.2f} {:>12.0f} {:>10.1f}'.format(workers, args.rows, seconds, args.rows / seconds,
+                                                                   size / 1e6 / seconds))
+    print('speedup: {:.1f}x'.format(results[0][1] / results[1][1]))
+
+    db.disconnect(quiet=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark: DbConnect.dataframe_to_table row-by-row INSERTs (bulk=False) vs. the bulk path (bulk=True: COPY FROM STDIN
+on PG, executemany batches on MS, fast_executemany on Azure).
+
+The frame has integer, float, text (with quotes, commas and NULLs) and timestamp columns. The row-by-row path is only
+run on the first --slow-rows rows since it takes about a round trip and a commit per row; rows/s is compared.
+Connection parameters are read from the [DEFAULT DATABASE] section of config.cfg unless passed. Needs a database the
+user can create tables in.
+
+Usage:
+    python -m benchmarks.bench_dataframe_to_table --type PG --server host --database db --user me --schema working
+        --rows 100000 --slow-rows 2000 --batch-size 10000
+"""
+import argparse
+import getpass
+import time
+
+import numpy as np
+import pandas as pd
+
+from pysqldb3.pysqldb3 import DbConnect
+
+TABLE = 'bench_dataframe_to_table_{}'
+
+
+def make_frame(rows):
+    """
+    :param rows: number of rows
+    :return: Pandas DataFrame
+    """
+    i = np.arange(rows)
+    return pd.DataFrame({
+        'id': i,
+        'speed': i * 0.5,
+        'street': ["O'BRIEN AVE, \"{}\"".format(n % 100) if n % 7 else None for n in i],
+        'crash_date': pd.Timestamp('2020-01-01') + pd.to_timedelta(i, unit='m')
+    })
+
+
+def load(db, df, schema, table, bulk, batch_size):
+    """
+    Creates the table and loads the frame into it
+    :return: seconds spent adding the rows (table creation excluded)
+    """
+    table_schema = db.dataframe_to_table_schema(df.head(1), table, schema=schema, overwrite=True, temp=True)
+
+    start = time.perf_counter()
+    db.dataframe_to_table(df, table, table_schema=table_schema, schema=schema, bulk=bulk, batch_size=batch_size)
+    elapsed = time.perf_counter() - start
+
+    db.drop_table(schema=schema, table=table)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--type')
+    parser.add_argument('--server')
+    parser.add_argument('--database')
+    parser.add_argument('--user')
+    parser.add_argument('--password')
+    parser.add_argument('--schema')
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--slow-rows', type=int, default=2000)
+    parser.add_argument('--batch-size', type=int, default=10000)
+    args = parser.parse_args()
+
+    db = DbConnect(type=args.type, server=args.server, database=args.database, user=args.user,
+                   password=args.password, default=not args.server, quiet=True)
+    schema = args.schema or db.default_schema
+    table = TABLE.format(getpass.getuser().lower())
+    df = make_frame(args.rows)
+
+    results = [
+        ('row by row', args.slow_rows, load(db, df.head(args.slow_rows), schema, table, False, args.batch_size)),
+        ('bulk', args.rows, load(db, df, schema, table, True, args.batch_size))
+    ]
+
+    print('{:<12} {:>10} {:>10} {:>12}'.format('path', 'rows', 'seconds', 'rows/s'))
+    for name, rows, seconds in results:
+        print('{:<12} {:>10} {:>10.2f} {:>12.0f}'.format(name, rows, seconds, rows / seconds))
+    print('speedup: {:.0f}x'.format((results[1][1] / results[1][2]) / (results[0][1] / results[0][2])))
+
+    db.disconnect(quiet=True)
+
+
+if __name__ == '__main__':
+    main()
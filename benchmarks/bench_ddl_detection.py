@@ -0,0 +1,94 @@
+"""
+Benchmark: the new/dropped/renamed table detection that Query runs after every non-internal statement
+(query_creates_table, query_drops_table, query_renames_table).
+
+The corpus is every query string in the test suite: the DDL cases in tests/test_query_*_table.py and test_drop_table.py,
+plus the strings passed to db.query/dfquery across the other tests (mostly plain SELECTs). Placeholders in f-strings
+are filled with a dummy name. No database is needed.
+
+Usage:
+    python -m benchmarks.bench_ddl_detection --repeat 20
+"""
+import argparse
+import ast
+import glob
+import os
+import time
+
+from pysqldb3.query import Query
+from pysqldb3.util import PG, MS
+
+TEST_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'pysqldb3', 'tests')
+QUERY_CALLS = {'query', 'dfquery', 'query_creates_table', 'query_drops_table', 'query_renames_table'}
+
+
+def string_value(node):
+    """
+    Returns the text of a string constant or f-string node, or None
+    """
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if isinstance(node, ast.JoinedStr):
+        return ''.join(string_value(v) or 'x' for v in node.values)
+    return None
+
+
+def load_corpus():
+    """
+    Collects query strings from the test modules
+    :return: (list of DDL test strings, list of other query strings)
+    """
+    ddl, other = list(), list()
+
+    for path in sorted(glob.glob(os.path.join(TEST_DIR, 'test_*.py'))):
+        is_ddl = os.path.basename(path).startswith(('test_query_creates', 'test_query_drops', 'test_query_renames',
+                                                    'test_drop_table'))
+        with open(path) as f:
+            tree = ast.parse(f.read())
+
+        for node in ast.walk(tree):
+            value = None
+            if isinstance(node, ast.Assign) and any(isinstance(t, ast.Name) and t.id == 'query_string'
+                                                    for t in node.targets):
+                value = string_value(node.value)
+            elif isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and \
+                    node.func.attr in QUERY_CALLS and node.args:
+                value = string_value(node.args[0])
+
+            if value and value.strip():
+                (ddl if is_ddl else other).append(value)
+
+    return ddl, other
+
+
+def detect(query_string, db_type):
+    Query.query_renames_table(query_string, 'dbo', db_type)
+    Query.query_creates_table(query_string, 'dbo', db_type)
+    Query.query_drops_table(query_string, db_type)
+
+
+def time_corpus(corpus, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for q in corpus:
+            detect(q, PG)
+            detect(q, MS)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    ddl, other = load_corpus()
+    print('{:<12} {:>8} {:>10} {:>14}'.format('corpus', 'queries', 'seconds', 'us per query'))
+    for name, corpus in (('ddl', ddl), ('other', other), ('all', ddl + other)):
+        elapsed = time_corpus(corpus, args.repeat)
+        # Each query is checked once for PG and once for MS
+        per_query = elapsed / (len(corpus) * args.repeat * 2) * 1e6
+        print('{:<12} {:>8} {:>10.3f} {:>14.1f}'.format(name, len(corpus), elapsed, per_query))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark: time to import pysqldb3 in a fresh interpreter, and a check that optional dependencies (plotly, openpyxl,
+pyarrow.csv, pyarrow.compute, pyodbc, pymssql, tqdm, shapely) are only loaded when the features that need them are used.
+
+Each run is a separate `python -X importtime` process, so nothing is shared between runs. config.cfg is not read or
+written by the import. No database is needed.
+
+Usage:
+    python -m benchmarks.bench_import_time --repeat 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULE = 'pysqldb3.pysqldb3'
+
+# Imported on first use by query_to_map, xls/csv loading, geometry conversion and the SQL Server/Azure connections
+LAZY_MODULES = ('plotly', 'openpyxl', 'pyarrow.csv', 'pyarrow.compute', 'pyodbc', 'pymssql', 'tqdm', 'shapely')
+
+
+def import_once(module):
+    """
+    Imports a module in a new interpreter
+    :param module: module name
+    :return: (cumulative import seconds, set of module names imported)
+    """
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import {}'.format(module)], cwd=ROOT,
+                         stderr=subprocess.PIPE, stdout=subprocess.DEVNULL, universal_newlines=True, check=True).stderr
+
+    seconds, imported = None, set()
+    for line in out.splitlines():
+        if not line.startswith('import time:') or line.endswith('| package'):
+            continue
+        _, cumulative, name = line.split('|')
+        imported.add(name.strip())
+        if name.strip() == module:
+            seconds = int(cumulative) / 1e6
+    return seconds, imported
+
+
+def loaded(module, imported):
+    """
+    :param module: module name
+    :param imported: set of module names imported
+    :return: bool, True if module or any of its submodules was imported
+    """
+    return any(n == module or n.startswith(module + '.') for n in imported)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    times, imported = list(), set()
+    for _ in range(args.repeat):
+        seconds, names = import_once(MODULE)
+        times.append(seconds)
+        imported |= names
+
+    print('{:<20} {:>8} {:>10} {:>10}'.format('module', 'runs', 'median s', 'min s'))
+    print('{:<20} {:>8} {:>10.3f} {:>10.3f}'.format(MODULE, args.repeat, statistics.median(times), min(times)))
+
+    # Some pandas versions load one of these themselves (ex. pandas 3 imports pyarrow.compute), which pysqldb3 can't
+    # defer
+    _, by_pandas = import_once('pandas')
+    by_pandas = [m for m in LAZY_MODULES if loaded(m, by_pandas)]
+    if by_pandas:
+        print('Imported by pandas: {}'.format(', '.join(by_pandas)))
+
+    eager = [m for m in LAZY_MODULES if loaded(m, imported) and m not in by_pandas]
+    if eager:
+        print('Imported eagerly: {}'.format(', '.join(eager)))
+        sys.exit(1)
+    print('Optional dependencies not imported: {}'.format(', '.join(m for m in LAZY_MODULES if m not in by_pandas)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark: DbConnect.xls_to_table streaming an xlsx sheet a row at a time vs. the pandas path (the whole sheet read
+into a DataFrame first, then written to a temporary csv for ogr2ogr). Passing a read_excel option (engine='openpyxl')
+sends the same file down the pandas path.
+
+The sheet has integer, float, text and datetime columns and is written to a temporary folder first. Peak Python memory
+is measured with tracemalloc, which slows both paths about the same. Connection parameters are read from the
+[DEFAULT DATABASE] section of config.cfg unless passed. Needs a database the user can create tables in, and ogr2ogr
+for the pandas path.
+
+Usage:
+    python -m benchmarks.bench_xls_to_table --type PG --server host --database db --user me --schema working
+        --rows 200000 --batch-size 10000
+"""
+import argparse
+import datetime
+import getpass
+import os
+import tempfile
+import time
+import tracemalloc
+
+import openpyxl
+
+from pysqldb3.pysqldb3 import DbConnect
+
+TABLE = 'bench_xls_to_table_{}'
+
+
+def write_xlsx(path, rows):
+    """
+    :param path: xlsx file path
+    :param rows: number of rows
+    :return: file size in bytes
+    """
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(['id', 'speed', 'street', 'crash_date'])
+    for n in range(rows):
+        ws.append([n, n * 0.5, "O'BRIEN AVE, \"{}\"".format(n % 100) if n % 7 else None,
+                   datetime.datetime(2020, 1, 1) + datetime.timedelta(minutes=n)])
+    wb.save(path)
+    return os.path.getsize(path)
+
+
+def load(db, path, schema, table, batch_size, **kwargs):
+    """
+    Loads the sheet into a new table
+    :return: (seconds spent, peak traced memory in MB)
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    db.xls_to_table(input_file=path, schema=schema, table=table, overwrite=True, batch_size=batch_size, **kwargs)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+
+    db.drop_table(schema=schema, table=table)
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--type')
+    parser.add_argument('--server')
+    parser.add_argument('--database')
+    parser.add_argument('--user')
+    parser.add_argument('--password')
+    parser.add_argument('--schema')
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--batch-size', type=int, default=10000)
+    args = parser.parse_args()
+
+    db = DbConnect(type=args.type, server=args.server, database=args.database, user=args.user,
+                   password=args.password, default=not args.server, quiet=True)
+    schema = args.schema or db.default_schema
+    table = TABLE.format(getpass.getuser().lower())
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'bench.xlsx')
+        size = write_xlsx(path, args.rows)
+        results = [
+            ('pandas', ) + load(db, path, schema, table, args.batch_size, engine='openpyxl'),
+            ('streaming', ) + load(db, path, schema, table, args.batch_size)
+        ]
+
+    print('file: {:.1f} MB, {} rows'.format(size / 1e6, args.rows))
+    print('{:<10} {:>10} {:>12} {:>12}'.format('path', 'seconds', 'rows/s', 'peak MB'))
+    for name, seconds, peak in results:
+        print('{:<10} {:>10.2f} {:>12.0f} {:>12.1f}'.format(name, seconds, args.rows / seconds, peak))
+    print('speedup: {:.1f}x'.format(results[0][1] / results[1][1]))
+
+    db.disconnect(quiet=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,4 @@
 import os
-import pyodbc
 import re
 from collections import defaultdict
 from dataclasses import dataclass
@@ -40,6 +39,8 @@ class SqlDriver:
 
     @staticmethod
     def get_drivers():
+        import pyodbc
+
         odbc_drivers = list()
         native_drivers = list()
         if 'ODBC Driver' not in pyodbc.drivers():
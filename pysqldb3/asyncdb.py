@@ -0,0 +1,187 @@
+import asyncio
+import concurrent.futures
+
+from .pysqldb3 import DbConnect
+
+_DONE = object()
+
+
+class AsyncDbConnect:
+    """
+    asyncio wrapper around DbConnect. Calls run on a bounded thread pool, each on its own worker DbConnect, so many
+    queries can be awaited at once without starting a thread per call. Workers are ordinary DbConnects: new, dropped and
+    renamed tables are detected, granted, commented and logged exactly as they are for DbConnect.query.
+    """
+
+    def __str__(self):
+        return 'Async database connection ({t}) to {d} on {s} - user: {u} - {w} workers (max {m})'.format(
+            t=self.db.type, d=self.db.database, s=self.db.server, u=self.db.user, w=len(self.workers),
+            m=self.max_workers)
+
+    def __init__(self, max_workers=10, **kwargs):
+        """
+        :param max_workers: maximum number of queries running at once (threads and worker DbConnects)
+        :param kwargs: DbConnect parameters. The first DbConnect is created here (and will prompt for any missing
+        credentials); the other workers inherit its connection parameters and each opens its own connection. With
+        pooled=True the workers share a connection pool, sized max_workers unless pool_max_size is set.
+        """
+        if kwargs.get('pooled'):
+            kwargs.setdefault('pool_max_size', max_workers)
+
+        self.max_workers = max_workers
+        self.kwargs = kwargs
+        self.db = DbConnect(**kwargs)
+
+        # Other initialized variables
+        self.workers = [self.db]
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers,
+                                                              thread_name_prefix='pysqldb3_async')
+        self.__idle = [self.db]
+        self.__slots = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    @property
+    def tables_created(self):
+        """
+        :return: list of tables created by all workers
+        """
+        return [t for w in self.workers for t in w.tables_created]
+
+    @property
+    def tables_dropped(self):
+        """
+        :return: list of tables dropped by all workers
+        """
+        return [t for w in self.workers for t in w.tables_dropped]
+
+    def __new_worker(self):
+        # type: (AsyncDbConnect) -> DbConnect
+        """
+        Creates another worker DbConnect with the same connection parameters
+        :return: DbConnect
+        """
+        kwargs = dict(self.kwargs)
+        kwargs['quiet'] = True
+        # Log cleanup and reconciliation are left to the first DbConnect, as with DbConnect.__clone
+        kwargs.update(cleanup=False, log_reconcile_every=None, log_reconcile_seconds=None,
+                      log_reconcile_on_disconnect=False)
+        for k in ('user', 'password', 'type', 'server', 'database', 'ldap', 'default'):
+            kwargs.pop(k, None)
+        worker = DbConnect(inherits_from=self.db, **kwargs)
+        self.workers.append(worker)
+        return worker
+
+    async def __run(self, fn, *args, **kwargs):
+        """
+        Runs fn on the executor
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, lambda: fn(*args, **kwargs))
+
+    async def __acquire(self):
+        # type: (AsyncDbConnect) -> DbConnect
+        """
+        Waits for a free worker slot and returns an idle worker, creating one if none are idle
+        :return: DbConnect
+        """
+        if self.__slots is None:
+            self.__slots = asyncio.Semaphore(self.max_workers)
+
+        await self.__slots.acquire()
+        if self.__idle:
+            return self.__idle.pop()
+
+        try:
+            return await self.__run(self.__new_worker)
+        except BaseException:
+            self.__slots.release()
+            raise
+
+    def __release(self, worker):
+        self.__idle.append(worker)
+        self.__slots.release()
+
+    async def __call(self, method, *args, **kwargs):
+        """
+        Runs a DbConnect method on a free worker
+        """
+        worker = await self.__acquire()
+        try:
+            return await self.__run(getattr(worker, method), *args, **kwargs)
+        finally:
+            self.__release(worker)
+
+    async def query(self, query, **kwargs):
+        """
+        Awaitable DbConnect.query; takes the same parameters
+        :param query: String sql query to be run
+        :return: None or Pandas DataFrame if return_df=True
+        """
+        return await self.__call('query', query, **kwargs)
+
+    async def dfquery(self, query, **kwargs):
+        """
+        Awaitable DbConnect.dfquery; takes the same parameters except chunksize (use iter_query)
+        :param query: String sql query to be run
+        :return: Pandas DataFrame
+        """
+        if kwargs.get('chunksize'):
+            raise ValueError('Use iter_query(as_df=True) to stream DataFrames with AsyncDbConnect.')
+        return await self.__call('dfquery', query, **kwargs)
+
+    async def table_exists(self, table, **kwargs):
+        """
+        Awaitable DbConnect.table_exists; takes the same parameters
+        :param table: table name
+        :return: bool
+        """
+        return await self.__call('table_exists', table, **kwargs)
+
+    async def iter_query(self, query, batch_size=20000, strict=True, internal=False, as_df=False, timeout=None):
+        """
+        Async generator version of DbConnect.iter_query. One worker is held until the iteration finishes or is closed.
+        :param query: String sql query to be run
+        :param batch_size: Number of rows per batch; defaults to 20,000
+        :param strict: If true will run sys.exit on failed query attempts
+        :param internal: Boolean flag for internal processes
+        :param as_df: If true yields Pandas DataFrames instead of lists of rows
+        :param timeout: seconds the query may run before it is cancelled (see DbConnect.iter_query)
+        :return: async generator of lists of rows or DataFrames
+        """
+        worker = await self.__acquire()
+        batches = worker.iter_query(query, batch_size=batch_size, strict=strict, internal=internal, as_df=as_df,
+                                    timeout=timeout)
+        try:
+            while True:
+                batch = await self.__run(next, batches, _DONE)
+                if batch is _DONE:
+                    break
+                yield batch
+        finally:
+            # Closes the cursor and commits/disconnects on the worker's thread pool
+            await self.__run(batches.close)
+            self.__release(worker)
+
+    def cancel(self):
+        """
+        Cancels the queries running on every worker (see DbConnect.cancel). Safe to call from any thread.
+        :return: number of queries a cancel request was sent for
+        """
+        return sum(worker.cancel() for worker in list(self.workers))
+
+    async def close(self):
+        """
+        Disconnects every worker and stops the thread pool
+        :return: None
+        """
+        for worker in self.workers:
+            if worker.pool:
+                await self.__run(worker.close_pool)
+            elif worker.conn:
+                await self.__run(worker.disconnect, True)
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,48 @@
+class QueryBatch:
+    """
+    Statements collected by DbConnect.batch and sent together when the batch ends. Consecutive calls with the same
+    parameterized statement are merged into one group and run with executemany-style bulk execution.
+    """
+
+    def __str__(self):
+        return 'Query batch - {g} groups, {s} statements'.format(g=len(self.batches), s=self.statement_count())
+
+    def __init__(self):
+        # List of [sql, param_rows]; param_rows is None for plain statements
+        self.batches = list()
+
+    def __len__(self):
+        return len(self.batches)
+
+    def statement_count(self):
+        """
+        :return: number of statements the batch will run (each parameter row counts as one)
+        """
+        return sum(1 if rows is None else len(rows) for _, rows in self.batches)
+
+    def __add_rows(self, sql, rows):
+        if self.batches and self.batches[-1][0] == sql and self.batches[-1][1] is not None:
+            self.batches[-1][1].extend(rows)
+        else:
+            self.batches.append([sql, list(rows)])
+
+    def query(self, sql, params=None):
+        """
+        Adds a statement to the batch
+        :param sql: sql statement; uses the driver's placeholders (%s for PG and MS, ? for Azure) if params is given
+        :param params: tuple of parameters, or None for a plain statement
+        :return: None
+        """
+        if params is None:
+            self.batches.append([sql, None])
+        else:
+            self.__add_rows(sql, [params])
+
+    def execute_many(self, sql, param_rows):
+        """
+        Adds a statement to run once per parameter row
+        :param sql: sql statement with the driver's placeholders
+        :param param_rows: iterable of parameter tuples
+        :return: None
+        """
+        self.__add_rows(sql, param_rows)
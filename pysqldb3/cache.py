@@ -0,0 +1,200 @@
+import collections
+import re
+import threading
+import time
+
+# Quoted string literals are kept as-is when normalizing; whitespace outside of them is collapsed
+RE_LITERAL_OR_SPACE = re.compile(r"('(?:[^']|'')*')|(\s+)")
+
+# Statements that can change data or the catalog are never cached
+RE_WRITES = re.compile(r'\b(insert|update|delete|merge|truncate|create|drop|alter|grant|revoke|exec|execute|call|copy|'
+                       r'into|sp_rename|nextval|setval)\b', re.IGNORECASE)
+
+RE_DDL = re.compile(r'\b(create|drop|alter|truncate|sp_rename)\b', re.IGNORECASE)
+
+RE_TABLE_REFERENCE = re.compile(r"""
+    \b(?:from|join|into|update|table|truncate)\s+
+    ((?:(?:\[[^\]]+\]|"[^"]+"|[\w$\#]+)\s*\.\s*){0,3}     # server.db.schema. 0-3 times
+    (?:\[[^\]]+\]|"[^"]+"|[\w$\#]+))                     # table
+""", re.VERBOSE | re.IGNORECASE)
+
+RE_CATALOG = re.compile(r'\b(information_schema|pg_catalog|sys)\s*\.|\bpg_\w+', re.IGNORECASE)
+
+CachedResult = collections.namedtuple('CachedResult', ['data', 'data_description', 'data_columns', 'tables',
+                                                       'catalog', 'stored_at'])
+
+
+def normalize_sql(query_string):
+    """
+    Normalizes a query for use in a cache key: collapses whitespace outside of string literals and drops a trailing ;
+    :param query_string: sql query
+    :return: str
+    """
+    normalized = RE_LITERAL_OR_SPACE.sub(lambda m: m.group(1) or ' ', query_string).strip()
+    return normalized.rstrip(';').strip()
+
+
+def is_cacheable(query_string):
+    """
+    Only plain SELECT / WITH ... SELECT statements that do not write anything are cached
+    :param query_string: sql query
+    :return: bool
+    """
+    start = query_string.lstrip().lower()
+    if not (start.startswith('select') or start.startswith('with')):
+        return False
+    return not RE_WRITES.search(query_string)
+
+
+def is_ddl(query_string):
+    """
+    Checks for statements that can change the catalog (and so any cached catalog lookups)
+    :param query_string: sql query
+    :return: bool
+    """
+    return bool(RE_DDL.search(query_string))
+
+
+def touches_catalog(query_string):
+    """
+    Checks if a query reads catalog views (information_schema, pg_catalog, sys)
+    :param query_string: sql query
+    :return: bool
+    """
+    return bool(RE_CATALOG.search(query_string))
+
+
+def table_name(table):
+    """
+    Standardizes a table reference to the bare, lower case table name used to match cache entries. Schema and database
+    are ignored, so invalidation errs on the side of dropping too much.
+    :param table: (server, database, schema, table) tuple or dotted table string
+    :return: str
+    """
+    if isinstance(table, (tuple, list)):
+        table = table[-1] or ''
+    else:
+        table = table.split('.')[-1]
+    return table.strip().strip('[]"').lower()
+
+
+def referenced_tables(query_string):
+    """
+    Gets the tables a query reads from or writes to
+    :param query_string: sql query
+    :return: set of table names (see table_name)
+    """
+    return {table_name(''.join(m.split())) for m in RE_TABLE_REFERENCE.findall(query_string)}
+
+
+class ResultCache:
+    """
+    LRU + TTL cache of query results for use by DbConnect. Entries are dropped when they are older than ttl seconds,
+    when max_entries is reached (least recently used first) or when a query changes one of the tables they read.
+    """
+
+    def __str__(self):
+        return 'Result cache - {e} entries (max {m}, ttl {t}s), {h} hits, {mi} misses'.format(
+            e=len(self.entries), m=self.max_entries, t=self.ttl, h=self.hits, mi=self.misses)
+
+    def __init__(self, max_entries=256, ttl=300):
+        """
+        :param max_entries: maximum number of cached results
+        :param ttl: seconds a result stays valid; None to only expire on LRU eviction and invalidation
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+        # Other initialized variables
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.__lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        """
+        Gets a cached result, counting a hit or a miss
+        :param key: cache key
+        :return: CachedResult or None
+        """
+        with self.__lock:
+            entry = self.entries.get(key)
+
+            if entry is not None and self.ttl is not None and time.monotonic() - entry.stored_at > self.ttl:
+                del self.entries[key]
+                self.evictions += 1
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, query_string, data, data_description, data_columns):
+        """
+        Stores a query result
+        :param key: cache key
+        :param query_string: sql query, used to find the tables the result depends on
+        :param data: list of rows
+        :param data_description: cursor description
+        :param data_columns: list of column names
+        :return: None
+        """
+        entry = CachedResult(list(data), data_description, data_columns, referenced_tables(query_string),
+                             touches_catalog(query_string), time.monotonic())
+
+        with self.__lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, tables, catalog=False):
+        """
+        Drops every cached result that reads from one of the tables
+        :param tables: iterable of table references (see table_name)
+        :param catalog: if True, also drops results that read catalog views
+        :return: number of results dropped
+        """
+        names = {table_name(t) for t in tables if t}
+        if not names and not catalog:
+            return 0
+
+        with self.__lock:
+            stale = [k for k, e in self.entries.items() if (catalog and e.catalog) or e.tables & names]
+            for k in stale:
+                del self.entries[k]
+            self.invalidations += len(stale)
+        return len(stale)
+
+    def clear(self):
+        """
+        Drops every cached result; counters are kept
+        :return: None
+        """
+        with self.__lock:
+            self.entries.clear()
+
+    def stats(self):
+        """
+        :return: dict of hits, misses, hit_rate, entries, evictions and invalidations
+        """
+        with self.__lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self.entries),
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
@@ -0,0 +1,208 @@
+import re
+import threading
+import time
+
+from .util import get_unique_table_schema_string
+
+IDENTIFIER = r'(?:\[[^\]]+\]|"[^"]+"|[\w$\#]+)'
+
+# Tables and views created, dropped or altered by a statement
+RE_DDL_TARGET = re.compile(r"""
+    \b(?:create|drop|alter)\s+
+    (?:(?:or\s+replace|global|local|temp|temporary|unlogged|materialized|foreign)\s+)*
+    (?:table|view)\s+(?:if\s+(?:not\s+)?exists\s+)?
+    ((?:{i}\s*\.\s*){{0,3}}{i})
+""".format(i=IDENTIFIER), re.VERBOSE | re.IGNORECASE)
+
+# Statements whose targets can't be read from the query; every snapshot is dropped when they run
+RE_DDL_UNKNOWN = re.compile(r'\b(sp_rename|create\s+type|drop\s+type|alter\s+type)\b', re.IGNORECASE)
+
+RE_SCHEMA_DDL = re.compile(r'\b(?:create|drop|alter)\s+schema\b', re.IGNORECASE)
+
+
+def ddl_schemas(query_string, default_schema, db_type):
+    """
+    Gets the schemas whose tables or columns a query can change
+    :param query_string: sql query
+    :param default_schema: schema used for unqualified tables
+    :param db_type: Type of DB
+    :return: set of schema names, or None if they can't be determined (all schemas should be treated as changed)
+    """
+    if RE_DDL_UNKNOWN.search(query_string):
+        return None
+
+    schemas = set()
+    for target in RE_DDL_TARGET.findall(query_string):
+        parts = [p.strip() for p in target.split('.')]
+        schemas.add(get_unique_table_schema_string(parts[-2], db_type) if len(parts) > 1 else default_schema)
+    return schemas
+
+
+def changes_schemas(query_string):
+    """
+    Checks if a query creates, drops or alters a schema
+    :param query_string: sql query
+    :return: bool
+    """
+    return bool(RE_SCHEMA_DDL.search(query_string))
+
+
+class CatalogCache:
+    """
+    In-process snapshot of the database catalog for use by DbConnect. Each schema's tables and columns are loaded with
+    one query the first time they are looked up and answered from a dict afterwards. Snapshots are dropped when they
+    are older than ttl seconds, when a query run through the DbConnect changes the schema, or on refresh.
+    """
+
+    def __str__(self):
+        return 'Catalog cache - {s} schemas (ttl {t}s), {h} hits, {m} misses'.format(
+            s=len(self.schemas), t=self.ttl, h=self.hits, m=self.misses)
+
+    def __init__(self, ttl=300, case_sensitive=True):
+        """
+        :param ttl: seconds a snapshot stays valid; None to only drop snapshots on invalidation and refresh
+        :param case_sensitive: False matches schema and table names case insensitively (SQL Server's default collation)
+        """
+        self.ttl = ttl
+        self.case_sensitive = case_sensitive
+
+        # Other initialized variables
+        self.schemas = dict()
+        self.schema_list = None
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.invalidations = 0
+        self.__lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.schemas)
+
+    def key(self, name):
+        """
+        Standardizes a schema or table name for lookups
+        :param name: schema or table name as stored by the database
+        :return: str
+        """
+        if name is None:
+            return None
+        return name if self.case_sensitive else name.lower()
+
+    def __expired(self, loaded_at):
+        return self.ttl is not None and time.monotonic() - loaded_at > self.ttl
+
+    def get(self, schema):
+        """
+        Gets a schema's snapshot, counting a hit or a miss
+        :param schema: schema name
+        :return: dict of {table key: list of (column name, data type)} or None if the schema isn't loaded
+        """
+        with self.__lock:
+            entry = self.schemas.get(self.key(schema))
+
+            if entry is not None and self.__expired(entry[1]):
+                del self.schemas[self.key(schema)]
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            return entry[0]
+
+    def load(self, schema, rows):
+        """
+        Stores a schema's snapshot
+        :param schema: schema name
+        :param rows: (table name, column name, data type) rows, ordered by table and column position. Tables without
+        columns have None column names.
+        :return: dict of {table key: list of (column name, data type)}
+        """
+        tables = dict()
+        for table, column, data_type in rows:
+            columns = tables.setdefault(self.key(table), list())
+            if column is not None:
+                columns.append((column, data_type))
+
+        with self.__lock:
+            self.schemas[self.key(schema)] = (tables, time.monotonic())
+            self.loads += 1
+        return tables
+
+    def get_schemas(self):
+        """
+        Gets the cached list of schemas, counting a hit or a miss
+        :return: list of schema names or None
+        """
+        with self.__lock:
+            if self.schema_list is not None and self.__expired(self.schema_list[1]):
+                self.schema_list = None
+
+            if self.schema_list is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            return list(self.schema_list[0])
+
+    def load_schemas(self, schemas):
+        """
+        Stores the list of schemas
+        :param schemas: list of schema names
+        :return: None
+        """
+        with self.__lock:
+            self.schema_list = (list(schemas), time.monotonic())
+            self.loads += 1
+
+    def invalidate(self, schemas=None, schema_list=False):
+        """
+        Drops the snapshots of schemas changed by a query
+        :param schemas: iterable of schema names; None drops every snapshot
+        :param schema_list: if True, also drops the list of schemas
+        :return: number of snapshots dropped
+        """
+        with self.__lock:
+            if schemas is None:
+                stale = list(self.schemas)
+            else:
+                stale = [k for k in {self.key(s) for s in schemas if s} if k in self.schemas]
+
+            for k in stale:
+                del self.schemas[k]
+            if schema_list and self.schema_list is not None:
+                self.schema_list = None
+                stale.append(None)
+
+            self.invalidations += len(stale)
+        return len(stale)
+
+    def refresh(self, schema=None):
+        """
+        Drops cached catalog data so it is reloaded on the next lookup. Use after tables are changed outside of the
+        DbConnect.
+        :param schema: only drop this schema's snapshot; defaults to dropping everything, including the list of schemas
+        :return: None
+        """
+        with self.__lock:
+            if schema is None:
+                self.schemas.clear()
+                self.schema_list = None
+            else:
+                self.schemas.pop(self.key(schema), None)
+
+    def stats(self):
+        """
+        :return: dict of hits, misses, hit_rate, schemas, loads and invalidations
+        """
+        with self.__lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'schemas': len(self.schemas),
+                'loads': self.loads,
+                'invalidations': self.invalidations
+            }
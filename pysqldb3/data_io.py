@@ -56,7 +56,7 @@ def pg_to_sql(pg, ms, org_table, LDAP=False, spatial=True, org_schema=None, dest
             spatial=spatial,
             dest_name=dest_table,
             nlt_spatial=nlt_spatial,
-            gdal_data=GDAL_DATA_LOC
+            gdal_data=get_gdal_data_loc()
         )
     else:
         cmd = PG_TO_SQL_CMD.format(
@@ -75,7 +75,7 @@ def pg_to_sql(pg, ms, org_table, LDAP=False, spatial=True, org_schema=None, dest
             spatial=spatial,
             dest_name=dest_table,
             nlt_spatial=nlt_spatial,
-            gdal_data=GDAL_DATA_LOC
+            gdal_data=get_gdal_data_loc()
         )
 
     if print_cmd:
@@ -145,7 +145,7 @@ def pg_to_sql_qry(pg, ms, query, LDAP=False, spatial=True, dest_schema=None, des
             spatial=spatial,
             dest_name=dest_table,
             nlt_spatial=nlt_spatial,
-            gdal_data=GDAL_DATA_LOC
+            gdal_data=get_gdal_data_loc()
         )
     else:
         cmd = PG_TO_SQL_QRY_CMD.format(
@@ -163,7 +163,7 @@ def pg_to_sql_qry(pg, ms, query, LDAP=False, spatial=True, dest_schema=None, des
             spatial=spatial,
             dest_name=dest_table,
             nlt_spatial=nlt_spatial,
-            gdal_data=GDAL_DATA_LOC
+            gdal_data=get_gdal_data_loc()
         )
 
     if print_cmd:
@@ -237,7 +237,7 @@ def sql_to_pg_qry(ms, pg, query, LDAP=False, spatial=True, dest_schema=None, pri
             spatial=spatial,
             table_name=dest_table,
             nlt_spatial=nlt_spatial,
-            gdal_data=GDAL_DATA_LOC
+            gdal_data=get_gdal_data_loc()
         )
     else:
         cmd = SQL_TO_PG_QRY_CMD.format(
@@ -256,7 +256,7 @@ def sql_to_pg_qry(ms, pg, query, LDAP=False, spatial=True, dest_schema=None, pri
             spatial=spatial,
             table_name=dest_table,
             nlt_spatial=nlt_spatial,
-            gdal_data=GDAL_DATA_LOC
+            gdal_data=get_gdal_data_loc()
         )
 
     if print_cmd:
@@ -286,7 +286,7 @@ def sql_to_pg_qry(ms, pg, query, LDAP=False, spatial=True, dest_schema=None, pri
 
 
 def sql_to_pg(ms, pg, org_table, LDAP=False, spatial=True, org_schema=None, dest_schema=None, print_cmd=False,
-              dest_table=None, temp=True, gdal_data_loc=GDAL_DATA_LOC, pg_encoding='UTF8', permission = True):
+              dest_table=None, temp=True, gdal_data_loc=None, pg_encoding='UTF8', permission = True):
     """
     Migrates tables from SQL Server to PostgreSQL, generates spatial tables in PG if spatial in MS.
 
@@ -323,7 +323,7 @@ def sql_to_pg(ms, pg, org_table, LDAP=False, spatial=True, org_schema=None, dest
 
     if LDAP:
         cmd = SQL_TO_PG_LDAP_CMD.format(
-            gdal_data=gdal_data_loc,
+            gdal_data=get_gdal_data_loc(gdal_data_loc),
             ms_pass='',
             ms_user='',
             pg_pass=pg.password,
@@ -344,7 +344,7 @@ def sql_to_pg(ms, pg, org_table, LDAP=False, spatial=True, org_schema=None, dest
         )
     else:
         cmd = SQL_TO_PG_CMD.format(
-            gdal_data=gdal_data_loc,
+            gdal_data=get_gdal_data_loc(gdal_data_loc),
             ms_pass=ms.password,
             ms_user=ms.user,
             pg_pass=pg.password,
@@ -391,7 +391,7 @@ def sql_to_pg(ms, pg, org_table, LDAP=False, spatial=True, org_schema=None, dest
 
 
 def sql_to_sql_qry(from_sql, to_sql, qry, LDAP_from=False, LDAP_to=False, spatial=True, org_schema=None, dest_schema=None,
-                   print_cmd=False, dest_table=None, temp=True, gdal_data_loc=GDAL_DATA_LOC, pg_encoding='UTF8', permission = False):
+                   print_cmd=False, dest_table=None, temp=True, gdal_data_loc=None, pg_encoding='UTF8', permission = False):
     """
     Migrates tables from one SQL Server database to another SQL Server database.
 
@@ -442,7 +442,7 @@ def sql_to_sql_qry(from_sql, to_sql, qry, LDAP_from=False, LDAP_to=False, spatia
         to_password = to_sql.password
         
     cmd = SQL_TO_SQL_CMD.format(
-        gdal_data=gdal_data_loc,
+        gdal_data=get_gdal_data_loc(gdal_data_loc),
         from_server=from_sql.server,
         from_database=from_sql.database,
         from_user=from_user,
@@ -487,7 +487,7 @@ def sql_to_sql_qry(from_sql, to_sql, qry, LDAP_from=False, LDAP_to=False, spatia
 
 
 def sql_to_sql(from_sql, to_sql, org_table, LDAP_from=False, LDAP_to=False, spatial=True, org_schema=None, dest_schema=None,
-               print_cmd=False, dest_table=None, temp=True, gdal_data_loc=GDAL_DATA_LOC, pg_encoding='UTF8', permission = False):
+               print_cmd=False, dest_table=None, temp=True, gdal_data_loc=None, pg_encoding='UTF8', permission = False):
     """
     Migrates tables from one SQL Server database to another SQL Server database.
 
@@ -588,7 +588,7 @@ def pg_to_pg(from_pg, to_pg, org_table, org_schema=None, dest_schema=None, print
         from_pg_table=org_table,
         to_pg_name=dest_table,
         nlt_spatial=nlt_spatial,
-        gdal_data=GDAL_DATA_LOC
+        gdal_data=get_gdal_data_loc()
     )
 
     if print_cmd:
@@ -664,7 +664,7 @@ def pg_to_pg_qry(from_pg, to_pg, query, dest_schema=None, print_cmd=False, dest_
         to_pg_schema=dest_schema,
         to_pg_name=dest_table,
         nlt_spatial=nlt_spatial,
-        gdal_data=GDAL_DATA_LOC
+        gdal_data=get_gdal_data_loc()
     )
 
     if print_cmd:
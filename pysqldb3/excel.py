@@ -0,0 +1,104 @@
+import datetime
+
+# Excel's error values (#N/A, #DIV/0!, ...) are read as missing, as pandas reads them
+ERROR_CELL = 'e'
+
+
+def excel_cell_text(value):
+    """
+    Text of an xlsx cell value as it is staged: whole-number floats as ints (as pandas reads them), dates and times
+    as ISO strings and everything else as str
+    :param value: cell value read by openpyxl
+    :return: str or None
+    """
+    if value is None:
+        return None
+    elif isinstance(value, float):
+        return str(int(value)) if value.is_integer() else repr(value)
+    elif isinstance(value, datetime.datetime):
+        return value.isoformat(sep=' ')
+    elif isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return str(value)
+
+
+class XlsxSheet:
+    """
+    One worksheet of an xlsx file, read a row at a time with openpyxl's read-only mode so memory use doesn't grow with
+    the sheet. The workbook is opened once for the sheet names, the header and the rows.
+
+    The first non-blank row is the header; its cells name the columns (as pandas names them: blank cells become
+    "Unnamed: <n>" and repeated names get a ".<n>" suffix) and cells past the last named column are not read.
+    Blank rows are skipped.
+    """
+
+    def __str__(self):
+        return 'Xlsx sheet - {f}: {s}'.format(f=self.input_file, s=self.sheet.title)
+
+    def __init__(self, input_file, sheet_name=0):
+        """
+        :param input_file: File path to xlsx file
+        :param sheet_name: sheet name or position; defaults to the first sheet
+        """
+        import openpyxl
+
+        self.input_file = input_file
+        self.workbook = openpyxl.load_workbook(input_file, read_only=True, data_only=True)
+        self.sheet_names = self.workbook.sheetnames
+
+        try:
+            self.sheet = self.workbook[sheet_name if isinstance(sheet_name, str) else
+                                       self.sheet_names[sheet_name or 0]]
+        except (KeyError, IndexError):
+            self.close()
+            raise ValueError(f'Worksheet {sheet_name} not found in {input_file}')
+
+        self.rows = self.sheet.iter_rows()
+        header = next((row for row in map(self.__values, self.rows) if any(v is not None for v in row)), ())
+
+        while header and header[-1] is None:
+            header = header[:-1]
+
+        self.columns = list()
+        for i, name in enumerate(header):
+            name = f'Unnamed: {i}' if name is None else name
+            column, n = name, 0
+            while column in self.columns:
+                n += 1
+                column = f'{name}.{n}'
+            self.columns.append(column)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @staticmethod
+    def __values(row):
+        return tuple(None if cell.data_type == ERROR_CELL else excel_cell_text(cell.value) for cell in row)
+
+    def batches(self, batch_size=10000):
+        """
+        Reads the rows after the header
+        :param batch_size: rows per batch
+        :return: generator of lists of up to batch_size tuples of str or None, one per column
+        """
+        width = len(self.columns)
+        batch = list()
+
+        for row in self.rows:
+            values = self.__values(row[:width])
+            if all(v is None for v in values):
+                continue
+
+            batch.append(values + (None,) * (width - len(values)))
+            if len(batch) == batch_size:
+                yield batch
+                batch = list()
+
+        if batch:
+            yield batch
+
+    def close(self):
+        self.workbook.close()
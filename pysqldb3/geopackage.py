@@ -96,7 +96,7 @@ class Geopackage:
         return gpkg_tbl_exists
 
 
-    def write_gpkg(self, dbo, table = None, schema = None, query = None, gpkg_tbl = None, srid='2263', gdal_data_loc=GDAL_DATA_LOC, cmd = None, overwrite = False, print_cmd=False):
+    def write_gpkg(self, dbo, table = None, schema = None, query = None, gpkg_tbl = None, srid='2263', gdal_data_loc=None, cmd = None, overwrite = False, print_cmd=False):
         
         """
         Converts a SQL or Postgresql query to a new geopackage.
@@ -192,7 +192,7 @@ class Geopackage:
                                                    _overwrite = _overwrite,
                                                    _update = _update,
                                                    srid=srid,
-                                                   gdal_data=gdal_data_loc)
+                                                   gdal_data=get_gdal_data_loc(gdal_data_loc))
             elif dbo.type == 'MS':
                 if dbo.LDAP:
                     cmd = WRITE_GPKG_CMD_MS.replace(";UID={username};PWD={password}", "").format(
@@ -206,7 +206,7 @@ class Geopackage:
                         _update = _update,
                         tbl_name = table,
                         srid=srid,
-                        gdal_data=gdal_data_loc
+                        gdal_data=get_gdal_data_loc(gdal_data_loc)
                     )
                 else:
                     cmd = WRITE_GPKG_CMD_MS.format(export_path=self.path,
@@ -221,7 +221,7 @@ class Geopackage:
                                                        _update = _update,
                                                        tbl_name = table,
                                                        srid=srid,
-                                                       gdal_data=gdal_data_loc)
+                                                       gdal_data=get_gdal_data_loc(gdal_data_loc))
 
         if print_cmd:
             print(print_cmd_string([dbo.password], cmd))
@@ -378,7 +378,7 @@ class Geopackage:
 
         return
 
-    def read_gpkg(self, dbo, table = None, gpkg_tbl = None, schema = None, port = 5432, srid = '2263', gdal_data_loc=GDAL_DATA_LOC,
+    def read_gpkg(self, dbo, table = None, gpkg_tbl = None, schema = None, port = 5432, srid = '2263', gdal_data_loc=None,
                     precision=False, private=False, gpkg_encoding=None, print_cmd=False):
         """
         Reads a single geopackage table into SQL or Postgresql as a table
@@ -430,7 +430,7 @@ class Geopackage:
 
         if dbo.type == 'PG':
             cmd = READ_GPKG_CMD_PG.format(
-                gdal_data=gdal_data_loc,
+                gdal_data=get_gdal_data_loc(gdal_data_loc),
                 srid=srid,
                 host=dbo.server,
                 dbname=dbo.database,
@@ -446,7 +446,7 @@ class Geopackage:
         elif dbo.type == 'MS':
             if dbo.LDAP:
                 cmd = READ_GPKG_CMD_MS.format(
-                    gdal_data=gdal_data_loc,
+                    gdal_data=get_gdal_data_loc(gdal_data_loc),
                     srid=srid,
                     host=dbo.server,
                     dbname=dbo.database,
@@ -461,7 +461,7 @@ class Geopackage:
 
             else:
                 cmd = READ_GPKG_CMD_MS.format(
-                    gdal_data=gdal_data_loc,
+                    gdal_data=get_gdal_data_loc(gdal_data_loc),
                     srid=srid,
                     host=dbo.server,
                     dbname=dbo.database,
@@ -513,7 +513,7 @@ class Geopackage:
         rename_geom(dbo, schema, table)
 
 
-    def read_gpkg_bulk(self, dbo, schema = None, port = 5432, srid = '2263', gdal_data_loc=GDAL_DATA_LOC,
+    def read_gpkg_bulk(self, dbo, schema = None, port = 5432, srid = '2263', gdal_data_loc=None,
                     precision=False, private=False, gpkg_encoding=None, print_cmd=False):
 
         """
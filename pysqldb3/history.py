@@ -0,0 +1,171 @@
+import collections
+import copy
+import pickle
+import tempfile
+import threading
+
+HISTORY_KEEP_ALL = 'all'
+HISTORY_KEEP_LAST = 'last'
+HISTORY_SPILL = 'spill'
+HISTORY_DATA_MODES = (HISTORY_KEEP_ALL, HISTORY_KEEP_LAST, HISTORY_SPILL)
+
+
+class QueryHistory:
+    """
+    List-like record of the Query objects run by a DbConnect (DbConnect.queries / DbConnect.internal_queries).
+    Bounds how much of the history stays in memory:
+        max_size keeps only the most recent max_size queries (ring buffer)
+        data_mode 'all' keeps every query's result data (original behavior)
+        data_mode 'last' keeps result data only on the most recent query; older entries keep their metadata
+        data_mode 'spill' writes older queries' result data to a temp file and reads it back when the entry is accessed
+    """
+
+    def __str__(self):
+        return 'Query history - {n} queries (max {m}), data mode {d}'.format(
+            n=len(self.entries), m=self.max_size or 'unbounded', d=self.data_mode)
+
+    def __init__(self, max_size=None, data_mode=HISTORY_KEEP_ALL):
+        """
+        :param max_size: maximum number of queries kept; None keeps every query
+        :param data_mode: 'all', 'last' or 'spill' (see class docstring)
+        """
+        if data_mode not in HISTORY_DATA_MODES:
+            raise ValueError('Invalid history data mode {}. Use one of {}.'.format(data_mode, HISTORY_DATA_MODES))
+
+        self.max_size = max_size
+        self.data_mode = data_mode
+
+        # Other initialized variables
+        # Each entry is [Query, (offset, length) of its spilled data or None]
+        self.entries = collections.deque(maxlen=max_size)
+        self.spill_file = None
+        # Bytes of the spill file held by queries still in the history, and by queries evicted from it
+        self.spilled_bytes = 0
+        self.evicted_bytes = 0
+        self.__lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        with self.__lock:
+            entries = list(self.entries)
+        for entry in entries:
+            yield self.__materialize(entry)
+
+    def __getitem__(self, index):
+        with self.__lock:
+            if isinstance(index, slice):
+                entries = list(self.entries)[index]
+            else:
+                entries = [self.entries[index]]
+
+        if isinstance(index, slice):
+            return [self.__materialize(entry) for entry in entries]
+        return self.__materialize(entries[0])
+
+    def append(self, qry):
+        """
+        Adds a query to the history, releasing the previous query's data if the data mode requires it
+        :param qry: Query object
+        :return: None
+        """
+        with self.__lock:
+            if self.entries and len(self.entries) == self.entries.maxlen:
+                self.__evict(self.entries.popleft())
+            if self.entries and self.data_mode != HISTORY_KEEP_ALL:
+                self.__release(self.entries[-1])
+            self.entries.append([qry, None])
+
+    def __evict(self, entry):
+        """
+        Forgets the oldest query. Its spilled data is dead space in the spill file, which is compacted once it holds at
+        least as much dead data as live, so the file stays under twice the size of the data still in the history.
+        Caller holds the lock.
+        :param entry: history entry
+        :return: None
+        """
+        if entry[1] is None:
+            return
+
+        self.spilled_bytes -= entry[1][1]
+        self.evicted_bytes += entry[1][1]
+        if self.evicted_bytes >= self.spilled_bytes:
+            self.__compact()
+
+    def __compact(self):
+        """
+        Rewrites the spill file with only the data of queries still in the history. Caller holds the lock.
+        :return: None
+        """
+        spilled = [entry for entry in self.entries if entry[1] is not None]
+
+        if not spilled:
+            self.spill_file.seek(0)
+            self.spill_file.truncate()
+        else:
+            compacted = tempfile.TemporaryFile(prefix='pysqldb3_history_')
+            for entry in spilled:
+                offset, length = entry[1]
+                self.spill_file.seek(offset)
+                entry[1] = (compacted.tell(), length)
+                compacted.write(self.spill_file.read(length))
+            self.spill_file.close()
+            self.spill_file = compacted
+
+        self.evicted_bytes = 0
+
+    def __release(self, entry):
+        """
+        Drops a query's result data from memory, writing it to the spill file first in spill mode. Caller holds the lock.
+        :param entry: history entry
+        :return: None
+        """
+        qry = entry[0]
+        if qry.data is None:
+            return
+
+        if self.data_mode == HISTORY_SPILL:
+            if self.spill_file is None:
+                self.spill_file = tempfile.TemporaryFile(prefix='pysqldb3_history_')
+
+            payload = pickle.dumps([tuple(row) for row in qry.data], protocol=pickle.HIGHEST_PROTOCOL)
+            self.spill_file.seek(0, 2)
+            entry[1] = (self.spill_file.tell(), len(payload))
+            self.spill_file.write(payload)
+            self.spilled_bytes += len(payload)
+
+        qry.data = None
+
+    def __materialize(self, entry):
+        """
+        Returns the entry's Query; spilled data is read back into a copy so the history itself stays small
+        :param entry: history entry
+        :return: Query object
+        """
+        # The location is read under the lock, as compacting the spill file moves it
+        with self.__lock:
+            qry, location = entry
+            if location is None:
+                return qry
+
+            offset, length = location
+            self.spill_file.seek(offset)
+            payload = self.spill_file.read(length)
+
+        loaded = copy.copy(qry)
+        loaded.data = pickle.loads(payload)
+        return loaded
+
+    def clear(self):
+        """
+        Removes every query from the history and deletes the spill file
+        :return: None
+        """
+        with self.__lock:
+            self.entries.clear()
+            if self.spill_file is not None:
+                self.spill_file.close()
+                self.spill_file = None
+            self.spilled_bytes = 0
+            self.evicted_bytes = 0
@@ -0,0 +1,351 @@
+import concurrent.futures
+import contextlib
+
+import pandas as pd
+import pyarrow
+
+from .util import PG
+
+# Kinds of column, joined up the lattice as more values are seen:
+# null -> boolean -> text, null -> integer -> numeric -> text, null -> date -> timestamp -> text
+NULL = 'null'
+BOOLEAN = 'boolean'
+INTEGER = 'integer'
+NUMERIC = 'numeric'
+DATE = 'date'
+TIMESTAMP = 'timestamp'
+TEXT = 'text'
+
+SMALLINT_MIN, SMALLINT_MAX = -2 ** 15, 2 ** 15 - 1
+INT_MIN, INT_MAX = -2 ** 31, 2 ** 31 - 1
+BIGINT_MIN, BIGINT_MAX = -2 ** 63, 2 ** 63 - 1
+
+# Largest precision numeric/decimal takes on both PG and MS
+MAX_NUMERIC_PRECISION = 38
+
+# Regexes are RE2 (pyarrow.compute); each is matched against the whole value
+RE_BOOLEAN = r'\s*(?i:true|false)\s*'
+RE_INTEGER = r'\s*[+-]?\d+\s*'
+RE_NUMERIC = r'\s*[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?\s*'
+RE_NUMERIC_PARTS = r'^\s*[+-]?0*(?P<whole>\d*)(?:\.(?P<frac>\d*))?(?P<exp>[eE][+-]?\d+)?\s*$'
+RE_DATE_PART = (r'(?:\d{4}-(?:0?[1-9]|1[0-2])-(?:0?[1-9]|[12]\d|3[01])'
+                r'|(?:0?[1-9]|1[0-2])/(?:0?[1-9]|[12]\d|3[01])/(?:\d{4}|\d{2}))')
+RE_DATE = r'\s*' + RE_DATE_PART + r'\s*'
+RE_TIMESTAMP = r'\s*' + RE_DATE_PART + r'[ T]\d{1,2}:[0-5]\d(?::[0-5]\d(?:\.\d+)?)?\s*(?:[AaPp][Mm])?\s*'
+
+# SQL types used for the exact (tight) types, by database type
+TIGHT_TYPES = {
+    PG: {BOOLEAN: 'boolean', DATE: 'date', TIMESTAMP: 'timestamp', 'wide_numeric': 'numeric'},
+    'default': {BOOLEAN: 'bit', DATE: 'date', TIMESTAMP: 'datetime2', 'wide_numeric': 'float'}
+}
+
+
+def join_kinds(a, b):
+    """
+    Gets the most specific kind that holds values of both kinds
+    :param a: kind
+    :param b: kind
+    :return: kind
+    """
+    if a == b or b == NULL:
+        return a
+    if a == NULL:
+        return b
+    if {a, b} == {INTEGER, NUMERIC}:
+        return NUMERIC
+    if {a, b} == {DATE, TIMESTAMP}:
+        return TIMESTAMP
+    return TEXT
+
+
+def matches(values, pattern):
+    """
+    :param values: pyarrow string array with no nulls
+    :param pattern: regex the whole value must match
+    :return: pyarrow boolean array
+    """
+    import pyarrow.compute as pc
+
+    return pc.match_substring_regex(values, '^(?:' + pattern + ')$')
+
+
+class ColumnProfile:
+    """
+    Kind, value range, numeric precision and scale and longest value of one column, updated a chunk at a time so a
+    file of any size is profiled in one pass with memory for one chunk. Values are checked with pyarrow compute
+    kernels over the whole chunk rather than row by row.
+    """
+
+    def __str__(self):
+        return 'Column profile - {n}: {k} ({r} rows, {x} null, max length {m})'.format(
+            n=self.name, k=self.kind, r=self.rows, x=self.nulls, m=self.max_length)
+
+    def __init__(self, name):
+        """
+        :param name: column name as read from the file
+        """
+        self.name = name
+        self.kind = NULL
+        self.rows = 0
+        self.nulls = 0
+        self.max_length = 0
+        self.min_int = None
+        self.max_int = None
+        # Digits before and after the decimal point; exponent is True once a value like 1e5 (or a float) is seen
+        self.max_whole_digits = 0
+        self.max_scale = 0
+        self.exponent = False
+
+    def update(self, values):
+        """
+        Adds a chunk of the column
+        :param values: pandas Series or pyarrow array. Text columns (ex. read with dtype=str) are profiled value by
+        value; bool, int, float and datetime Series by their dtype.
+        :return: self
+        """
+        # Imported here, not with the module, as it adds noticeably to import time
+        import pyarrow.compute as pc
+
+        if isinstance(values, pd.Series) and not (pd.api.types.is_string_dtype(values.dtype) or
+                                                  values.dtype == object):
+            return self.__update_typed(values)
+
+        if isinstance(values, pd.Series):
+            values = pyarrow.array(values.where(values.isnull(), values.astype(str)), from_pandas=True)
+        if isinstance(values, pyarrow.ChunkedArray):
+            values = values.combine_chunks()
+        if not pyarrow.types.is_string(values.type) and not pyarrow.types.is_large_string(values.type):
+            values = pc.cast(values, pyarrow.string())
+
+        present = pc.drop_null(values)
+        self.rows += len(values)
+        self.nulls += len(values) - len(present)
+
+        if not len(present):
+            return self
+
+        self.max_length = max(self.max_length, pc.max(pc.utf8_length(present)).as_py())
+        self.kind = join_kinds(self.kind, self.__chunk_kind(present))
+        return self
+
+    def __update_typed(self, values):
+        present = values.dropna()
+        self.rows += len(values)
+        self.nulls += len(values) - len(present)
+
+        if present.empty:
+            return self
+
+        if pd.api.types.is_bool_dtype(present.dtype):
+            kind = BOOLEAN
+        elif pd.api.types.is_integer_dtype(present.dtype):
+            kind = INTEGER
+            self.__update_range(int(present.min()), int(present.max()))
+        elif pd.api.types.is_numeric_dtype(present.dtype):
+            # Floats are sent as their repr, so keep them float
+            kind = NUMERIC
+            self.exponent = True
+        elif pd.api.types.is_datetime64_any_dtype(present.dtype):
+            kind = DATE if (present.dt.normalize() == present).all() else TIMESTAMP
+        else:
+            kind = TEXT
+
+        self.max_length = max(self.max_length, int(present.astype(str).str.len().max()))
+        self.kind = join_kinds(self.kind, kind)
+        return self
+
+    def __update_range(self, low, high):
+        self.min_int = low if self.min_int is None else min(self.min_int, low)
+        self.max_int = high if self.max_int is None else max(self.max_int, high)
+        self.max_whole_digits = max(self.max_whole_digits, len(str(abs(low))), len(str(abs(high))))
+
+    def __update_integers(self, present):
+        import pyarrow.compute as pc
+
+        trimmed = pc.utf8_trim_whitespace(present)
+        digits = pc.utf8_length(pc.replace_substring_regex(trimmed, r'^[+-]?0*', ''))
+
+        # Up to 18 digits always fits int64; longer values are rare and converted one at a time
+        short = pc.less_equal(digits, 18)
+        ints = pc.cast(pc.replace_substring_regex(pc.filter(trimmed, short), r'^\+', ''), pyarrow.int64())
+        bounds = [int(v) for v in pc.filter(trimmed, pc.invert(short)).to_pylist()]
+        if len(ints):
+            min_max = pc.min_max(ints)
+            bounds += [min_max['min'].as_py(), min_max['max'].as_py()]
+        self.__update_range(min(bounds), max(bounds))
+
+    def __update_numerics(self, present):
+        import pyarrow.compute as pc
+
+        parts = pc.extract_regex(present, RE_NUMERIC_PARTS)
+        whole = pc.max(pc.utf8_length(pc.struct_field(parts, 'whole'))).as_py()
+        scale = pc.max(pc.utf8_length(pc.struct_field(parts, 'frac'))).as_py()
+        self.max_whole_digits = max(self.max_whole_digits, whole)
+        self.max_scale = max(self.max_scale, scale)
+        self.exponent = self.exponent or pc.any(pc.greater(pc.utf8_length(pc.struct_field(parts, 'exp')), 0)).as_py()
+
+    def __chunk_kind(self, present):
+        import pyarrow.compute as pc
+
+        # Only kinds that can still join to something other than text are checked
+        if self.kind in (NULL, BOOLEAN) and pc.all(matches(present, RE_BOOLEAN)).as_py():
+            return BOOLEAN
+
+        if self.kind in (NULL, INTEGER, NUMERIC):
+            if pc.all(matches(present, RE_INTEGER)).as_py():
+                self.__update_integers(present)
+                return INTEGER
+            if pc.all(matches(present, RE_NUMERIC)).as_py():
+                self.__update_numerics(present)
+                return NUMERIC
+
+        if self.kind in (NULL, DATE, TIMESTAMP):
+            dates = matches(present, RE_DATE)
+            if pc.all(dates).as_py():
+                return DATE
+            if pc.all(pc.or_(dates, matches(present, RE_TIMESTAMP))).as_py():
+                return TIMESTAMP
+
+        return TEXT
+
+    def merge(self, other):
+        """
+        Adds another profile of the same column (ex. of another part of the file)
+        :param other: ColumnProfile
+        :return: self
+        """
+        self.kind = join_kinds(self.kind, other.kind)
+        self.rows += other.rows
+        self.nulls += other.nulls
+        self.max_length = max(self.max_length, other.max_length)
+        if other.min_int is not None:
+            self.__update_range(other.min_int, other.max_int)
+        self.max_whole_digits = max(self.max_whole_digits, other.max_whole_digits)
+        self.max_scale = max(self.max_scale, other.max_scale)
+        self.exponent = self.exponent or other.exponent
+        return self
+
+    def fits_bigint(self):
+        """
+        :return: bool, True if every integer seen fits in a bigint
+        """
+        return self.min_int is None or (self.min_int >= BIGINT_MIN and self.max_int <= BIGINT_MAX)
+
+    def sql_type(self, varchar_length=500, tight=False, db_type=PG):
+        """
+        Gets the column's SQL type.
+
+        By default only integers and other numbers are typed (bigint and float) and everything else is varchar, as
+        pandas' read_csv would leave it. With tight=True the smallest type that holds every value is used: boolean,
+        smallint/int/bigint, numeric (precision, scale), date or timestamp, and varchar as long as the longest value.
+
+        :param varchar_length: Length for varchar columns; the most a tight varchar is given
+        :param tight: if True, uses the smallest type that holds every value seen
+        :param db_type: database type (PG, MS or AZURE); only used when tight=True
+        :return: String representing data type
+        """
+        if not tight:
+            if self.kind == INTEGER:
+                return 'bigint' if self.fits_bigint() else 'numeric'
+            elif self.kind == NUMERIC:
+                return 'float'
+            else:
+                return 'varchar ({})'.format(varchar_length)
+
+        types = TIGHT_TYPES.get(db_type, TIGHT_TYPES['default'])
+        precision = max(self.max_whole_digits + self.max_scale, 1)
+
+        if self.kind == BOOLEAN:
+            return types[BOOLEAN]
+        elif self.kind == INTEGER and self.min_int is not None:
+            if self.min_int >= SMALLINT_MIN and self.max_int <= SMALLINT_MAX:
+                return 'smallint'
+            elif self.min_int >= INT_MIN and self.max_int <= INT_MAX:
+                return 'int'
+            elif self.fits_bigint():
+                return 'bigint'
+        elif self.kind in (INTEGER, NUMERIC) and self.exponent:
+            return 'float'
+        elif self.kind in (DATE, TIMESTAMP):
+            return types[self.kind]
+
+        if self.kind in (INTEGER, NUMERIC):
+            if precision > MAX_NUMERIC_PRECISION:
+                return types['wide_numeric']
+            return 'numeric ({}, {})'.format(precision, self.max_scale)
+
+        return 'varchar ({})'.format(min(max(self.max_length, 1), varchar_length))
+
+
+def update_profiles(profiles, columns, executor=None):
+    """
+    Adds a chunk to each column's profile
+    :param profiles: list of ColumnProfile
+    :param columns: list of column chunks (pandas Series or pyarrow arrays), in the same order
+    :param executor: optional concurrent.futures executor to profile the columns in parallel. pyarrow releases the
+    GIL while matching, so threads help on wide files.
+    :return: None
+    """
+    if executor:
+        list(executor.map(lambda pair: pair[0].update(pair[1]), zip(profiles, columns)))
+    else:
+        for profile, values in zip(profiles, columns):
+            profile.update(values)
+
+
+def profile_csv(input_file, sep=',', chunksize=10000, workers=1, **kwargs):
+    """
+    Profiles every column of a csv in one pass, reading chunksize rows at a time
+    :param input_file: File path to csv file
+    :param sep: Separator for csv file
+    :param chunksize: rows held in memory at once
+    :param workers: number of threads profiling columns at once; defaults to 1
+    :param kwargs: parameters to pass to pandas for read csv (ex. skiprows=1)
+    :return: list of ColumnProfile, in file order
+    """
+    kwargs['dtype'] = str
+    profiles = None
+
+    pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers) if workers > 1 else contextlib.nullcontext()
+    with pool as executor:
+        with pd.read_csv(input_file, sep=sep, chunksize=chunksize, **kwargs) as reader:
+            for chunk in reader:
+                if profiles is None:
+                    profiles = [ColumnProfile(c) for c in chunk.columns]
+                update_profiles(profiles, [values for _, values in chunk.items()], executor=executor)
+
+    if profiles is None:
+        # Header only
+        profiles = [ColumnProfile(c) for c in pd.read_csv(input_file, sep=sep, nrows=0, **kwargs).columns]
+    return profiles
+
+
+def merge_profiles(profile_lists):
+    """
+    Merges the profiles of parts of one file
+    :param profile_lists: list of lists of ColumnProfile, one list per part, each in file order
+    :return: list of ColumnProfile, in file order
+    """
+    merged = None
+    for profiles in profile_lists:
+        if merged is None:
+            merged = list(profiles)
+        else:
+            for profile, other in zip(merged, profiles):
+                profile.merge(other)
+    return merged or list()
+
+
+def profile_dataframe(df, workers=1):
+    """
+    Profiles every column of a DataFrame
+    :param df: Pandas DataFrame
+    :param workers: number of threads profiling columns at once; defaults to 1
+    :return: list of ColumnProfile, in column order
+    """
+    profiles = [ColumnProfile(c) for c in df.columns]
+    pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers) if workers > 1 else contextlib.nullcontext()
+    with pool as executor:
+        update_profiles(profiles, [values for _, values in df.items()], executor=executor)
+    return profiles
+
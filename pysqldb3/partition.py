@@ -0,0 +1,120 @@
+import io
+import os
+
+# Parts smaller than this aren't worth their own worker and connection
+MIN_PARTITION_BYTES = 16 * 1024 ** 2
+
+# Bytes read at a time when looking for row boundaries
+SCAN_BLOCK_BYTES = 8 * 1024 ** 2
+
+
+class CsvPartition:
+    """
+    A newline-aligned byte range of a csv file. It is read back with the file's header line in front, so each
+    partition parses as a csv of its own.
+    """
+
+    def __str__(self):
+        return 'Csv partition - {f}: bytes {s} to {e}'.format(f=self.input_file, s=self.start, e=self.end)
+
+    def __init__(self, input_file, header, start, end):
+        """
+        :param input_file: File path to csv file
+        :param header: bytes of the header line, including its newline
+        :param start: offset of the first byte of the range
+        :param end: offset just past the last byte of the range
+        """
+        self.input_file = input_file
+        self.header = header
+        self.start = start
+        self.end = end
+
+    def __len__(self):
+        return self.end - self.start
+
+    def open(self):
+        """
+        :return: binary file object reading the header and then the range
+        """
+        return io.BufferedReader(_RangeReader(self.input_file, self.header, self.start, self.end))
+
+
+class _RangeReader(io.RawIOBase):
+    def __init__(self, input_file, header, start, end):
+        super().__init__()
+        self.file = open(input_file, 'rb')
+        self.file.seek(start)
+        self.header = header
+        self.remaining = end - start
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        if self.header:
+            n = min(len(b), len(self.header))
+            b[:n], self.header = self.header[:n], self.header[n:]
+            return n
+
+        data = self.file.read(min(len(b), self.remaining))
+        b[:len(data)] = data
+        self.remaining -= len(data)
+        return len(data)
+
+    def close(self):
+        self.file.close()
+        super().close()
+
+
+def csv_partitions(input_file, parts, quotechar='"', min_size=MIN_PARTITION_BYTES):
+    """
+    Splits a csv into up to parts newline-aligned byte ranges after its header line, in one sequential read. A
+    newline only ends a row when an even number of quotechars come before it, so quoted values with line breaks are
+    never split.
+
+    :param input_file: File path to csv file
+    :param parts: most partitions to return
+    :param quotechar: quote character of the file
+    :param min_size: smallest partition, in bytes; smaller files get fewer partitions
+    :return: list of CsvPartition, in file order; empty if the file has no row after the header
+    """
+    size = os.path.getsize(input_file)
+    parts = max(1, min(parts, size // max(min_size, 1)))
+    targets = [size * k // parts for k in range(1, parts)]
+    quote = quotechar.encode()
+
+    header_end, boundaries = None, list()
+    offset, quotes = 0, 0
+
+    with open(input_file, 'rb') as f:
+        while header_end is None or len(boundaries) < len(targets):
+            block = f.read(SCAN_BLOCK_BYTES)
+            if not block:
+                break
+
+            pos = 0
+            while header_end is None or len(boundaries) < len(targets):
+                search_from = pos if header_end is None else max(pos, targets[len(boundaries)] - offset)
+                newline = block.find(b'\n', search_from)
+                if newline == -1:
+                    break
+
+                if (quotes + block.count(quote, 0, newline)) % 2 == 0:
+                    if header_end is None:
+                        header_end = offset + newline + 1
+                    else:
+                        boundaries.append(offset + newline + 1)
+                pos = newline + 1
+
+            quotes += block.count(quote)
+            offset += len(block)
+
+        if header_end is None:
+            return list()
+
+        f.seek(0)
+        header = f.read(header_end)
+
+    starts = [header_end] + boundaries
+    ends = boundaries + [size]
+    return [CsvPartition(input_file, header, start, end) for start, end in zip(starts, ends) if end > start]
@@ -0,0 +1,346 @@
+import threading
+import time
+
+from .util import PG, MS
+
+_POOLS = dict()
+_POOLS_LOCK = threading.Lock()
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of warm database connections for use by DbConnect.
+    Connections are checked out to one thread/session at a time and returned with checkin.
+    """
+
+    def __str__(self):
+        return 'Connection pool ({t}) - {i} idle, {u} in use, max {m}'.format(
+            t=self.db_type, i=len(self.idle), u=len(self.in_use), m=self.max_size)
+
+    def __init__(self, connect_fn, db_type, min_size=1, max_size=5, idle_timeout=300, health_check_after=30,
+                 checkout_timeout=None):
+        """
+        :param connect_fn: function that opens and returns a new DB-API connection
+        :param db_type: database type (PG, MS, AZ)
+        :param min_size: number of connections kept open even when idle past idle_timeout
+        :param max_size: maximum number of open connections; checkout waits when all are in use
+        :param idle_timeout: seconds after which an idle connection above min_size is closed
+        :param health_check_after: an idle connection older than this (seconds) is pinged before reuse
+        :param checkout_timeout: seconds to wait for a free connection; waits forever if None
+        """
+        self.connect_fn = connect_fn
+        self.db_type = db_type
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_after = health_check_after
+        self.checkout_timeout = checkout_timeout
+
+        # Other initialized variables
+        self.idle = list()
+        self.in_use = dict()
+        self.opened = 0
+        self.closed = 0
+        self.reused = 0
+        self.__cond = threading.Condition()
+
+    @staticmethod
+    def is_closed(conn, db_type):
+        """
+        Checks the driver's own connection state without a round trip
+        :param conn: DB-API connection
+        :param db_type: database type (PG, MS, AZ)
+        :return: bool
+        """
+        try:
+            if db_type == PG:
+                return conn.closed != 0
+            elif db_type == MS:
+                return not conn._conn.connected
+            else:
+                return bool(getattr(conn, 'closed', False))
+        except Exception:
+            return True
+
+    def __is_healthy(self, conn, idle_since):
+        """
+        Checks a connection before it is handed out; only pings the server if it has been idle a while
+        :param conn: DB-API connection
+        :param idle_since: time.monotonic() when the connection was checked in
+        :return: bool
+        """
+        if self.is_closed(conn, self.db_type):
+            return False
+
+        if time.monotonic() - idle_since < self.health_check_after:
+            return True
+
+        try:
+            cur = conn.cursor()
+            cur.execute('SELECT 1')
+            cur.fetchall()
+            cur.close()
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def __close(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def __prune_idle(self):
+        """
+        Closes idle connections past idle_timeout, keeping at least min_size open. Caller holds the lock.
+        :return: None
+        """
+        now = time.monotonic()
+        keep = list()
+
+        for conn, idle_since in self.idle:
+            if now - idle_since > self.idle_timeout and len(keep) + len(self.in_use) >= self.min_size:
+                self.__close(conn)
+                self.opened -= 1
+                self.closed += 1
+            else:
+                keep.append((conn, idle_since))
+
+        self.idle = keep
+
+    def checkout(self):
+        """
+        Gets a connection for the calling thread, reusing an idle one when possible. The connection belongs to the
+        calling thread until it is checked in.
+        :return: DB-API connection
+        """
+        deadline = None if self.checkout_timeout is None else time.monotonic() + self.checkout_timeout
+
+        while True:
+            candidate = None
+
+            with self.__cond:
+                self.__prune_idle()
+
+                if self.idle:
+                    candidate = self.idle.pop()
+                elif self.opened < self.max_size:
+                    # Reserve the slot, then connect outside of the lock
+                    self.opened += 1
+                else:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise RuntimeError('Timed out waiting for a free pooled connection. {}'.format(self))
+                    self.__cond.wait(remaining)
+                    continue
+
+            if candidate:
+                conn, idle_since = candidate
+                if self.__is_healthy(conn, idle_since):
+                    with self.__cond:
+                        self.in_use[id(conn)] = (conn, threading.get_ident())
+                        self.reused += 1
+                    return conn
+
+                self.__discard(conn)
+                continue
+
+            try:
+                conn = self.connect_fn()
+            except Exception:
+                with self.__cond:
+                    self.opened -= 1
+                    self.__cond.notify()
+                raise
+
+            with self.__cond:
+                self.in_use[id(conn)] = (conn, threading.get_ident())
+            return conn
+
+    def checkin(self, conn, discard=False):
+        """
+        Returns a checked out connection to the pool
+        :param conn: DB-API connection from checkout
+        :param discard: if True, closes the connection instead of keeping it (ex. it holds session temp tables)
+        :return: None
+        """
+        with self.__cond:
+            if self.in_use.pop(id(conn), None) is None:
+                return
+
+        if discard or self.is_closed(conn, self.db_type) or not self.__reset(conn):
+            self.__discard(conn)
+            return
+
+        with self.__cond:
+            self.idle.append((conn, time.monotonic()))
+            self.__cond.notify()
+
+    def __discard(self, conn):
+        """
+        Closes a connection that was counted as open and frees its slot
+        :param conn: DB-API connection
+        :return: None
+        """
+        self.__close(conn)
+        with self.__cond:
+            self.opened -= 1
+            self.closed += 1
+            self.__cond.notify()
+
+    def __reset(self, conn):
+        """
+        Rolls back any open transaction so the next user starts clean
+        :param conn: DB-API connection
+        :return: bool, False if the connection could not be reset
+        """
+        try:
+            if self.db_type == PG:
+                # Only talks to the server if a transaction is actually open
+                if conn.get_transaction_status() != 0:
+                    conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def close_all(self):
+        """
+        Closes every idle connection; connections currently checked out are closed when checked in
+        :return: None
+        """
+        with self.__cond:
+            for conn, _ in self.idle:
+                self.__close(conn)
+                self.opened -= 1
+                self.closed += 1
+            self.idle = list()
+            self.__cond.notify_all()
+
+
+def get_pool(key, connect_fn, db_type, **kwargs):
+    """
+    Gets the shared pool for a set of connection parameters, creating it if needed. DbConnect instances with the same
+    type, server, database, port and user share warm connections.
+    :param key: tuple of connection parameters
+    :param connect_fn: function that opens and returns a new DB-API connection
+    :param db_type: database type (PG, MS, AZ)
+    :param kwargs: ConnectionPool sizing options, used only when the pool is created
+    :return: ConnectionPool
+    """
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None:
+            pool = ConnectionPool(connect_fn, db_type, **kwargs)
+            _POOLS[key] = pool
+        return pool
+
+
+def close_all_pools():
+    """
+    Closes the idle connections in every shared pool
+    :return: None
+    """
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values())
+        _POOLS.clear()
+
+    for pool in pools:
+        pool.close_all()
+
+
+class ConnectionRegistry:
+    """
+    Keyed registry of secondary sessions (ex. one DbConnect per (server, database)) so lookups against another server
+    or database reuse an open session instead of logging in every time. A session is closed and replaced once it is
+    older than max_age seconds or has been unused for idle_timeout seconds; the least recently used session is closed
+    when more than max_size are open.
+    """
+
+    def __str__(self):
+        return 'Connection registry - {n} open (max {m}), {o} opened, {r} reused'.format(
+            n=len(self.entries), m=self.max_size, o=self.opened, r=self.reused)
+
+    def __init__(self, close_fn, max_age=3600, idle_timeout=300, max_size=10):
+        """
+        :param close_fn: function that closes a session created by the registry
+        :param max_age: seconds a session is reused after it was opened; None for no limit
+        :param idle_timeout: seconds an unused session is kept; None for no limit
+        :param max_size: maximum number of open sessions
+        """
+        self.close_fn = close_fn
+        self.max_age = max_age
+        self.idle_timeout = idle_timeout
+        self.max_size = max_size
+
+        # Other initialized variables
+        self.entries = dict()
+        self.opened = 0
+        self.reused = 0
+        self.__lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __expired(self, opened_at, used_at, now):
+        return (self.max_age is not None and now - opened_at > self.max_age) or \
+               (self.idle_timeout is not None and now - used_at > self.idle_timeout)
+
+    def __close(self, session):
+        try:
+            self.close_fn(session)
+        except Exception:
+            pass
+
+    def get(self, key, factory):
+        """
+        Gets the open session for key, creating it with factory if there is none or the old one expired
+        :param key: hashable session key, ex. (server, database)
+        :param factory: function that opens and returns a new session
+        :return: session
+        """
+        with self.__lock:
+            now = time.monotonic()
+            for k, (session, opened_at, used_at) in list(self.entries.items()):
+                if self.__expired(opened_at, used_at, now):
+                    del self.entries[k]
+                    self.__close(session)
+
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries[key] = (entry[0], entry[1], now)
+                self.reused += 1
+                return entry[0]
+
+            while self.entries and len(self.entries) >= self.max_size:
+                lru = min(self.entries, key=lambda k: self.entries[k][2])
+                self.__close(self.entries.pop(lru)[0])
+
+            session = factory()
+            self.entries[key] = (session, now, now)
+            self.opened += 1
+            return session
+
+    def close(self, key):
+        """
+        Closes and forgets the session for key, if any
+        :param key: session key
+        :return: None
+        """
+        with self.__lock:
+            entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.__close(entry[0])
+
+    def close_all(self):
+        """
+        Closes every session in the registry
+        :return: None
+        """
+        with self.__lock:
+            sessions = [e[0] for e in self.entries.values()]
+            self.entries.clear()
+
+        for session in sessions:
+            self.__close(session)
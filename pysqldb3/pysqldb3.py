@@ -1,27 +1,41 @@
+import collections
+import concurrent.futures
+import contextlib
+import functools
 import getpass
-import pyodbc
-import pymssql
-from tqdm import tqdm
+import threading
+import time
 from typing import Optional, Union
-import openpyxl
 import json
-import plotly.express as px
-import configparser
 import os
-from .Config import write_config
-import pyarrow.csv as pyarrowcsv
 import numpy as np
 
-write_config(confi_path=os.path.dirname(os.path.abspath(__file__)) + "\\config.cfg")
-config = configparser.ConfigParser()
-config.read(os.path.dirname(os.path.abspath(__file__)) + "\\config.cfg")
-
 from .query import *
 from .shapefile import *
 from .geopackage import *
 from .data_io import *
+from .pool import get_pool, ConnectionRegistry
+from .history import QueryHistory
+from .cache import ResultCache, normalize_sql, is_cacheable, is_ddl, referenced_tables
+from .catalog import CatalogCache, ddl_schemas, changes_schemas
+from .stats import QueryStats
+from .batch import QueryBatch
+from .inference import ColumnProfile, profile_csv, profile_dataframe, merge_profiles, update_profiles, TIGHT_TYPES, \
+    DATE, TIMESTAMP
+from .partition import csv_partitions
+from .excel import XlsxSheet
 from .__init__ import __version__
 
+# read_csv options that change which lines are rows or how quotes work; files read with them aren't split into parts
+UNPARTITIONED_CSV_KWARGS = {'skiprows', 'header', 'names', 'nrows', 'skipfooter', 'comment', 'lineterminator',
+                            'quoting', 'escapechar', 'doublequote', 'compression'}
+# Extensions pandas reads as compressed files when compression isn't given
+COMPRESSED_CSV_EXTENSIONS = ('.gz', '.bz2', '.zip', '.xz', '.zst', '.tar')
+
+# One entry of DbConnect.run_parallel's results
+ParallelResult = collections.namedtuple('ParallelResult', ['query', 'data', 'columns', 'query_time', 'seconds',
+                                                           'error'])
+
 
 
 # noinspection PyArgumentList
@@ -32,8 +46,12 @@ class DbConnect:
 
     def __init__(self, user=None, password=None, ldap=False, type=None, server=None, database=None, port=5432,
                  allow_temp_tables=False, use_native_driver=True, default=False, quiet=False,
-                 inherits_from=None):
-        # type: (DbConnect, str, str, bool, str, str, str, int, bool, bool, bool, bool, object) -> None
+                 inherits_from=None, log_reconcile_every=100, log_reconcile_seconds=300,
+                 log_reconcile_on_disconnect=True, pooled=False, pool_min_size=1, pool_max_size=5,
+                 pool_idle_timeout=300, history_size=None, history_data='all', cache_results=False, cache_size=256,
+                 cache_ttl=300, cache_catalog=False, catalog_ttl=300, secondary_max_age=3600,
+                 secondary_idle_timeout=300, stats_callback=None, cleanup=True):
+        # type: (DbConnect, str, str, bool, str, str, str, int, bool, bool, bool, bool, object, int, int, bool, bool, int, int, int, int, str, bool, int, int, bool, int, int, int, object, bool) -> None
         """
         :params:
         user (string): default None
@@ -48,6 +66,37 @@ class DbConnect:
         quiet (bool): automatically performs all tasks quietly; defaults to False
         inherits_from (pysqldb3.DbConnect object): will take any input variable from other database connection
             not explicitly provided to self
+        log_reconcile_every (int): number of user queries between removing dropped tables from the temp logs;
+            defaults to 100, None to disable
+        log_reconcile_seconds (int): seconds between removing dropped tables from the temp logs; defaults to 300,
+            None to disable
+        log_reconcile_on_disconnect (bool): removes dropped tables from the temp logs when disconnecting if any user
+            queries have run since the last reconciliation; defaults to True
+        pooled (bool): reuses warm connections from a pool shared by DbConnects with the same type, server, database,
+            port and user instead of opening a new connection after every disconnect; defaults to False
+        pool_min_size (int): connections the pool keeps open when idle; defaults to 1
+        pool_max_size (int): maximum open connections in the pool; defaults to 5
+        pool_idle_timeout (int): seconds before an idle pooled connection above pool_min_size is closed; defaults to 300
+        history_size (int): number of queries kept in queries and internal_queries; defaults to None (keep all)
+        history_data (string): 'all' keeps result data on every query in the history, 'last' only on the most recent
+            query, 'spill' writes older queries' data to a temp file and reads it back on access; defaults to 'all'
+        cache_results (bool): caches the results of read-only SELECT queries run through query/dfquery; cached results
+            are dropped after cache_ttl seconds or when a query run here changes a table they read; defaults to False
+        cache_size (int): maximum number of cached results, least recently used are dropped first; defaults to 256
+        cache_ttl (int): seconds a cached result is reused; defaults to 300, None to keep until evicted or invalidated
+        cache_catalog (bool): answers table_exists, get_table_columns and get_schemas from an in-process snapshot of
+            the catalog, loaded with one query per schema; snapshots are dropped after catalog_ttl seconds, when a query
+            run here changes the schema or on refresh_catalog; defaults to False
+        catalog_ttl (int): seconds a catalog snapshot is reused; defaults to 300, None to keep until invalidated
+        secondary_max_age (int): seconds a connection to another server/database (opened for SQL Server temp log checks)
+            is reused before it is replaced; defaults to 3600, None for no limit
+        secondary_idle_timeout (int): seconds an unused connection to another server/database is kept open; defaults
+            to 300, None for no limit
+        stats_callback (function): called with a dict of timings per phase, rows and bytes fetched after every query,
+            ex. to send them to monitoring; see stats; defaults to None
+        cleanup (bool): drops expired tables and removes tables that no longer exist from the temp logs when the
+            DbConnect is created; defaults to True. The sessions run_parallel and parallel loads open skip it, as the
+            DbConnect they copy has already done it.
         """
         # Explicitly in __init__ fn call
         self.user = user
@@ -66,12 +115,38 @@ class DbConnect:
         self.default_connect = default
         self.quiet = quiet
         self.inherits_from = inherits_from
+        self.log_reconcile_every = log_reconcile_every
+        self.log_reconcile_seconds = log_reconcile_seconds
+        self.log_reconcile_on_disconnect = log_reconcile_on_disconnect
+        self.pooled = pooled
+        self.pool_min_size = pool_min_size
+        self.pool_max_size = pool_max_size
+        self.pool_idle_timeout = pool_idle_timeout
+        self.history_size = history_size
+        self.history_data = history_data
+        self.cache_results = cache_results
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.cache_catalog = cache_catalog
+        self.catalog_ttl = catalog_ttl
+        self.secondary_max_age = secondary_max_age
+        self.secondary_idle_timeout = secondary_idle_timeout
+        self.stats_callback = stats_callback
 
         # Other initialized variables
         self.params = dict()
         self.conn = None
-        self.queries = list()
-        self.internal_queries = list()
+        self.pool = None
+        self.temp_tables_on_conn = False
+        self.open_iterators = 0
+        self.running_queries = list()
+        self.queries = QueryHistory(history_size, history_data)
+        self.internal_queries = QueryHistory(history_size, history_data)
+        self.result_cache = ResultCache(cache_size, cache_ttl) if cache_results else None
+        self.catalog = None
+        self.query_stats = QueryStats(callback=stats_callback)
+        self.secondary_connections = ConnectionRegistry(self.__close_secondary, secondary_max_age,
+                                                        secondary_idle_timeout)
         self.connection_start = None
         self.tables_created = list()
         self.tables_dropped = list()
@@ -80,13 +155,20 @@ class DbConnect:
         self.last_query = None
         self.default_schema = None
         self.connection_count = 0
+        self.queries_since_log_reconcile = 0
+        self.last_log_reconcile = datetime.datetime.now()
+        self.__reconciling_logs = False
+        self.__server_version = None
         self.__set_type()
 
         # Connect and clean logs
         self.__get_credentials()
         self.default_schema = self.__get_default_schema(self.type)
         self.log_table = TEMP_LOG_TABLE.format(self.user)
-        self.__cleanup_subroutine()
+        if cache_catalog and self.type in (PG, MS):
+            self.catalog = CatalogCache(catalog_ttl, case_sensitive=self.type == PG)
+        if cleanup:
+            self.__cleanup_subroutine()
 
     def __str__(self):
         # type: (DbConnect) -> str
@@ -108,6 +190,17 @@ class DbConnect:
         else:
             return self.queries[-1].data
 
+    def __get_most_recent_query(self, internal=False):
+        # type: (DbConnect) -> Query
+        """
+        Helper function to return the most recent query
+        :return:
+        """
+        if internal:
+            return self.internal_queries[-1]
+        else:
+            return self.queries[-1]
+
     def __set_type(self):
         # type: (DbConnect) -> None
         """
@@ -172,6 +265,7 @@ class DbConnect:
         :return: None
         """
         if self.default_connect:
+            config = get_config()
             self.type = config.get('DEFAULT DATABASE', 'type')
             self.__set_type()
             self.server = config.get('DEFAULT DATABASE', 'server')
@@ -202,43 +296,66 @@ class DbConnect:
             if not self.password and not self.LDAP and self.type !=AZ:
                 self.password = getpass.getpass(f'Password ({self.database.lower()})')
 
-    def __connect_pg(self):
-        # type: (DbConnect) -> None
+    def __connection_params(self):
+        # type: (DbConnect) -> dict
         """
-        Creates connection to pg db
-        :return: None
+        Gets the driver's connection parameters based on the type of database
+        :return: dict
         """
-        self.params = {
-            'dbname': self.database,
-            'user': self.user,
-            'password': self.password,
-            'host': self.server,
-            'port': self.port
-        }
-        self.conn = psycopg2.connect(**self.params)
+        if self.type == PG:
+            return {
+                'dbname': self.database,
+                'user': self.user,
+                'password': self.password,
+                'host': self.server,
+                'port': self.port
+            }
 
-    def __connect_ms(self):
-        # type: (DbConnect) -> None
-        """
-        Creates connection to sql server db
-        :return: None
-        """
+        if self.type == AZ:
+            return {
+                'database': self.database,
+                'SERVER': self.server,
+                'PORT' : '1433;DATABASE = '+self.database,
+                'UID': self.user+'@dot.nyc.gov',
+                'AUTHENTICATION' : 'ActiveDirectoryInteractive',
+                'driver' :'{ODBC Driver 17 for SQL Server}'
+            }
 
         if self.LDAP:
-            self.params = {
+            return {
                 'database': self.database,
                 'host': self.server
             }
-        else:
-            self.params = {
-                'database': self.database,
-                'host': self.server,
-                'user': self.user,
-                'password': self.password
-            }
+
+        return {
+            'database': self.database,
+            'host': self.server,
+            'user': self.user,
+            'password': self.password
+        }
+
+    @staticmethod
+    def __connect_pg(params):
+        # type: (dict) -> object
+        """
+        Creates connection to pg db
+        :param params: connection parameters
+        :return: connection
+        """
+        return psycopg2.connect(**params)
+
+    @staticmethod
+    def __connect_ms(params):
+        # type: (dict) -> object
+        """
+        Creates connection to sql server db
+        :param params: connection parameters
+        :return: connection; None if it could not be opened
+        """
+        import pymssql
 
         try:
-            self.conn = pymssql.connect(**self.params)
+            return pymssql.connect(**params)
         except Exception as e:
             print(e)
             # Revert to SQL driver and show warning
@@ -251,36 +368,32 @@ class DbConnect:
             #                           datetime2 will not be interpreted correctly\n')
             #
             #     self.conn = pymssql.connect(**self.params)
-    def __connect_az(self):
-        # type: (DbConnect) -> None
+
+    @staticmethod
+    def __connect_az(params, use_native_driver=False, warn=False):
+        # type: (dict, bool, bool) -> object
         """
-        Creates connection to sql server db
-        :return: None
+        Creates connection to azure sql server db
+        :param params: connection parameters
+        :param use_native_driver: if True, falls back to pymssql when pyodbc can't connect
+        :param warn: if True, prints the native client warning when falling back
+        :return: connection; None if it could not be opened
         """
+        import pyodbc
 
-        self.LDAP = True
-
-        self.params = {
-            'database': self.database,
-            'SERVER': self.server,
-            'PORT' : '1433;DATABASE = '+self.database,
-            'UID': self.user+'@dot.nyc.gov',
-            'AUTHENTICATION' : 'ActiveDirectoryInteractive',
-            'driver' :'{ODBC Driver 17 for SQL Server}'
-
-        }
         try:
-            self.conn = pyodbc.connect(**self.params)
+            return pyodbc.connect(**params)
         except Exception as e:
             print(e)
             # Revert to SQL driver and show warning
-            if self.use_native_driver:
+            if use_native_driver:
                 # Native client is required for correct handling of datetime2 types in SQL
-                if self.connection_count == 0:
+                if warn:
                     print('Warning:\n\tMissing SQL Server Native Client 10.0 \
                                       datetime2 will not be interpreted correctly\n')
 
-                self.conn = pymssql.connect(**self.params)
+                import pymssql
+                return pymssql.connect(**params)
 
     def connect(self, quiet=False):
         # type: (DbConnect, bool) -> None
@@ -296,26 +409,67 @@ class DbConnect:
         if not quiet and not self.quiet:
             print(self)
 
-        # Connect based on type of database
-        if self.type == PG:
-            self.__connect_pg()
-
-        if self.type == MS:
-            self.__connect_ms()
-
-        if self.type == AZ:
-            self.__connect_az()
+        self.params = self.__connection_params()
+
+        if self.pooled:
+            if not self.pool:
+                # The pool is shared by every DbConnect with the same key, so its connect function holds no instance
+                self.pool = get_pool((self.type, self.server, self.database, self.port, self.user, self.LDAP),
+                                     functools.partial(DbConnect.__open_connection, self.type, dict(self.params),
+                                                       self.use_native_driver),
+                                     self.type, min_size=self.pool_min_size, max_size=self.pool_max_size,
+                                     idle_timeout=self.pool_idle_timeout)
+            self.conn = self.pool.checkout()
+        else:
+            self.conn = self.__open_connection(self.type, self.params, self.use_native_driver,
+                                               warn=self.connection_count == 0)
 
         # Add successful connection
         self.connection_count += 1
 
-    def disconnect(self, quiet=False):
-        # type: (DbConnect, bool) -> None
+    @staticmethod
+    def __open_connection(db_type, params, use_native_driver=False, warn=False):
+        # type: (str, dict, bool, bool) -> object
+        """
+        Opens a new connection based on the type of database. Doesn't touch any DbConnect, so it can be shared as a
+        pool's connect function.
+        :param db_type: database type (PG, MS, AZ)
+        :param params: connection parameters (see __connection_params)
+        :param use_native_driver: see __connect_az
+        :param warn: see __connect_az
+        :return: connection
+        """
+        if db_type == PG:
+            return DbConnect.__connect_pg(params)
+
+        if db_type == MS:
+            return DbConnect.__connect_ms(params)
+
+        if db_type == AZ:
+            return DbConnect.__connect_az(params, use_native_driver, warn)
+
+    def disconnect(self, quiet=False, reconcile_logs=True):
+        # type: (DbConnect, bool, bool) -> None
         """
         Closes connection to db
         :param quiet: boolean to print out connection closing (defaults to false)
+        :param reconcile_logs: if True and log_reconcile_on_disconnect is set, removes dropped tables from the temp
+        logs before closing when any user queries have run since the last reconciliation (defaults to True)
         :return:
         """
+        if reconcile_logs and self.log_reconcile_on_disconnect and self.queries_since_log_reconcile:
+            self.reconcile_logs()
+
+        if self.pool:
+            # Session temp tables must not leak to the next user of the connection
+            if self.conn:
+                self.pool.checkin(self.conn, discard=self.temp_tables_on_conn)
+            self.conn = None
+            self.temp_tables_on_conn = False
+            if not quiet and not self.quiet:
+                print(f"Database connection ({self.type}) to {self.database} on {self.server} - user: {self.user} \nConnection returned to pool {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+            return
+
         try:
             self.conn.close()
             if not quiet and not self.quiet:
@@ -324,6 +478,47 @@ class DbConnect:
             print(e)
             return
 
+    def __secondary_connection(self, server, database):
+        # type: (DbConnect, str, str) -> DbConnect
+        """
+        Gets the open DbConnect for another server/database with this connection's credentials, creating it if needed.
+        The connection stays open between queries until it is closed by the registry or close_secondary_connections.
+        :param server: server name
+        :param database: database name
+        :return: DbConnect
+        """
+        return self.secondary_connections.get((server, database), lambda: DbConnect(
+            type=self.type, server=server, database=database, port=self.port, user=self.user, password=self.password,
+            ldap=self.LDAP, default=self.default_connect, use_native_driver=self.use_native_driver, quiet=True,
+            allow_temp_tables=True, log_reconcile_every=None, log_reconcile_seconds=None,
+            log_reconcile_on_disconnect=False))
+
+    @staticmethod
+    def __close_secondary(dbc):
+        # type: (DbConnect) -> None
+        if dbc.conn:
+            dbc.disconnect(True, reconcile_logs=False)
+
+    def close_secondary_connections(self):
+        # type: (DbConnect) -> None
+        """
+        Closes the connections this DbConnect opened to other servers/databases (SQL Server temp log checks)
+        :return: None
+        """
+        self.secondary_connections.close_all()
+
+    def close_pool(self):
+        # type: (DbConnect) -> None
+        """
+        Returns this connection to the pool and closes the pool's idle connections. Only applies when pooled=True.
+        :return: None
+        """
+        if not self.pool:
+            return
+
+        self.disconnect(True)
+        self.pool.close_all()
+
     def check_conn(self):
         """
         Checks and reconnects to connection if need be
@@ -372,33 +567,42 @@ class DbConnect:
     def __remove_nonexistent_tables_from_logs(self):
         # type: (DbConnect) -> None
         """
-        Removes from the log table any table that no longer exists in the database
+        Removes from the log table any table that no longer exists in the database.
+        Finds every schema with a log table in one catalog query, then deletes the stale rows from all of them in one
+        statement by anti-joining each log table against the catalog (pg_tables/sys.tables).
         :return:
         """
-        to_delete = list()
+        log_table = get_unique_table_schema_string(self.log_table, self.type)
 
-        # For each schema check if log file exists
-        for s in self.get_schemas():
-            if self.table_exists(self.log_table, schema=s, internal=True):
+        if self.type == PG:
+            self.query(PG_LOG_TABLE_SCHEMAS_QUERY.format(log=log_table), timeme=False, internal=True)
+            stale_query = PG_REMOVE_STALE_LOG_ENTRIES_QUERY
+        elif self.type == MS:
+            self.query(MS_LOG_TABLE_SCHEMAS_QUERY.format(log=log_table), timeme=False, internal=True)
+            stale_query = MS_REMOVE_STALE_LOG_ENTRIES_QUERY
+        else:
+            return
 
-                # For each table in log file check if exists
-                self.query(f"select table_name from {s}.{self.log_table}", timeme=False, internal=True)
+        schemas = [row[0] for row in self.__get_most_recent_query_data(internal=True) or []]
 
-                if self.__get_most_recent_query_data(internal=True):
-                    for t in self.__get_most_recent_query_data(internal=True):
-                        query_table_name = get_query_table_schema_name(str(t[0]), self.type)
+        if schemas:
+            self.query(''.join([stale_query.format(s=s, log=self.log_table) for s in schemas]),
+                       strict=False, timeme=False, internal=True)
 
-                        # If table does not exist, add to the list of tables to delete
-                        if not self.table_exists(query_table_name, schema=s, internal=True, case_sensitive=True):
-                            # Add the original version back to be deleted
-                            to_delete.append(str(t[0]))
+    def __maybe_reconcile_logs(self):
+        # type: (DbConnect) -> None
+        """
+        Counts a user query and reconciles the temp logs once log_reconcile_every queries or log_reconcile_seconds
+        seconds have passed since the last reconciliation
+        :return:
+        """
+        self.queries_since_log_reconcile += 1
 
-                # Remove stale table names
-                if to_delete:
-                    self.query(
-                        f"delete from {s}.{self.log_table} where table_name in ({str(to_delete)[1:-1]})",
-                        strict=False, timeme=False, internal=True
-                    )
+        if self.log_reconcile_every and self.queries_since_log_reconcile >= self.log_reconcile_every:
+            self.reconcile_logs()
+        elif self.log_reconcile_seconds and \
+                (datetime.datetime.now() - self.last_log_reconcile).total_seconds() >= self.log_reconcile_seconds:
+            self.reconcile_logs()
 
     def __cleanup_subroutine(self):
         # type: (DbConnect) -> None
@@ -421,7 +625,30 @@ class DbConnect:
             if self.table_exists(self.log_table, schema=sch[0], internal=True):
                 self.__drop_expired_tables(sch[0])
 
-        self.__remove_nonexistent_tables_from_logs()
+        self.reconcile_logs()
+
+    def __dropped_table_log_statements(self, tables_dropped):
+        # type: (DbConnect, list) -> list
+        """
+        Gets the statements that remove dropped tables from the log, for use in a bookkeeping batch
+        :param tables_dropped: list of dropped tables
+        :return: list of statements
+        """
+        statements = list()
+        for table_str in tables_dropped:
+            server, database, schema, table = parse_table_string(table_str, self.default_schema, self.type)
+
+            # Delete from log (if there is one) to avoid dropping perm tables with same name
+            if self.type == PG:
+                # The log table is created unquoted, so PG stores its name in lower case
+                delete = f"""DELETE FROM {schema}.{self.log_table} WHERE table_schema = '{schema}' AND table_name = '{table}';"""
+                statements.append(PG_IF_LOG_TABLE_EXISTS.format(
+                    s=get_unique_table_schema_string(schema, self.type),
+                    log=get_unique_table_schema_string(self.log_table, self.type), body=delete))
+            elif self.type == MS:
+                delete = f"""DELETE FROM {schema}."{self.log_table}" WHERE table_schema = '{schema}' AND table_name = '{table}';"""
+                statements.append(MS_IF_LOG_TABLE_EXISTS.format(db='', s=schema, log=self.log_table, body=delete))
+        return statements
 
     def __remove_dropped_tables_from_log(self, tables_dropped):
         # type: (DbConnect) -> None
@@ -429,16 +656,54 @@ class DbConnect:
         Removes tables dropped in already-run Queries from log.
         :return:
         """
-        for table_str in tables_dropped:
-            server, database, schema, table = parse_table_string(table_str, self.default_schema, self.type)
+        statements = self.__dropped_table_log_statements(tables_dropped)
+        if statements:
+            self.query(batch_statements(statements, self.type), timeme=False, internal=True)
+            self.internal_queries[-1].report_bookkeeping_failures()
 
-            # Check if log table exists
-            if self.table_exists(self.log_table, schema=schema, internal=True):
-                # Delete from log to avoid dropping perm tables with same name
-                self.query(
-                    f"""DELETE FROM {schema}."{self.log_table}" WHERE table_schema = '{schema}' AND table_name = '{table}'""",
-                    timeme=False, internal=True
-                )
+    def __table_logging_statements(self, new_tables, days=7):
+        # type: (DbConnect, list, int) -> tuple
+        """
+        Gets the statements that create the log table if needed and log new tables, for use in a bookkeeping batch.
+        SQL Server tables on another server or database are returned separately to be logged with log_temp_table.
+        :param new_tables: list of new tables
+        :param days: number of days before the tables expire
+        :return: (list of statements, list of (server, database, schema, table) to log separately)
+        """
+        statements = list()
+        separate = list()
+        created_on = datetime.datetime.now().strftime('%Y-%m-%d %H:%M')
+        expiration = datetime.datetime.now() + datetime.timedelta(days=days)
+
+        for table in new_tables:
+            server, database, sch, tbl = parse_table_string(table, self.default_schema, self.type)
+
+            # All archive tables should default to permanent
+            if sch == 'archive' or tbl == self.log_table:
+                continue
+
+            if self.type == PG:
+                statements.append(
+                    PG_IF_LOG_TABLE_MISSING.format(s=get_unique_table_schema_string(sch, self.type),
+                                                   log=get_unique_table_schema_string(self.log_table, self.type),
+                                                   body=PG_CREATE_LOG_TABLE_QUERY.format(s=sch, log=self.log_table)) +
+                    PG_ADD_TABLE_TO_LOG_QUERY.format(s=sch, log=self.log_table, u=self.user, t=tbl, dt=created_on,
+                                                     ex=expiration) + ';')
+
+            elif self.type == MS and (not server or get_unique_table_schema_string(server, self.type) == self.server) \
+                    and (not database or get_unique_table_schema_string(database, self.type) ==
+                         get_unique_table_schema_string(self.database, self.type)):
+                db = database + '.' if database else ''
+                statements.append(
+                    MS_IF_LOG_TABLE_MISSING.format(db=db, s=sch, log=self.log_table,
+                                                   body=MS_CREATE_LOG_TABLE_QUERY.format(serv='', db=db, s=sch,
+                                                                                         log=self.log_table)) +
+                    MS_ADD_TABLE_TO_LOG_QUERY.format(s=sch, log=self.log_table, u=self.user, t=tbl, dt=created_on,
+                                                     ex=expiration, ser='', db=db))
+            else:
+                separate.append((server, database, sch, tbl))
+
+        return statements, separate
 
     def __run_table_logging(self, new_tables, days=7):
         """
@@ -446,14 +711,43 @@ class DbConnect:
         :param new_tables:
         :return:
         """
+        statements, separate = self.__table_logging_statements(new_tables, days=days)
+        if statements:
+            self.query(batch_statements(statements, self.type), strict=False, timeme=False, internal=True)
+            self.internal_queries[-1].report_bookkeeping_failures()
 
-        for table in new_tables:
-            server, database, sch, tbl = parse_table_string(table, self.default_schema, self.type)
+        for server, database, sch, tbl in separate:
+            self.log_temp_table(sch, tbl, self.user, database=database, server=server,
+                                expiration=datetime.datetime.now() + datetime.timedelta(days=days))
 
-            # All archive tables should default to permanent
-            if sch != 'archive':
-                self.log_temp_table(sch, tbl, self.user, database=database, server=server,
-                                    expiration=datetime.datetime.now() + datetime.timedelta(days=days))
+    def __run_bookkeeping(self, qry, days=7):
+        # type: (DbConnect, Query, int) -> None
+        """
+        Sends everything that follows a user query in one batch on the query's connection: grants, comments, log and
+        index updates for renamed tables (collected by Query), removing dropped tables from the log and logging new
+        tables. Each statement is isolated, so the end state matches running them one at a time.
+        :param qry: Query object that was just run
+        :param days: number of days before new tables expire
+        :return: None
+        """
+        statements = list(qry.bookkeeping)
+        statements += self.__dropped_table_log_statements(qry.dropped_tables)
+
+        separate = list()
+        if qry.temp and qry.new_tables:
+            log_statements, separate = self.__table_logging_statements(qry.new_tables, days=days)
+            statements += log_statements
+
+        if statements:
+            self.check_conn()
+            batch = Query(self, batch_statements(statements, self.type), strict=False, timeme=False, internal=True)
+            self.internal_queries.append(batch)
+            self.internal_data = batch.data
+            batch.report_bookkeeping_failures()
+
+        for server, database, sch, tbl in separate:
+            self.log_temp_table(sch, tbl, self.user, database=database, server=server,
+                                expiration=datetime.datetime.now() + datetime.timedelta(days=days))
 
     def log_temp_table(self, schema, table, owner, server=None, database=None,
                        expiration=datetime.datetime.now() + datetime.timedelta(days=7)):
@@ -518,6 +812,24 @@ class DbConnect:
     User-facing functions
     """
 
+    def reconcile_logs(self):
+        # type: (DbConnect) -> None
+        """
+        Removes any table that no longer exists in the database from the temp logs. This runs automatically on the
+        schedule set by log_reconcile_every, log_reconcile_seconds and log_reconcile_on_disconnect.
+        :return: None
+        """
+        if self.__reconciling_logs:
+            return
+
+        self.__reconciling_logs = True
+        try:
+            self.__remove_nonexistent_tables_from_logs()
+        finally:
+            self.__reconciling_logs = False
+            self.queries_since_log_reconcile = 0
+            self.last_log_reconcile = datetime.datetime.now()
+
     def check_logs(self, schema=None):
         """
         :param schema: schema to check; defaults to the default_schema
@@ -582,6 +894,7 @@ class DbConnect:
         pids_to_kill = [pid[0] for pid in self.__get_most_recent_query_data(internal=True)]
 
         if pids_to_kill:
+            from tqdm import tqdm
 
             print('Killing %i connections' % len(pids_to_kill))
 
@@ -682,6 +995,9 @@ class DbConnect:
         cleaned_table = get_unique_table_schema_string(table, self.type)
 
         if self.type == PG:
+            if self.catalog is not None:
+                return self.catalog.key(cleaned_table) in self.__catalog_snapshot(cleaned_schema)
+
             self.query(PG_TABLE_EXISTS_QUERY.format(s=cleaned_schema, t=cleaned_table), timeme=False, internal=internal)
 
             if self.__get_most_recent_query_data(internal=internal)[0][0]:
@@ -700,6 +1016,9 @@ class DbConnect:
 
             if cleaned_server == self.server and cleaned_database == get_unique_table_schema_string(self.database,
                                                                                                     self.type):
+                if self.catalog is not None:
+                    return self.catalog.key(cleaned_table) in self.__catalog_snapshot(cleaned_schema)
+
                 self.query(MS_TABLE_EXISTS_QUERY.format(s=cleaned_schema, t=cleaned_table), timeme=False,
                            internal=internal)
                 if self.__get_most_recent_query_data(internal=internal):
@@ -708,13 +1027,8 @@ class DbConnect:
                     return False
             else:
                 # need to connect to other db to check for log
-                # todo: there must be a better way to do this, but havent found it yet
-                other_dbc = DbConnect(type=self.type, server=cleaned_server, database=cleaned_database,
-                                      port=self.port,
-                                      user=self.user, password=self.password, ldap=self.LDAP,
-                                      default=self.default_connect, use_native_driver=self.use_native_driver)
-
-                return other_dbc.table_exists(self.log_table, schema=cleaned_schema)
+                other_dbc = self.__secondary_connection(cleaned_server, cleaned_database)
+                return other_dbc.table_exists(table, schema=cleaned_schema, internal=internal)
         else:
             return False
 
@@ -724,19 +1038,34 @@ class DbConnect:
         Gets a list of schemas available in the database
         :return: list of schemas
         """
+        if self.catalog is not None:
+            schemas = self.catalog.get_schemas()
+            if schemas is not None:
+                return schemas
+
         if self.type == MS:
-            self.query(MS_GET_SCHEMAS_QUERY, timeme=False, internal=True)
+            self.query(MS_GET_SCHEMAS_QUERY, timeme=False, internal=True, cache=True)
 
         elif self.type == PG:
-            self.query(PG_GET_SCHEMAS_QUERY, timeme=False, internal=True)
+            self.query(PG_GET_SCHEMAS_QUERY, timeme=False, internal=True, cache=True)
         else:
             return []
 
-        return [schema_row[0] for schema_row in self.__get_most_recent_query_data(internal=True)]
+        schemas = [schema_row[0] for schema_row in self.__get_most_recent_query_data(internal=True)]
+        if self.catalog is not None:
+            self.catalog.load_schemas(schemas)
+        return schemas
 
     def get_table_columns(self, table, schema=None, full=False):
         if not schema:
             schema = self.default_schema
+
+        # Views and full column details are not in the catalog snapshot
+        if self.catalog is not None and not full:
+            columns = self.__catalog_snapshot(schema).get(self.catalog.key(table))
+            if columns is not None:
+                return list(columns)
+
         if full:
             columns = '*'
         else:
@@ -771,7 +1100,7 @@ class DbConnect:
             SELECT {columns}
             FROM t
             ORDER BY ordinal_position;
-            """, timeme=False, internal=True)
+            """, timeme=False, internal=True, cache=True)
 
         if self.type == MS:
             self.query(f"""
@@ -780,13 +1109,162 @@ class DbConnect:
             WHERE table_schema = '{schema}' 
                 AND table_name = '{table}'
             ORDER BY ORDINAL_POSITION;
-            """, timeme=False, internal=True)
+            """, timeme=False, internal=True, cache=True)
 
         return self.__get_most_recent_query_data(internal=True)
 
+    def __catalog_snapshot(self, schema):
+        # type: (DbConnect, str) -> dict
+        """
+        Gets a schema's tables and columns from the catalog cache, loading them with one query if needed
+        :param schema: schema name as stored by the database
+        :return: dict of {table key: list of (column name, data type)}
+        """
+        snapshot = self.catalog.get(schema)
+        if snapshot is None:
+            snapshot_query = PG_CATALOG_SNAPSHOT_QUERY if self.type == PG else MS_CATALOG_SNAPSHOT_QUERY
+            self.query(snapshot_query.format(s=schema), timeme=False, internal=True, cache=False)
+            snapshot = self.catalog.load(schema, self.__get_most_recent_query_data(internal=True) or [])
+        return snapshot
+
+    def __update_catalog_cache(self, qry):
+        # type: (DbConnect, Query) -> None
+        """
+        Drops the catalog snapshots of schemas whose tables or columns a query may have changed
+        :param qry: Query object that was just run
+        :return: None
+        """
+        if self.catalog is None:
+            return
+
+        schemas = ddl_schemas(qry.query_string, self.default_schema, self.type)
+        if schemas is not None:
+            for table in list(qry.new_tables) + list(qry.dropped_tables) + list((qry.renamed_tables or {}).keys()):
+                if isinstance(table, str):
+                    table = parse_table_string(table, self.default_schema, self.type)
+                schemas.add(table[2] or self.default_schema)
+
+        schema_list = changes_schemas(qry.query_string)
+        if schemas is None or schemas or schema_list:
+            self.catalog.invalidate(schemas, schema_list=schema_list)
+
+    def __invalidate_catalog(self, schema):
+        # type: (DbConnect, str) -> None
+        """
+        Drops the catalog snapshot of a schema whose tables were created outside of query (ex. by ogr2ogr)
+        :param schema: schema name
+        :return: None
+        """
+        if self.catalog is not None:
+            self.catalog.invalidate([schema])
+
+    def refresh_catalog(self, schema=None):
+        # type: (DbConnect, Optional[str]) -> None
+        """
+        Drops the catalog snapshot so table_exists, get_table_columns and get_schemas query the database again. Use
+        after tables are changed outside of this DbConnect. Only applies when cache_catalog=True.
+        :param schema: only refresh this schema; defaults to everything
+        :return: None
+        """
+        if self.catalog is not None:
+            self.catalog.refresh(schema)
+
+    def __result_cache_key(self, query, internal, cache):
+        # type: (DbConnect, str, bool, Optional[bool]) -> Optional[tuple]
+        """
+        Gets the result cache key for a query, or None if the query should not be served from or stored in the cache
+        :param query: String sql query
+        :param internal: Boolean flag for internal processes
+        :param cache: per-query override (see query)
+        :return: tuple or None
+        """
+        if self.result_cache is None or cache is False or (internal and not cache):
+            return None
+
+        if not is_cacheable(query):
+            return None
+
+        return self.type, self.server, self.database, self.port, self.user, normalize_sql(query)
+
+    def __update_result_cache(self, qry, cache_key):
+        # type: (DbConnect, Query, Optional[tuple]) -> None
+        """
+        Stores a cacheable query's results, or drops cached results for the tables a non read-only query touched
+        :param qry: Query object that was just run
+        :param cache_key: key from __result_cache_key
+        :return: None
+        """
+        if self.result_cache is None:
+            return
+
+        if cache_key:
+            if qry.data is not None and qry.data_description:
+                self.result_cache.put(cache_key, qry.query_string, qry.data, qry.data_description, qry.data_columns)
+            return
+
+        if is_cacheable(qry.query_string):
+            return
+
+        tables = referenced_tables(qry.query_string)
+        tables.update(qry.new_tables)
+        tables.update(qry.dropped_tables)
+        for new_table, old_table in (qry.renamed_tables or {}).items():
+            tables.update((new_table, old_table))
+
+        self.result_cache.invalidate(tables, catalog=is_ddl(qry.query_string) or bool(qry.new_tables))
+
+    def cancel(self):
+        # type: (DbConnect) -> int
+        """
+        Cancels the queries currently running or being fetched on this DbConnect. Safe to call from another thread,
+        ex. a watchdog enforcing a time limit. Cancelled queries fail like any other failed query (sys.exit if strict)
+        and are counted in stats.
+        :return: number of queries a cancel request was sent for
+        """
+        with RUNNING_QUERIES_LOCK:
+            running = list(self.running_queries)
+        return sum(1 for qry in running if qry.cancel())
+
+    def stats(self):
+        # type: (DbConnect) -> dict
+        """
+        Gets timing statistics for the queries run by this DbConnect: counts of user and internal queries, failed,
+        cancelled and timed out queries, rows and approximate bytes fetched, and per phase (connect, execute, fetch, commit, parse, bookkeeping, log_reconcile)
+        the count, total, mean, p50, p95 and max seconds
+        :return: dict
+        """
+        return self.query_stats.summary()
+
+    def reset_stats(self):
+        # type: (DbConnect) -> None
+        """
+        Clears the statistics returned by stats
+        :return: None
+        """
+        self.query_stats.reset()
+
+    def cache_stats(self):
+        # type: (DbConnect) -> Optional[dict]
+        """
+        Gets result cache counters. Only applies when cache_results=True.
+        :return: dict of hits, misses, hit_rate, entries, evictions and invalidations, or None if caching is off
+        """
+        if self.result_cache is None:
+            return None
+        return self.result_cache.stats()
+
+    def clear_cache(self):
+        # type: (DbConnect) -> None
+        """
+        Drops every cached query result. Use after tables are changed outside of this DbConnect.
+        :return: None
+        """
+        if self.result_cache is not None:
+            self.result_cache.clear()
+
     def query(self, query, strict=True, permission=True, temp=True, timeme=True, no_comment=False, comment='',
-              lock_table=None, return_df=False, days=7, internal=False, no_print_out=False):
-        # type: (str, bool, bool, bool, bool, bool, str, str, bool, int, bool) -> Optional[None, pd.DataFrame]
+              lock_table=None, return_df=False, days=7, internal=False, no_print_out=False, cache=None, timeout=None):
+        # type: (str, bool, bool, bool, bool, bool, str, str, bool, int, bool, bool, Optional[bool], Optional[float]) -> Optional[None, pd.DataFrame]
         """
         Runs Query object from input SQL string and adds query to queries
         :param query: String sql query to be run
@@ -800,22 +1278,73 @@ class DbConnect:
         :param return_df: boolean that returns Pandas dataframe of data if true (defaults to false)
         :param days: if temp=True, the number of days that the temp table will be kept. Defaults to 7.
         :param internal: Boolean flag for internal processes
+        :param cache: only applies when cache_results is set. None uses the result cache for non-internal read-only
+        queries, True also uses it for internal lookups, False always runs the query
+        :param timeout: seconds the query may run before it is cancelled (statement_timeout on PG, a timer that cancels
+        it on pymssql, the driver's query timeout on pyodbc); a timed out query fails like any other failed query. None
+        for no limit
         :return:
         """
-        self.check_conn()
+        cache_key = self.__result_cache_key(query, internal, cache)
+        cached = self.result_cache.get(cache_key) if cache_key else None
 
-        # Warn for unintended custom comment behavior
-        if self.type == MS and comment:
-            print('Comment functionality does not work with SQL Server databases. '
-                  'Any inputted comments will not be recorded.')
+        if cached:
+            qry = Query(self, query, strict=strict, temp=temp, timeme=timeme, internal=internal,
+                        no_print_out=no_print_out, cached_result=cached)
+        else:
+            connect_start = time.perf_counter()
+            self.check_conn()
+            connect_time = time.perf_counter() - connect_start
 
-        qry = Query(self, query, strict=strict, permission=permission, temp=temp, timeme=timeme,
-                    no_comment=no_comment, comment=comment, lock_table=lock_table, internal=internal,
-                    no_print_out=no_print_out)
+            # Warn for unintended custom comment behavior
+            if self.type == MS and comment:
+                print('Comment functionality does not work with SQL Server databases. '
+                      'Any inputted comments will not be recorded.')
 
-        if not self.allow_temp_tables:
-            self.disconnect(True)
+            qry = Query(self, query, strict=strict, permission=permission, temp=temp, timeme=timeme,
+                        no_comment=no_comment, comment=comment, lock_table=lock_table, internal=internal,
+                        no_print_out=no_print_out, timeout=timeout)
+            qry.timings['connect'] = connect_time
+            self.__after_run(qry, internal=internal, days=days, cache_key=cache_key)
+
+        self.__record_query(qry, internal=internal)
+
+        if return_df:
+            return qry.dfquery()
+
+    def __after_run(self, qry, internal=False, days=7, cache_key=None):
+        # type: (DbConnect, Query, bool, int, Optional[tuple]) -> None
+        """
+        Runs the bookkeeping for a query that was just run on this connection, releases the connection and updates
+        the caches
+        :param qry: Query object that was just run
+        :param internal: Boolean flag for internal processes
+        :param days: number of days before new tables expire
+        :param cache_key: key from __result_cache_key
+        :return: None
+        """
+        if self.pool and Query.query_creates_temp_table(qry.query_string):
+            self.temp_tables_on_conn = True
+
+        if not internal:
+            with qry.timed('bookkeeping'):
+                self.__run_bookkeeping(qry, days=days)
 
+        # Open iterators are still reading from this connection
+        if not self.allow_temp_tables and not self.open_iterators:
+            self.disconnect(True, reconcile_logs=False)
+
+        self.__update_result_cache(qry, cache_key)
+        self.__update_catalog_cache(qry)
+
+    def __record_query(self, qry, internal=False):
+        # type: (DbConnect, Query, bool) -> None
+        """
+        Adds a finished query to the history, created/dropped tables and stats
+        :param qry: Query object
+        :param internal: Boolean flag for internal processes
+        :return: None
+        """
         if internal:
             self.internal_queries.append(qry)
             self.internal_data = qry.data
@@ -826,16 +1355,78 @@ class DbConnect:
             self.tables_created += [nt for nt in qry.new_tables]
             self.tables_dropped += [dt for dt in qry.dropped_tables]
             self.last_query = qry.query_string
+            with qry.timed('log_reconcile'):
+                self.__maybe_reconcile_logs()
 
-            if qry.dropped_tables:
-                self.__remove_dropped_tables_from_log(qry.dropped_tables)
+        self.query_stats.record(qry, internal)
 
-            if qry.temp and qry.new_tables:
-                self.__run_table_logging(qry.new_tables, days=days)
-            self.__remove_nonexistent_tables_from_logs()
+    def __run_batches(self, batches, page_size=1000, strict=True, permission=True, temp=True, timeme=True, days=7,
+                      timeout=None, internal=False):
+        # type: (DbConnect, list, int, bool, bool, bool, bool, int, Optional[float], bool) -> Query
+        """
+        Runs (sql, param_rows) groups in one transaction as a single query; see Query batches
+        :return: Query
+        """
+        connect_start = time.perf_counter()
+        self.check_conn()
+        connect_time = time.perf_counter() - connect_start
+
+        query_string = ';\n'.join(sql.strip().rstrip(';') for sql, _ in batches)
+        qry = Query(self, query_string, strict=strict, permission=permission, temp=temp, timeme=timeme,
+                    timeout=timeout, batches=batches, page_size=page_size, internal=internal)
+        qry.timings['connect'] = connect_time
+
+        self.__after_run(qry, internal=internal, days=days)
+        self.__record_query(qry, internal=internal)
+        return qry
+
+    def execute_many(self, sql, param_rows, page_size=1000, strict=True, permission=True, temp=True, timeme=True,
+                     days=7, timeout=None):
+        # type: (DbConnect, str, list, int, bool, bool, bool, bool, int, Optional[float]) -> None
+        """
+        Runs a statement once per parameter row in one transaction, sending page_size rows per round trip
+        (execute_values/execute_batch on PG, executemany batches on MS, fast_executemany on Azure). The connection
+        check, commit and bookkeeping (grants, logging) happen once instead of once per row.
+        :param sql: sql statement with the driver's placeholders (%s for PG and MS, ? for Azure). On PG,
+        INSERT ... VALUES %s sends many rows per statement.
+        :param param_rows: iterable of parameter tuples
+        :param page_size: rows sent per round trip; defaults to 1000
+        :param strict: If true will run sys.exit on failed query attempts; nothing is committed on failure
+        :param permission:
+        :param temp: if True any new tables will be logged for deletion at a future date
+        :param timeme: Will print time of query
+        :param days: if temp=True, the number of days that the temp table will be kept. Defaults to 7.
+        :param timeout: seconds the statements may run before they are cancelled; see query
+        :return: None
+        """
+        self.__run_batches([(sql, param_rows)], page_size=page_size, strict=strict, permission=permission, temp=temp,
+                           timeme=timeme, days=days, timeout=timeout)
+
+    @contextlib.contextmanager
+    def batch(self, page_size=1000, strict=True, permission=True, temp=True, timeme=True, days=7, timeout=None):
+        # type: (DbConnect, int, bool, bool, bool, bool, int, Optional[float]) -> QueryBatch
+        """
+        Collects statements and runs them in one transaction when the with block ends. Consecutive calls with the same
+        parameterized statement are sent in bulk (see execute_many); plain statements in a row are sent together.
+        Nothing is sent if the block raises.
+            with db.batch() as batch:
+                for node_id, name in rows:
+                    batch.query('update working.node set name = %s where id = %s', (name, node_id))
+        :param page_size: rows sent per round trip; defaults to 1000
+        :param strict: If true will run sys.exit on failed query attempts; nothing is committed on failure
+        :param permission:
+        :param temp: if True any new tables will be logged for deletion at a future date
+        :param timeme: Will print time of query
+        :param days: if temp=True, the number of days that the temp table will be kept. Defaults to 7.
+        :param timeout: seconds the statements may run before they are cancelled; see query
+        :return: QueryBatch with query(sql, params=None) and execute_many(sql, param_rows)
+        """
+        statements = QueryBatch()
+        yield statements
 
-        if return_df:
-            return qry.dfquery()
+        if statements:
+            self.__run_batches(statements.batches, page_size=page_size, strict=strict, permission=permission,
+                               temp=temp, timeme=timeme, days=days, timeout=timeout)
 
     def drop_table(self, schema, table, cascade=False, strict=True, server=None, database=None, internal=False):
         # type: (DbConnect, str, str, bool, bool, str, str, bool) -> None
@@ -900,8 +1491,94 @@ class DbConnect:
         elif self.type == MS:
             self.query(f"EXEC sp_RENAME '{schema}.{table}.{old_column}', '{new_column}', 'COLUMN'", internal = True)
 
+    def iter_query(self, query, batch_size=20000, strict=True, internal=False, as_df=False, timeout=None):
+        """
+        Runs a query and yields its results in batches instead of holding the whole result in memory. Uses a uniquely
+        named server-side cursor on PG, so several iterators can be open at once, and fetchmany on MS/AZ.
+        The query runs when the first batch is requested.
+        :param query: String sql query to be run
+        :param batch_size: Maximum number of rows held in memory at once; defaults to 20,000
+        :param strict: If true will run sys.exit on failed query attempts
+        :param internal: Boolean flag for internal processes
+        :param as_df: If True, yields Pandas DataFrames instead of lists of rows
+        :param timeout: seconds the query may run before it is cancelled; on PG this covers fetching every batch, on
+        MS/AZ only running the query. None for no limit
+        :return: generator of lists of rows or DataFrames
+        """
+        if self.type in (MS, AZ) and self.open_iterators:
+            raise RuntimeError('SQL Server connections can only stream one result at a time. '
+                               'Finish or close the open iterator first.')
+
+        self.check_conn()
+
+        qry = Query(self, query, strict=strict, timeme=False, iterate=True, itersize=batch_size, internal=internal,
+                    timeout=timeout)
+        conn = self.conn
+
+        if internal:
+            self.internal_queries.append(qry)
+        else:
+            self.queries.append(qry)
+            self.last_query = qry.query_string
+
+        self.open_iterators += 1
+        try:
+            for rows in qry.iter_data():
+                if as_df:
+                    if self.type in (MS, AZ):
+                        rows = [tuple(i) for i in rows]
+                    yield pd.DataFrame(rows, columns=qry.data_columns)
+                else:
+                    yield rows
+        finally:
+            self.open_iterators -= 1
+
+            if conn is self.conn:
+                with qry.timed('commit'):
+                    try:
+                        conn.commit()
+                    except Exception:
+                        conn.rollback()
+
+                if not self.allow_temp_tables and not self.open_iterators:
+                    self.disconnect(True, reconcile_logs=False)
+
+            self.query_stats.record(qry, internal)
+
+    def arrow_query(self, query, batch_size=20000, strict=True, internal=False, timeout=None):
+        """
+        Runs a query and returns the results as a pyarrow Table. Rows are fetched in batches and each batch is written
+        straight into typed column arrays (types come from the cursor description where possible), so the full result
+        is never held as a list of tuples.
+        :param query: String sql query to be run
+        :param batch_size: Number of rows fetched per batch; defaults to 20,000
+        :param strict: If true will run sys.exit on failed query attempts
+        :param internal: Boolean flag for internal processes
+        :param timeout: seconds the query may run before it is cancelled; see iter_query
+        :return: pyarrow Table
+        """
+        column_chunks = None
+        column_names = []
+
+        for rows in self.iter_query(query, batch_size=batch_size, strict=strict, internal=internal, timeout=timeout):
+            if column_chunks is None:
+                description = self.__get_most_recent_query(internal=internal).data_description
+                column_names = [desc[0] for desc in description]
+                types = [arrow_type_from_type_code(desc[1], self.type) for desc in description]
+                column_chunks = [list() for _ in column_names]
+
+            for i, arr in enumerate(rows_to_arrow_arrays(rows, types)):
+                column_chunks[i].append(arr)
+
+        if column_chunks is None:
+            # No rows; still return the columns
+            column_names = self.__get_most_recent_query(internal=internal).data_columns or []
+            column_chunks = [list() for _ in column_names]
+
+        return arrow_table_from_chunks(column_chunks, column_names)
+
     def dfquery(self, query, strict=False, permission=True, temp=True, timeme=False, no_comment=False, comment='',
-                lock_table=None, days=7, internal=False):
+                lock_table=None, days=7, internal=False, chunksize=None, columnar=False, cache=None, timeout=None):
         """
         Runs Query object from input SQL string and adds query to queries. Outputs as a dataframe.
         For dfquery, timeme and strict are default set to FALSE.
@@ -915,10 +1592,99 @@ class DbConnect:
         :param lock_table:
         :param days: if temp=True, the number of days that the temp table will be kept. Defaults to 7.
         :param internal: boolean flag for internal processes
+        :param chunksize: if set, returns a generator of DataFrames of at most chunksize rows (see iter_query)
+        :param columnar: if True, builds the DataFrame from typed column buffers via arrow_query instead of from a
+        list of row tuples; lower peak memory and typed (non-object) columns on large results
+        :param cache: see query; only applies when cache_results is set
+        :param timeout: seconds the query may run before it is cancelled; see query
         :return:
         """
+        if chunksize:
+            return self.iter_query(query, batch_size=chunksize, strict=strict, internal=internal, as_df=True,
+                                   timeout=timeout)
+
+        if columnar:
+            return self.arrow_query(query, strict=strict, internal=internal, timeout=timeout).to_pandas()
+
         return self.query(query, timeme=timeme, permission=permission, temp=temp, strict=strict, no_comment=no_comment,
-                          comment=comment, lock_table=lock_table, return_df=True, days=days, internal=internal)
+                          comment=comment, lock_table=lock_table, return_df=True, days=days, internal=internal,
+                          cache=cache, timeout=timeout)
+
+    def __clone(self):
+        # type: (DbConnect) -> DbConnect
+        """
+        Opens another session with this connection's parameters (see inherits_from). Log cleanup and reconciliation
+        are left to self.
+        :return: DbConnect
+        """
+        return DbConnect(inherits_from=self, port=self.port, use_native_driver=self.use_native_driver, quiet=True,
+                         log_reconcile_every=None, log_reconcile_seconds=None, log_reconcile_on_disconnect=False,
+                         pooled=self.pooled, pool_min_size=self.pool_min_size, pool_max_size=self.pool_max_size,
+                         pool_idle_timeout=self.pool_idle_timeout, cleanup=False)
+
+    def run_parallel(self, queries, max_workers=4, return_df=True, **kwargs):
+        # type: (DbConnect, list, int, bool, **object) -> list
+        """
+        Runs independent queries at the same time, each on its own session with this connection's parameters.
+        New and dropped tables are logged as usual and added to this DbConnect's tables_created/tables_dropped, and the
+        queries are added to its queries, in input order. Queries that depend on each other (ex. temp tables) must be
+        run with query instead.
+        :param queries: list of sql query strings
+        :param max_workers: number of sessions running queries at once; defaults to 4
+        :param return_df: if True, each result's data is a Pandas DataFrame, otherwise a list of rows; defaults to True
+        :param kwargs: other query parameters (ex. temp, days, permission), applied to every query
+        :return: list of ParallelResult(query, data, columns, query_time, seconds, error) in the order of queries;
+        error is None or the exception the query failed with
+        """
+        kwargs.setdefault('timeme', False)
+        kwargs['strict'] = False
+        kwargs['internal'] = False
+
+        sessions = threading.local()
+        workers = list()
+        workers_lock = threading.Lock()
+
+        def run_one(query_string):
+            worker = getattr(sessions, 'db', None)
+            if worker is None:
+                worker = self.__clone()
+                sessions.db = worker
+                with workers_lock:
+                    workers.append(worker)
+
+            start = time.perf_counter()
+            try:
+                worker.query(query_string, **kwargs)
+            except (Exception, SystemExit) as e:
+                # Internal bookkeeping queries are strict and exit on failure; keep that to this query's result
+                return None, ParallelResult(query_string, None, None, None, time.perf_counter() - start, e)
+
+            qry = worker.queries[-1]
+            data = qry.dfquery() if return_df and qry.data_columns else qry.data
+            return qry, ParallelResult(query_string, data, qry.data_columns, qry.query_time,
+                                       time.perf_counter() - start, qry.error)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers,
+                                                   thread_name_prefix='pysqldb3_parallel') as executor:
+            outcomes = list(executor.map(run_one, queries))
+
+        for worker in workers:
+            if worker.conn:
+                worker.disconnect(True)
+
+        results = list()
+        for qry, result in outcomes:
+            if qry is not None:
+                self.queries.append(qry)
+                self.tables_created += [nt for nt in qry.new_tables]
+                self.tables_dropped += [dt for dt in qry.dropped_tables]
+                self.last_query = qry.query_string
+                self.__update_result_cache(qry, None)
+                self.__update_catalog_cache(qry)
+                self.query_stats.record(qry)
+            results.append(result)
+
+        return results
 
     def print_last_query(self):
         """
@@ -932,7 +1698,7 @@ class DbConnect:
     """
 
     def dataframe_to_table_schema(self, df, table, schema=None, overwrite=False, temp=True, allow_max_varchar=False,
-                                  column_type_overrides=None, days=7):
+                                  column_type_overrides=None, days=7, tight_types=False):
 
         """
         Translates Pandas DataFrame into empty database table.
@@ -946,29 +1712,56 @@ class DbConnect:
                 raw column name as that type in the query, regardless of the pandas/postgres/sql server automatic
                 detection.
         :param days: if temp=True, the number of days that the temp table will be kept. Defaults to 7.
+        :param tight_types: if True, profiles the values to use the smallest type that holds them (boolean,
+                smallint/int/bigint, numeric(p, s), date, timestamp, varchar(longest value)) instead of the
+                bigint/float/timestamp/varchar mapping of the pandas dtypes; defaults to False
         :return: Table schema that was created from DataFrame
         """
-        if not schema:
-            schema = self.default_schema
-
-        input_schema = list()
-
         if allow_max_varchar:
             allowed_length = VARCHAR_MAX[self.type]
         else:
             allowed_length = 500
 
         # Parse df for schema
-        for col in df.dtypes.items():
-            col_name, col_type = col[0], type_decoder(col[1], varchar_length=allowed_length)
+        if tight_types:
+            column_types = [(p.name, p.sql_type(varchar_length=allowed_length, tight=True, db_type=self.type),
+                             p.rows == p.nulls) for p in profile_dataframe(df)]
+        else:
+            column_types = [(col_name, type_decoder(col_type, varchar_length=allowed_length),
+                             df[col_name].value_counts().empty) for col_name, col_type in df.dtypes.items()]
+
+        return self.__create_table_from_types(column_types, table, schema=schema, overwrite=overwrite, temp=temp,
+                                              allowed_length=allowed_length,
+                                              column_type_overrides=column_type_overrides, days=days)
+
+    def __create_table_from_types(self, column_types, table, schema=None, overwrite=False, temp=True,
+                                  allowed_length=500, column_type_overrides=None, days=7):
+        # type: (DbConnect, list, str, str, bool, bool, int, dict, int) -> list
+        """
+        Creates an empty table from inferred column types; shared by dataframe_to_table_schema and csv_to_table
+        :param column_types: list of (raw column name, SQL type, True if the column has no values)
+        :param table: Table name to be used in database
+        :param schema: Database schema to use for destination in database (defaults database object's default schema)
+        :param overwrite: If table exists in database will overwrite if True (defaults to False)
+        :param temp: Optional flag to make table as not-temporary (defaults to True)
+        :param allowed_length: length of varchar columns
+        :param column_type_overrides: Dict of type key=column name, value=column type
+        :param days: if temp=True, the number of days that the temp table will be kept. Defaults to 7.
+        :return: Table schema that was created
+        """
+        if not schema:
+            schema = self.default_schema
+
+        input_schema = list()
 
+        for col_name, col_type, empty in column_types:
             # check if column is empty - if so force string
-            s = df[col_name].value_counts()
-            if s.empty:
+            if empty:
                 col_type = f'varchar ({allowed_length})'
 
             # autodetect date and force to text (common error)
-            if 'date' in col_name.lower() and col_type in ('int', 'bigint', 'float'):
+            if 'date' in str(col_name).lower() and col_type.split('(')[0].strip() in ('smallint', 'int', 'bigint',
+                                                                                      'float', 'numeric'):
                 col_type = 'varchar(500)'
 
             #clean col_name to check against overrides and insert
@@ -993,7 +1786,8 @@ class DbConnect:
         return input_schema
 
     def dataframe_to_table(self, df, table, table_schema=None, schema=None, overwrite=False, temp=True,
-                           allow_max_varchar=False, column_type_overrides=None, days=7):
+                           allow_max_varchar=False, column_type_overrides=None, days=7, bulk=True, batch_size=10000,
+                           tight_types=False):
         """
         Adds data from Pandas DataFrame to existing table
         :param df: Pandas DataFrame to be added to database
@@ -1008,6 +1802,12 @@ class DbConnect:
                 detection. **Will not override a custom table_schema, if inputted**
         :param days: if temp=True and table schema needs to be created, the number of days that the temp table will be
                      kept. Defaults to 7.
+        :param bulk: if True (default), streams the rows in one transaction (COPY FROM STDIN on PG, executemany batches
+                     on MS, fast_executemany on Azure); nothing is added if any row fails. If False, sends one INSERT
+                     per row and skips rows that fail.
+        :param batch_size: rows sent per round trip when bulk=True; defaults to 10000
+        :param tight_types: if True and table schema needs to be created, uses the smallest type that holds each
+                            column's values (see dataframe_to_table_schema); defaults to False
         :return: None
         """
 
@@ -1018,11 +1818,60 @@ class DbConnect:
             table_schema = self.dataframe_to_table_schema(df, table, overwrite=overwrite, schema=schema, temp=temp,
                                                           allow_max_varchar=allow_max_varchar,
                                                           column_type_overrides=column_type_overrides,
-                                                          days=days)
+                                                          days=days, tight_types=tight_types)
 
         # Insert data
         print('Reading data into Database\n')
 
+        if bulk:
+            self.__bulk_insert(schema, table, [i[0] for i in table_schema], dataframe_bulk_rows(df),
+                               batch_size=batch_size)
+        else:
+            self.__insert_rows(df, schema, table, table_schema)
+
+        df = self.dfquery(f"SELECT COUNT(*) as cnt FROM {schema}.{table}", timeme=False, internal = True)
+        print(f'\n{df.cnt.values[0]} rows added to {schema}.{table}\n')
+
+    def __bulk_insert(self, schema, table, columns, rows, batch_size=10000, bulk_copy=False):
+        # type: (DbConnect, str, str, list, iter, int, bool) -> Query
+        """
+        Adds rows to an existing table in one transaction: COPY FROM STDIN on PG, executemany batches on MS,
+        fast_executemany on Azure
+        :param schema: schema
+        :param table: table name
+        :param columns: column names, in the order of the values in each row
+        :param rows: iterable of tuples of bulk_cell values (str or None)
+        :param batch_size: rows sent per round trip
+        :param bulk_copy: if True, columns must be every column of the table, in order; MS uses pymssql's bulk copy
+        :return: Query
+        """
+        return self.__run_batches([(self.__bulk_insert_sql(schema, table, columns, bulk_copy=bulk_copy), rows)],
+                                  page_size=batch_size, strict=False, timeme=False, internal=True)
+
+    def __bulk_insert_sql(self, schema, table, columns, bulk_copy=False):
+        # type: (DbConnect, str, str, list, bool) -> str
+        """
+        Statement __bulk_insert sends its rows with; see __bulk_insert
+        :return: str
+        """
+        column_list = ', '.join('"{}"'.format(c) for c in columns)
+
+        if self.type == PG:
+            return f'COPY {schema}.{table} ({column_list}) FROM STDIN WITH (FORMAT csv)'
+        elif bulk_copy:
+            return f'INSERT BULK {schema}.{table}'
+        else:
+            placeholder = '?' if self.type == AZ else '%s'
+            return f'INSERT INTO {schema}.{table} ({column_list}) VALUES ({", ".join([placeholder] * len(columns))})'
+
+    def __insert_rows(self, df, schema, table, table_schema):
+        # type: (DbConnect, pd.DataFrame, str, str, list) -> None
+        """
+        Adds a DataFrame to an existing table with one INSERT per row; rows that fail are skipped
+        :return: None
+        """
+        from tqdm import tqdm
+
         for _, row in tqdm(df.iterrows()):
             # Clean up empty cells and prime for input into db
             row = row.replace({np.nan: None})
@@ -1034,13 +1883,11 @@ class DbConnect:
                 VALUES ({row_values})
             """, strict=False, timeme=False, internal = True)
 
-        df = self.dfquery(f"SELECT COUNT(*) as cnt FROM {schema}.{table}", timeme=False, internal = True)
-        print(f'\n{df.cnt.values[0]} rows added to {schema}.{table}\n')
-
     def csv_to_table(self, input_file=None, overwrite=False, schema=None, table=None, temp=True, sep=',',
-                     long_varchar_check=False, column_type_overrides=None, days=7, **kwargs):
+                     long_varchar_check=False, column_type_overrides=None, days=7, batch_size=10000,
+                     tight_types=False, workers=1, checkpoint=False, **kwargs):
         """
-        Imports csv file to database. This uses pandas datatypes to generate the table schema.
+        Imports csv file to database. Column types are inferred from the whole file in one pass (see inference.py).
         :param input_file: File path to csv file; if None, prompts user input
         :param overwrite: If table exists in database, will overwrite; defaults to False
         :param schema: Schema of table; if None, defaults to db's default schema
@@ -1052,19 +1899,20 @@ class DbConnect:
         raw column name as that type in the query, regardless of the pandas/postgres/sql server automatic
         detection. **Will not override a custom table_schema, if inputted**
         :param days: if temp=True, the number of days that the temp table will be kept. Defaults to 7.
+        :param batch_size: rows read, profiled and sent per round trip; defaults to 10000
+        :param tight_types: if True, uses the smallest type that holds each column's values (boolean,
+        smallint/int/bigint, numeric(p, s), date, timestamp, varchar(longest value)); defaults to False
+        :param workers: if more than 1, large files are split into up to this many newline-aligned parts that are
+        profiled and loaded at the same time, each on its own connection, then added to the table in one transaction.
+        Compressed files are loaded with one worker; defaults to 1
+        :param checkpoint: if True, each batch is committed together with the load's progress in
+        schema.stg_{table}_checkpoint. If the load stops partway, calling csv_to_table again with the same file and
+        batch_size resumes after the last committed batch instead of starting over. Without a checkpoint, a load
+        that fails partway drops the table; defaults to False
         :param **kwargs: parameters to pass to pandas for read csv (ex. skiprows=1)
         :return:
         """
 
-        def contains_long_columns(df2):
-            for c in list(df2.columns):
-                if df2[c].dtype in ('O','object', 'str'):
-                    if df2[c].apply(lambda x: len(x) if x else 0).max() > 500:
-                        print('Varchar column with length greater than 500 found; allowing max varchar length.')
-                        return True
-
-            return False
-
         if not schema:
             schema = self.default_schema
 
@@ -1074,69 +1922,359 @@ class DbConnect:
         if not table:
             table = os.path.basename(input_file).split('.')[0]
 
-        if not overwrite and self.table_exists(schema=schema, table=table):
+        checkpoint_table = f'stg_{table}_checkpoint'
+        progress = self.__read_checkpoint(input_file, schema, table, checkpoint_table, batch_size) if checkpoint \
+            else None
+
+        if not progress and not overwrite and self.table_exists(schema=schema, table=table):
             print('Must set overwrite=True; table already exists.')
             return
 
-        # Use pandas to get existing data and schema
-        # Check for varchar columns > 500 in length
-        allow_max = False
-        if os.path.getsize(input_file) > 1000000:
-            data = pd.read_csv(input_file, iterator=True, chunksize=10 ** 15, sep=sep, **kwargs)
-            df = data.get_chunk(1000)
-
-            # Check for long column iteratively
-            while df is not None and long_varchar_check:
-                if contains_long_columns(df):
-                    allow_max = True
-                    break
-
-                df = data.get_chunk(1000)
+        # Parts are split on newline bytes, which multi-byte encodings and compressed files don't have
+        unpartitioned = UNPARTITIONED_CSV_KWARGS & set(kwargs)
+        if str(kwargs.get('encoding', '')).lower().replace('_', '-').startswith(('utf-16', 'utf-32')):
+            unpartitioned.add('encoding')
+        if str(input_file).lower().endswith(COMPRESSED_CSV_EXTENSIONS):
+            unpartitioned.add('compression')
+
+        partitions = list()
+        if workers > 1 and checkpoint:
+            print('Loading with one worker; checkpointed loads commit their batches in file order.')
+        elif workers > 1 and unpartitioned:
+            print(f'Loading with one worker; files read with {", ".join(sorted(unpartitioned))} are not split.')
+        elif workers > 1:
+            partitions = csv_partitions(input_file, workers, quotechar=kwargs.get('quotechar', '"'))
+
+        if progress:
+            # The table was created by the load being resumed
+            table_schema = [[c, t] for c, t in self.get_table_columns(table, schema=schema) if c != 'ogc_fid']
         else:
-            df = pd.read_csv(input_file, sep=sep, **kwargs)
-            allow_max = long_varchar_check and contains_long_columns(df)
+            # Profile every column in one pass, batch_size rows at a time
+            if len(partitions) > 1:
+                def profile_partition(partition):
+                    with partition.open() as f:
+                        return profile_csv(f, sep=sep, chunksize=batch_size, **dict(kwargs))
+
+                with concurrent.futures.ThreadPoolExecutor(max_workers=len(partitions),
+                                                           thread_name_prefix='pysqldb3_profile') as executor:
+                    profiles = merge_profiles(executor.map(profile_partition, partitions))
+            else:
+                profiles = profile_csv(input_file, sep=sep, chunksize=batch_size, **dict(kwargs))
+            profiles = [p for p in profiles if p.name != 'ogc_fid']
+
+            # Check for varchar columns > 500 in length
+            allow_max = long_varchar_check and any(p.max_length > 500 and p.sql_type().startswith('varchar')
+                                                   for p in profiles)
+            if allow_max:
+                print('Varchar column with length greater than 500 found; allowing max varchar length.')
+
+            allowed_length = VARCHAR_MAX[self.type] if allow_max else 500
+            table_schema = self.__create_table_from_types(
+                [(p.name, p.sql_type(varchar_length=allowed_length, tight=tight_types, db_type=self.type),
+                  p.rows == p.nulls) for p in profiles], table,
+                schema=schema, overwrite=overwrite, temp=temp, allowed_length=allowed_length,
+                column_type_overrides=column_type_overrides, days=days)
+
+            if checkpoint:
+                progress = self.__create_checkpoint(input_file, schema, checkpoint_table, batch_size, days=days)
+
+        # Stream the file straight into the table
+        try:
+            if len(partitions) > 1:
+                success = self.__parallel_copy_csv_to_table(partitions, schema=schema, table=table,
+                                                            table_schema=table_schema, sep=sep,
+                                                            batch_size=batch_size, days=days, **kwargs)
+            else:
+                # A resumed load skips the batches it committed, read by pandas just as they were the first time, so
+                # its rows line up with what was loaded (blank lines, quoted newlines and all)
+                if progress:
+                    progress['skip_batches'] = progress['batch_id']
 
-        if 'ogc_fid' in df.columns:
-            df = df.drop('ogc_fid', 1)
+                success = self.__copy_csv_to_table(input_file, schema=schema, table=table, table_schema=table_schema,
+                                                   sep=sep, batch_size=batch_size, days=days, checkpoint=progress,
+                                                   **kwargs)
 
-        # Calls dataframe_to_table_schema fn
-        table_schema = self.dataframe_to_table_schema(df, table, overwrite=overwrite, schema=schema, temp=temp,
-                                                      allow_max_varchar=allow_max,
-                                                      column_type_overrides=column_type_overrides,
-                                                      days=days)
+        except SystemExit:
+            success = False
+        except Exception as e:
+            print(e)
+            success = False
+
+        if not success:
+            # Batches commit as they load; with no checkpoint to resume from, don't leave part of the file behind
+            if not checkpoint:
+                self.drop_table(schema=schema, table=table, strict=False, internal=True)
+            raise AssertionError(
+                'Bulk CSV loading failed.'.format(schema, table)
+            )
 
-        # For larger files use GDAL to import
-        if df.shape[0] > 999:
+    def __parallel_copy_csv_to_table(self, partitions, schema, table, table_schema, sep=',', batch_size=10000, days=7,
+                                     **kwargs):
+        # type: (DbConnect, list, str, str, list, str, int, int, **str) -> bool
+        """
+        Loads each partition of a csv into its own copy of the table (<table>_p<n>) on its own connection with
+        __copy_csv_to_table, then adds them all to the table in one transaction, so the table gets either every row or
+        none. Columns a partition had to change to varchar are changed in the table first.
+        :param partitions: list of CsvPartition
+        :param schema: schema of the table
+        :param table: table created from table_schema
+        :param table_schema: schema of dataframe (returned from dataframe_to_table_schema)
+        :param sep: Separator for csv file
+        :param batch_size: rows read and sent per round trip
+        :param days: if temp=True, the number of days that the temp table will be kept. Defaults to 7.
+        :param **kwargs: parameters to pass to pandas for read csv
+        :return: bool, True if every row was loaded
+        """
+        parts = [f'{table}_p{i}' for i in range(len(partitions))]
+        column_list = ', '.join(f'"{c[0]}"' for c in table_schema)
+        create_columns = ', '.join(f'"{c[0]}" {c[1]}' for c in table_schema)
+
+        def load(i):
+            worker = self.__clone()
             try:
-                temp_file = os.path.dirname(input_file)+'\\'f'_temp_data_{datetime.datetime.now().strftime("%Y%m%d%H%M%S")}.csv'
+                worker.drop_table(schema=schema, table=parts[i], strict=False, internal=True)
+                worker.query(f'CREATE TABLE {schema}.{parts[i]} ({create_columns})', timeme=False, days=days,
+                             internal=True)
+                with partitions[i].open() as f:
+                    return worker.__copy_csv_to_table(f, schema=schema, table=parts[i], table_schema=table_schema,
+                                                      sep=sep, batch_size=batch_size, days=days, **kwargs)
+            except (Exception, SystemExit) as e:
+                print(e)
+                return False
+            finally:
+                if worker.conn:
+                    worker.disconnect(True)
+
+        print(f'Loading {len(partitions)} parts of the file at once...')
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(partitions),
+                                                   thread_name_prefix='pysqldb3_load') as executor:
+            success = all(list(executor.map(load, range(len(partitions)))))
+
+        try:
+            if success:
+                # Columns a part had to load as varchar can only be merged as varchar
+                types = dict(self.get_table_columns(table, schema=schema))
+                changed = {c for part in parts for c, t in self.get_table_columns(part, schema=schema)
+                           if c in types and t != types[c]}
+                self.__columns_to_varchar(schema, table, table_schema, [c[0] for c in table_schema if c[0] in changed])
+
+                # One statement, so the rows of every part become visible together
+                selects = ' UNION ALL '.join(f'SELECT {column_list} FROM {schema}.{part}' for part in parts)
+                qry = self.__run_batches([(f'INSERT INTO {schema}.{table} ({column_list}) {selects}', None)],
+                                         strict=False, timeme=False, days=days, internal=True)
+                success = not qry.error
+        finally:
+            for part in parts:
+                self.drop_table(schema=schema, table=part, strict=False, internal=True)
+
+        if success:
+            df = self.dfquery(f"SELECT COUNT(*) as cnt FROM {schema}.{table}", timeme=False, internal=True)
+            print(f'\n{df.cnt.values[0]} rows added to {schema}.{table}\n')
+        return success
+
+    def __copy_csv_to_table(self, input_file, schema, table, table_schema, sep=',', batch_size=10000, days=7,
+                            checkpoint=None, **kwargs):
+        # type: (DbConnect, str, str, str, list, str, int, int, Optional[dict], **str) -> bool
+        """
+        Streams a csv into an existing table batch_size rows at a time: COPY FROM STDIN on PG, bulk copy on MS,
+        fast_executemany on Azure. Values are checked against the table's types as they are read; rows that would be
+        rejected (and any batch the database rejects) go to a varchar staging table instead and are moved over with
+        the same casts as _bulk_file_to_table.
+        :param input_file: Source CSV filepath or file object
+        :param schema: schema of the table
+        :param table: table created from table_schema
+        :param table_schema: schema of dataframe (returned from dataframe_to_table_schema)
+        :param sep: Separator for csv file
+        :param batch_size: rows read and sent per round trip
+        :param days: if temp=True, the number of days that the temp table will be kept. Defaults to 7.
+        :param checkpoint: progress of a checkpointed load (see __read_checkpoint), or None. Each batch is committed
+        in one transaction with the update to the checkpoint table that counts it, and the first skip_batches batches
+        of input_file are skipped. On failure the staging and checkpoint tables are kept for the next run.
+        :param **kwargs: parameters to pass to pandas for read csv
+        :return: bool, True if every row was loaded
+        """
+        print('Bulk loading data...')
 
+        columns = [c[0] for c in table_schema]
+        column_types = [c[1] for c in table_schema]
+        stg_table = f'stg_{table}'
+        staged = checkpoint['rows_staged'] if checkpoint else 0
+
+        def stage(rows):
+            if not staged:
+                self.__create_staging_table(schema, stg_table, columns, days=days)
+            qry = self.__bulk_insert(schema, stg_table, columns, rows, batch_size=batch_size)
+            if qry.error:
+                raise AssertionError(f'Staging rows in {schema}.{stg_table} failed.')
+            return staged + len(rows)
+
+        def checkpoint_update(batch_id, rows_read, rows_staged, finished=0):
+            return CHECKPOINT_UPDATE_QUERY.format(schema=schema, table=checkpoint['table'], batch_id=batch_id,
+                                                  rows_read=rows_read, rows_staged=rows_staged, finished=finished)
+
+        def commit_batch(rows, failed, read):
+            # The rows and the checkpoint update that counts them commit together, so a batch is never applied twice.
+            # MS's bulk copy isn't part of the transaction; checkpointed batches use INSERT there.
+            if failed and not staged:
+                self.__create_staging_table(schema, stg_table, columns, days=days)
+            batches = [(self.__bulk_insert_sql(schema, table, columns, bulk_copy=self.type == PG), rows)] if rows \
+                else list()
+            if failed:
+                batches.append((self.__bulk_insert_sql(schema, stg_table, columns), failed))
+            batches.append((checkpoint_update(batch_id=checkpoint['batch_id'] + 1,
+                                              rows_read=checkpoint['rows_read'] + read,
+                                              rows_staged=staged + len(failed)), None))
+            return self.__run_batches(batches, page_size=batch_size, strict=False, timeme=False, internal=True)
+
+        # Read everything as text so ints with missing values aren't turned into floats
+        kwargs.setdefault('dtype', str)
+        skip = checkpoint.get('skip_batches', 0) if checkpoint else 0
 
-                with pd.read_csv(input_file, chunksize=10 ** 15, sep=sep, **kwargs) as reader:
-                    for chunk in reader:
-                        chunk.to_csv(temp_file, mode='a', index=False, header=True)
+        try:
+            with pd.read_csv(input_file, chunksize=batch_size, sep=sep, **kwargs) as reader:
+                for chunk in reader:
+                    if skip:
+                        skip -= 1
+                        continue
+
+                    if 'ogc_fid' in chunk.columns:
+                        chunk = chunk.drop(columns='ogc_fid')
+
+                    rows, failed = bulk_text_rows(chunk, column_types)
+
+                    if checkpoint:
+                        qry = commit_batch(rows, failed, len(chunk))
+                        if qry.error and rows:
+                            # Nothing from the batch was added; stage all of it
+                            failed = [tuple(None if pd.isnull(v) else v for v in row)
+                                      for row in chunk.itertuples(index=False, name=None)]
+                            qry = commit_batch(list(), failed, len(chunk))
+                        if qry.error:
+                            raise AssertionError(f'Batch {checkpoint["batch_id"] + 1} could not be loaded.')
+
+                        staged += len(failed)
+                        checkpoint['batch_id'] += 1
+                        checkpoint['rows_read'] += len(chunk)
+                        continue
+
+                    if rows:
+                        qry = self.__bulk_insert(schema, table, columns, rows, batch_size=batch_size, bulk_copy=True)
+                        if qry.error:
+                            # Nothing from the batch was added; stage all of it
+                            failed = [tuple(None if pd.isnull(v) else v for v in row)
+                                      for row in chunk.itertuples(index=False, name=None)]
+
+                    if failed:
+                        staged = stage(failed)
+
+            if staged and not (checkpoint and checkpoint['finished']):
+                print(f'{staged} rows could not be converted; loading them through {schema}.{stg_table}')
+
+                # Columns that still don't cast become varchar in the final table
+                table_schema = self.__sparse_data_types(schema, table, table_schema, stg_columns=columns)
+                cols = ', '.join(self.__double_cast_for_ints(i, columns, col_type) for i, (col_name, col_type) in
+                                 enumerate(table_schema))
+
+                batches = [(f"""
+                INSERT INTO {schema}.{table}
+                SELECT
+                {cols}
+                FROM {schema}.{stg_table}
+                """, None)]
+                if checkpoint:
+                    batches.append((checkpoint_update(checkpoint['batch_id'], checkpoint['rows_read'], staged,
+                                                      finished=1), None))
 
+                qry = self.__run_batches(batches, strict=False, timeme=False, days=days, internal=True)
+                if qry.error:
+                    raise AssertionError(f'Adding the rows in {schema}.{stg_table} failed.')
 
-                success = self._bulk_csv_to_table(input_file=temp_file, schema=schema, table=table,
-                                                  table_schema=table_schema, days=days)
-                os.remove(temp_file)
+            if staged:
+                self.drop_table(schema=schema, table=stg_table, internal=True)
 
-                if not success:
-                    raise AssertionError('Bulk CSV loading failed.'.format(schema, table))
+        except (SystemExit, AssertionError) as e:
+            print(e)
+            if checkpoint:
+                print(f'Progress is saved in {schema}.{checkpoint["table"]}; rerun with checkpoint=True to resume '
+                      f'after batch {checkpoint["batch_id"]}.')
+            elif staged:
+                self.drop_table(schema=schema, table=stg_table, strict=False, internal=True)
+            return False
 
-            except SystemExit:
-                raise AssertionError(
-                    'Bulk CSV loading failed.'.format(schema, table)
-                )
-            except Exception as e:
-                print(e)
-                raise AssertionError(
-                    'Bulk CSV loading failed.'.format(schema, table)
-                )
+        if checkpoint:
+            self.drop_table(schema=schema, table=checkpoint['table'], internal=True)
 
-        else:
-            # Calls dataframe_to_table fn
-            self.dataframe_to_table(df, table, table_schema=table_schema, overwrite=overwrite, schema=schema,
-                                    temp=temp, days=days)
+        df = self.dfquery(f"SELECT COUNT(*) as cnt FROM {schema}.{table}", timeme=False, internal=True)
+        print(f'\n{df.cnt.values[0]} rows added to {schema}.{table}\n')
+        return True
+
+    def __create_staging_table(self, schema, stg_table, columns, days=7):
+        # type: (DbConnect, str, str, list, int) -> None
+        """
+        Creates (or replaces) a staging table that holds any text: varchar on PG, nvarchar(max) on MS
+        :param schema: schema
+        :param stg_table: staging table name
+        :param columns: column names
+        :param days: if temp=True, the number of days that the temp table will be kept. Defaults to 7.
+        :return: None
+        """
+        varchar = 'varchar' if self.type == PG else 'nvarchar(max)'
+        self.drop_table(schema=schema, table=stg_table, strict=False, internal=True)
+        self.query(f"""CREATE TABLE {schema}.{stg_table} ({', '.join(f'"{c}" {varchar}' for c in columns)})""",
+                   timeme=False, days=days, internal=True)
+
+    def __create_checkpoint(self, input_file, schema, checkpoint_table, batch_size, days=7):
+        # type: (DbConnect, str, str, str, int, int) -> dict
+        """
+        Starts the checkpoint table of a new checkpointed load, replacing any left from an earlier one
+        :param input_file: File path to csv file
+        :param schema: schema of the table being loaded
+        :param checkpoint_table: name of the checkpoint table
+        :param batch_size: rows per batch
+        :param days: if temp=True, the number of days that the temp table will be kept. Defaults to 7.
+        :return: dict of the load's progress (see __read_checkpoint)
+        """
+        self.drop_table(schema=schema, table=checkpoint_table, strict=False, internal=True)
+        self.query(CHECKPOINT_CREATE_QUERY.format(schema=schema, table=checkpoint_table), timeme=False, days=days,
+                   internal=True)
+        self.query(CHECKPOINT_INSERT_QUERY.format(schema=schema, table=checkpoint_table,
+                                                  input_file=os.path.abspath(input_file).replace("'", "''"),
+                                                  file_size=os.path.getsize(input_file), batch_size=batch_size),
+                   timeme=False, internal=True)
+        return dict(table=checkpoint_table, batch_id=0, rows_read=0, rows_staged=0, finished=0)
+
+    def __read_checkpoint(self, input_file, schema, table, checkpoint_table, batch_size):
+        # type: (DbConnect, str, str, str, str, int) -> Optional[dict]
+        """
+        Gets the progress of an unfinished checkpointed load of input_file into schema.table. A checkpoint for another
+        file, a file that has changed size or another batch_size isn't resumed.
+        :param input_file: File path to csv file
+        :param schema: schema of the table being loaded
+        :param table: table being loaded
+        :param checkpoint_table: name of the checkpoint table
+        :param batch_size: rows per batch
+        :return: dict with table (the checkpoint table), batch_id (batches committed), rows_read (csv rows they
+        held), rows_staged (rows of them in the staging table) and finished (1 once the staged rows are added); None
+        if there is nothing to resume
+        """
+        if not self.table_exists(schema=schema, table=checkpoint_table) or \
+                not self.table_exists(schema=schema, table=table):
+            return None
+
+        self.query(CHECKPOINT_SELECT_QUERY.format(schema=schema, table=checkpoint_table), strict=False, timeme=False,
+                   internal=True)
+        if not self.internal_data:
+            return None
+
+        saved_file, file_size, saved_batch_size, batch_id, rows_read, rows_staged, finished = self.internal_data[0]
+        if (saved_file, int(file_size), int(saved_batch_size)) != (os.path.abspath(input_file),
+                                                                   os.path.getsize(input_file), batch_size):
+            print(f'{schema}.{checkpoint_table} is from a load of another file or batch_size; starting over.')
+            return None
+
+        print(f'Resuming the load of {input_file} into {schema}.{table} after batch {batch_id} ({rows_read} rows).')
+        return dict(table=checkpoint_table, batch_id=int(batch_id), rows_read=int(rows_read),
+                    rows_staged=int(rows_staged), finished=int(finished))
 
     def _bulk_csv_to_table(self, input_file=None, schema=None, table=None, table_schema=None, print_cmd=False, days=7):
         """
@@ -1154,7 +2292,7 @@ class DbConnect:
                                         table_schema=table_schema, print_cmd=print_cmd, excel_header=False, days=days)
 
     def csv_to_table_pyarrow(self, input_file=None, overwrite=False, schema=None, table=None, temp=True, sep=',',
-                     long_varchar_check=False, column_type_overrides=None, days=7, **kwargs):
+                     long_varchar_check=False, column_type_overrides=None, days=7, tight_types=False, **kwargs):
         """
         Imports csv file to database. This uses pyarrow datatypes to generate the table schema.
 
@@ -1171,6 +2309,8 @@ class DbConnect:
         raw column name as that type in the query, regardless of the pandas/postgres/sql server automatic
         detection. **Will not override a custom table_schema, if inputted**
         :param days: if temp=True, the number of days that the temp table will be kept. Defaults to 7.
+        :param tight_types: if True, uses the smallest type that holds each column's values (boolean,
+        smallint/int/bigint, numeric(p, s), date, timestamp, varchar(longest value)); defaults to False
         :param **kwargs: parameters to pass to pandas for read csv (ex. skiprows=1)
         :return:
         """
@@ -1189,6 +2329,7 @@ class DbConnect:
             return
 
         # Use pyarrow to get existing data and schema
+        import pyarrow.csv as pyarrowcsv
         data = pyarrowcsv.read_csv(input_file, parse_options=pyarrowcsv.ParseOptions(delimiter=sep),
                                    read_options=pyarrowcsv.ReadOptions(**kwargs))
         if '' in [col.name for col in data.schema]:
@@ -1203,7 +2344,7 @@ class DbConnect:
                                                               temp=temp,
                                                               allow_max_varchar=allow_max,
                                                               column_type_overrides=column_type_overrides,
-                                                              days=days)
+                                                              days=days, tight_types=tight_types)
         # Default to bulk importer
 
         try:
@@ -1222,7 +2363,7 @@ class DbConnect:
                                     temp=temp, days=days)
 
     def dataframe_to_table_schema_pyarrow(self, data, table, schema=None, overwrite=False, temp=True, allow_max_varchar=False,
-                                          column_type_overrides=None, days=7):
+                                          column_type_overrides=None, days=7, tight_types=False):
 
         """
         Translates Pandas DataFrame into empty database table.
@@ -1236,6 +2377,8 @@ class DbConnect:
                 raw column name as that type in the query, regardless of the pandas/postgres/sql server automatic
                 detection.
         :param days: if temp=True, the number of days that the temp table will be kept. Defaults to 7.
+        :param tight_types: if True, profiles the values to use the smallest type that holds them instead of the
+                pyarrow types; defaults to False
         :return: Table schema that was created from DataFrame
         """
         if not schema:
@@ -1249,8 +2392,12 @@ class DbConnect:
             allowed_length = 500
 
         # Parse df for schema
-        for col in data.schema:
-            col_name, col_type = col.name, type_decoder_pyarrow(col.type, varchar_length=allowed_length)
+        for i, col in enumerate(data.schema):
+            if tight_types:
+                col_name, col_type = col.name, ColumnProfile(col.name).update(data.column(i)).sql_type(
+                    varchar_length=allowed_length, tight=True, db_type=self.type)
+            else:
+                col_name, col_type = col.name, type_decoder_pyarrow(col.type, varchar_length=allowed_length)
 
             # clean col_name to check against overrides and insert
             col_name = clean_column(col_name)
@@ -1387,6 +2534,8 @@ class DbConnect:
         except subprocess.CalledProcessError as e:
             print(f"Ogr2ogr Output:\n{e.output}")
             return False
+        finally:
+            self.__invalidate_catalog(schema)
 
         try:
             if table_schema:
@@ -1402,19 +2551,6 @@ class DbConnect:
 
                 column_names = self.internal_queries[-1].data_columns
 
-                # check for null columns
-                for c in column_names:
-                    self.query(f'select count(case when "{c}" is not null then 1 else null end) nnulls from {schema}.stg_{table}',
-                               strict=False, timeme=False, internal=True)
-                    if self.internal_data[0][0] == 0:
-                        self.query(
-                            f'alter table {schema}.{table} alter "{c}" type varchar',
-                            strict=False, timeme=False, internal=True)
-
-                # fix datatype issues
-                table_schema = self.__sparse_data_types(schema, table, table_schema)
-
-
                 # Drop ogc_fid
                 if "ogc_fid" in column_names and "ogc_fid" not in [col_name for i, (col_name, col_type) in
                                                                    enumerate(table_schema)]:
@@ -1425,6 +2561,20 @@ class DbConnect:
                                                                    enumerate(table_schema)]:
                     column_names.remove("ogr_fid")
 
+                # One scan of the staging table finds empty columns and columns with values that won't cast
+                profile = self.__profile_staging_table(
+                    schema, f'stg_{table}',
+                    [(column_names[i], col_type) for i, (col_name, col_type) in enumerate(table_schema)])
+
+                for i, (col_name, col_type) in enumerate(table_schema):
+                    if profile.get(column_names[i], (1, 0))[0] == 0:
+                        self.query(f'alter table {schema}.{table} alter "{col_name}" type varchar',
+                                   strict=False, timeme=False, internal=True)
+
+                # fix datatype issues
+                table_schema = self.__sparse_data_types(schema, table, table_schema, stg_columns=column_names,
+                                                        profile=profile)
+
                 # Cast all fields to new type to move from stg to final table
                 # take staging field name from stg table
 
@@ -1492,51 +2642,175 @@ class DbConnect:
 
         return True
 
-    def __sparse_data_types(self, schema, table, table_schema):
-        columns = self.get_table_columns(table, schema=schema)
-        # get numeric types - 'bigint' 'double precision'
-        numeric_cols = [_[0] for _ in columns if _[1] in ('bigint', 'double precision')]
-
-        # need to unclean columns since stg_ hasnt been cleaned yet
-        stg_columns = {}
-        for c in self.get_table_columns('stg_'+table, schema=schema):
-            # clean: unclean
-            stg_columns[clean_column(c[0])] = c[0]
-        # update in memory schema - used in casting into final table
-        table_schema2 = []
-        updated = []
-        # try to cast field if fails convert to string
-        for column in numeric_cols:
-            try:
-                self.query(f'select cast("{stg_columns[column]}" as float) from {schema}.stg_{table}',
-                           strict=False, timeme=False, internal=True, no_print_out=True)
-            except Exception as e:
-                pass
-            # check if no data then query failed and there is a non-numberic data type
-            if not self.internal_data:
-                if self.type == 'PG':
-                    self.query(f"""
-                        alter table {schema}.{table} alter "{stg_columns[column]}" type varchar 
-                        using "{stg_columns[column]}"::varchar
-                    """, internal = True)
-                else:
-                    self.query(f"""
-                        alter table {schema}.{table} alter "{stg_columns[column]}" type varchar 
-                    """, internal = True)
-                updated.append(column)
-
-        for c in table_schema:
-            if not c[0] == updated:
-                table_schema2.append(c)
+    def __get_server_version(self):
+        # type: (DbConnect) -> int
+        """
+        Gets the Postgres server version number (ex. 160002); queried once per DbConnect
+        :return: int; 0 for SQL Server/Azure
+        """
+        if self.__server_version is None:
+            if self.type == PG:
+                self.query(PG_SERVER_VERSION_QUERY, timeme=False, internal=True)
+                self.__server_version = int(self.internal_data[0][0])
+            else:
+                self.__server_version = 0
+        return self.__server_version
+
+    def __staging_invalid_condition(self, column, col_type):
+        # type: (DbConnect, str, str) -> Optional[str]
+        """
+        Gets the condition matching staged values that won't cast to a column's final type
+        :param column: staging column name
+        :param col_type: final column type
+        :return: SQL condition, or None for text types, which hold any value. On Postgres < 16, numbers, dates and
+        booleans are checked with a regex and every value of other types matches (see __staging_unchecked).
+        """
+        # bigints are cast through float (see __double_cast_for_ints)
+        check_type = 'float' if col_type == 'bigint' else col_type
+        base_type = check_type.split('(')[0].strip().lower()
+
+        if RE_TEXT_TYPE.match(col_type.strip()):
+            return None
+        elif self.type != PG:
+            return MS_STAGING_INVALID_CONDITION.format(c=column, t=check_type)
+        elif self.__get_server_version() >= 160000:
+            return PG_STAGING_INVALID_CONDITION.format(c=column, t=check_type)
+        elif base_type in STAGING_NUMBER_TYPES:
+            return PG_STAGING_INVALID_NUMBER_CONDITION.format(c=column)
+        elif base_type.startswith(STAGING_DATE_TYPES):
+            return PG_STAGING_INVALID_DATE_CONDITION.format(c=column)
+        elif base_type in STAGING_BOOLEAN_TYPES:
+            return PG_STAGING_INVALID_BOOLEAN_CONDITION.format(c=column)
+        return PG_STAGING_UNCHECKED_CONDITION.format(c=column)
+
+    def __staging_unchecked(self, col_type):
+        # type: (DbConnect, str) -> bool
+        """
+        Checks if staged values can't be checked against a column's type (non-text types other than numbers, dates
+        and booleans on Postgres < 16), so the column is loaded as varchar if it has any staged values
+        :param col_type: final column type
+        :return: bool
+        """
+        return self.__staging_invalid_condition('c', col_type) == PG_STAGING_UNCHECKED_CONDITION.format(c='c')
+
+    def __profile_staging_table(self, schema, stg_table, columns):
+        # type: (DbConnect, str, str, list) -> dict
+        """
+        Profiles a varchar staging table in one scan: for each column, the number of values and the number of values
+        that won't cast to the column's final type. Uses pg_input_is_valid on Postgres 16+ (older servers check
+        numbers, dates and booleans with a regex; see __staging_invalid_condition) and TRY_CAST on SQL Server/Azure.
+        :param schema: schema of the staging table
+        :param stg_table: staging table
+        :param columns: list of (staging column name, final column type)
+        :return: dict of staging column name: (non-null count, invalid count); empty if the profile query failed
+        """
+        if not columns:
+            return dict()
+
+        selects = list()
+        for i, (c, col_type) in enumerate(columns):
+            condition = self.__staging_invalid_condition(c, col_type)
+            invalid = STAGING_INVALID_COLUMN.format(condition=condition) if condition else '0'
+            selects.append(f'{STAGING_NON_NULL_COLUMN.format(c=c)} as n{i}, {invalid} as x{i}')
+
+        self.query(STAGING_PROFILE_QUERY.format(columns=', '.join(selects), schema=schema, table=stg_table),
+                   strict=False, timeme=False, internal=True)
+
+        if not self.internal_data:
+            return dict()
+
+        row = self.internal_data[0]
+        return {c: (int(row[2 * i] or 0), int(row[2 * i + 1] or 0)) for i, (c, _) in enumerate(columns)}
+
+    def __invalid_staging_values(self, schema, stg_table, column, col_type, n=5):
+        # type: (DbConnect, str, str, str, str, int) -> list
+        """
+        Gets a few staged values that won't cast to a column's final type
+        :param schema: schema of the staging table
+        :param stg_table: staging table
+        :param column: staging column name
+        :param col_type: final column type
+        :param n: most values returned
+        :return: list of values
+        """
+        condition = self.__staging_invalid_condition(column, col_type)
+        if not condition:
+            return list()
+
+        qry = PG_STAGING_INVALID_VALUES_QUERY if self.type == PG else MS_STAGING_INVALID_VALUES_QUERY
+        self.query(qry.format(c=column, schema=schema, table=stg_table, condition=condition, n=n),
+                   strict=False, timeme=False, internal=True)
+        return [r[0] for r in self.internal_data or list()]
+
+    def __columns_to_varchar(self, schema, table, table_schema, columns):
+        # type: (DbConnect, str, str, list, list) -> list
+        """
+        Changes columns of the final table to varchar
+        :param schema: schema
+        :param table: table
+        :param table_schema: table schema used to cast staged values into the table
+        :param columns: column names (as in table_schema) to change
+        :return: table_schema with the columns' types changed to varchar
+        """
+        for column in columns:
+            if self.type == PG:
+                self.query(f"""
+                    alter table {schema}.{table} alter "{column}" type varchar 
+                    using "{column}"::varchar
+                """, internal=True)
             else:
-                table_schema2.append([column, 'varchar (500)'])
-        return table_schema2
+                self.query(f"""
+                    alter table {schema}.{table} alter "{column}" type varchar 
+                """, internal=True)
+
+        return [c if c[0] not in columns else [c[0], 'varchar (500)'] for c in table_schema]
+
+    def __sparse_data_types(self, schema, table, table_schema, stg_columns=None, profile=None):
+        # type: (DbConnect, str, str, list, list, dict) -> list
+        """
+        Changes columns of the final table to varchar where values in stg_<table> won't cast to the column's type.
+        Only a count of failing values per column (one scan for all columns) and a few sample values for the
+        columns that fail are fetched.
+        :param schema: schema
+        :param table: final table; its staging table is stg_<table>
+        :param table_schema: table schema used to cast staged values into the table
+        :param stg_columns: staging column names, in table_schema order; defaults to matching on clean_column
+        :param profile: result of __profile_staging_table, if already run
+        :return: table_schema with the types of changed columns set to varchar
+        """
+        stg_table = f'stg_{table}'
+
+        if stg_columns is None:
+            # need to unclean columns since stg_ hasnt been cleaned yet
+            unclean = {clean_column(c[0]): c[0] for c in self.get_table_columns(stg_table, schema=schema)}
+            stg_columns = [unclean.get(c[0], c[0]) for c in table_schema]
+
+        columns = [(stg_columns[i], col_type) for i, (col_name, col_type) in enumerate(table_schema)]
+        if profile is None:
+            profile = self.__profile_staging_table(schema, stg_table, columns)
+
+        updated = list()
+        for (col_name, _), (stg_column, col_type) in zip(table_schema, columns):
+            invalid = profile.get(stg_column, (0, 0))[1]
+            if invalid and self.__staging_unchecked(col_type):
+                print(f'{invalid} staged values in "{col_name}" can\'t be checked against {col_type} on this server; '
+                      f'loading it as varchar')
+                updated.append(col_name)
+            elif invalid:
+                examples = self.__invalid_staging_values(schema, stg_table, stg_column, col_type)
+                print(f'{invalid} values in "{col_name}" can\'t be cast to {col_type} (ex. '
+                      f'{", ".join(repr(v) for v in examples)}); loading it as varchar')
+                updated.append(col_name)
+
+        return self.__columns_to_varchar(schema, table, table_schema, updated)
 
 
     def xls_to_table(self, input_file=None, sheet_name=0, overwrite=False, schema=None, table=None, temp=True,
-                     column_type_overrides=None, days=7, **kwargs):
+                     column_type_overrides=None, days=7, batch_size=10000, tight_types=False, checkpoint=False,
+                     **kwargs):
         """
-        Imports xls/x file to database. This uses pandas datatypes to generate the table schema.
+        Imports xls/x file to database. xlsx/xlsm sheets are streamed a row at a time (see excel.py) with column types
+        inferred from every row; xls files, and reads that pass kwargs to pandas, use pandas datatypes.
         :param input_file: File path to csv file; if None, prompts user input
         :param sheet_name : str, int or None, defaults to the first sheet
         :param overwrite: If table exists in database, will overwrite; defaults to False
@@ -1547,6 +2821,13 @@ class DbConnect:
         raw column name as that type in the query, regardless of the pandas/postgres/sql server automatic
         detection.
         :param days: if temp=True, the number of days that the temp table will be kept. Defaults to 7.
+        :param batch_size: rows of an xlsx sheet read, profiled and sent per round trip; defaults to 10000
+        :param tight_types: if True, xlsx columns use the smallest type that holds their values (see csv_to_table);
+        defaults to False
+        :param checkpoint: if True, each batch of an xlsx sheet is staged together with the load's progress in
+        schema.stg_{table}_checkpoint. If the load stops partway, calling xls_to_table again with the same file and
+        batch_size resumes after the last committed batch; defaults to False
+        :param **kwargs: parameters to pass to pandas for read excel (ex. skiprows=1)
         :return:
         """
 
@@ -1573,6 +2854,17 @@ class DbConnect:
             print(f'{schema}.{table} already exists. Use overwrite=True to replace.')
             return
 
+        if input_file.lower().endswith(('.xlsx', '.xlsm')) and not kwargs:
+            try:
+                self.__xlsx_to_table(input_file, sheet_name=sheet_name, schema=schema, table=table,
+                                     overwrite=overwrite, temp=temp, column_type_overrides=column_type_overrides,
+                                     days=days, batch_size=batch_size, tight_types=tight_types,
+                                     checkpoint=checkpoint)
+            except Exception as e:
+                print(e)
+            return
+
+        # The workbook is opened once, for the sheet names and the sheet
         ef = pd.ExcelFile(input_file)
         multi_sheet = len(ef.sheet_names) > 1
 
@@ -1584,7 +2876,8 @@ class DbConnect:
 
 
         try:
-            df = pd.read_excel(input_file, sheet_name=sheet_name, **kwargs)
+            with ef:
+                df = pd.read_excel(ef, sheet_name=sheet_name, **kwargs)
 
             # Match previous styles
             cols = []
@@ -1629,6 +2922,118 @@ class DbConnect:
             print(e)
 
 
+    def __xlsx_to_table(self, input_file, sheet_name=0, schema=None, table=None, overwrite=False, temp=True,
+                        column_type_overrides=None, days=7, batch_size=10000, tight_types=False, checkpoint=False):
+        # type: (DbConnect, str, Union[str, int], str, str, bool, bool, dict, int, int, bool, bool) -> None
+        """
+        Streams an xlsx sheet into a varchar staging table batch_size rows at a time, profiling each column as the rows
+        go by, then creates the table from the profiles and moves the rows over with the same casts as
+        _bulk_file_to_table. The workbook is parsed once and never held in memory whole.
+        :param input_file: File path to xlsx file
+        :param sheet_name: sheet name or position
+        :param schema: Schema of table
+        :param table: Name for final database table
+        :param overwrite: If table exists in database, will overwrite
+        :param temp: Boolean for temporary table
+        :param column_type_overrides: Dict of type key=column name, value=column type
+        :param days: if temp=True, the number of days that the temp table will be kept. Defaults to 7.
+        :param batch_size: rows read, profiled and sent per round trip
+        :param tight_types: if True, uses the smallest type that holds each column's values
+        :param checkpoint: if True, each batch is staged in one transaction with the update to the checkpoint table
+        that counts it. The staging table holds the committed batches until the table is created, so it is what a
+        resumed load checks for; its batches are read again for the profiles but not staged twice.
+        :return: None
+        """
+        stg_table = f'stg_{table}'
+        checkpoint_table = f'stg_{table}_checkpoint'
+        progress = self.__read_checkpoint(input_file, schema, stg_table, checkpoint_table, batch_size) if checkpoint \
+            else None
+        loaded = False
+
+        with XlsxSheet(input_file, sheet_name=sheet_name) as sheet:
+            if len(sheet.sheet_names) > 1:
+                print("""
+                Only the specified sheet (or 1st if not specified will be imported
+            """)
+
+            # Match previous styles
+            names = [c.strip().replace(' ', '_').replace('.', '_').replace(':', '_').replace('\n', '_')
+                     for c in sheet.columns]
+            keep = [i for i, c in enumerate(names) if c != 'ogc_fid']
+            columns = [clean_column(names[i]) for i in keep]
+            profiles = [ColumnProfile(names[i]) for i in keep]
+
+            print('Bulk loading data...')
+            if not progress:
+                self.__create_staging_table(schema, stg_table, columns, days=days)
+                if checkpoint:
+                    progress = self.__create_checkpoint(input_file, schema, checkpoint_table, batch_size, days=days)
+
+            try:
+                for batch_id, batch in enumerate(sheet.batches(batch_size)):
+                    if len(keep) < len(names):
+                        batch = [tuple(row[i] for i in keep) for row in batch]
+
+                    update_profiles(profiles, [pd.Series(values, dtype=object) for values in zip(*batch)])
+
+                    if not progress:
+                        qry = self.__bulk_insert(schema, stg_table, columns, batch, batch_size=batch_size,
+                                                 bulk_copy=True)
+                    elif batch_id < progress['batch_id']:
+                        # Staged by the load being resumed
+                        continue
+                    else:
+                        # The rows and the checkpoint update that counts them commit together (see
+                        # __copy_csv_to_table); every row of a sheet is staged
+                        rows_read = progress['rows_read'] + len(batch)
+                        qry = self.__run_batches([
+                            (self.__bulk_insert_sql(schema, stg_table, columns), batch),
+                            (CHECKPOINT_UPDATE_QUERY.format(schema=schema, table=checkpoint_table,
+                                                            batch_id=batch_id + 1, rows_read=rows_read,
+                                                            rows_staged=rows_read, finished=0), None)
+                        ], page_size=batch_size, strict=False, timeme=False, internal=True)
+                        if not qry.error:
+                            progress['batch_id'], progress['rows_read'] = batch_id + 1, rows_read
+
+                    if qry.error:
+                        raise AssertionError(f'Staging rows in {schema}.{stg_table} failed.')
+
+                # Excel dates are typed cells, so they keep a date type without tight_types (as pandas reads them)
+                timestamp = TIGHT_TYPES.get(self.type, TIGHT_TYPES['default'])[TIMESTAMP]
+                table_schema = self.__create_table_from_types(
+                    [(p.name, timestamp if not tight_types and p.kind in (DATE, TIMESTAMP) else
+                      p.sql_type(tight=tight_types, db_type=self.type), p.rows == p.nulls) for p in profiles],
+                    table, schema=schema, overwrite=overwrite, temp=temp,
+                    column_type_overrides=column_type_overrides, days=days)
+
+                # Columns with values that won't cast become varchar in the final table
+                table_schema = self.__sparse_data_types(schema, table, table_schema, stg_columns=columns)
+                cols = ', '.join(self.__double_cast_for_ints(i, columns, col_type) for i, (col_name, col_type) in
+                                 enumerate(table_schema))
+
+                self.query(f"""
+                INSERT INTO {schema}.{table}
+                SELECT
+                {cols}
+                FROM {schema}.{stg_table}
+                """, timeme=False, days=days, internal=True)
+                loaded = True
+
+            except SystemExit:
+                raise AssertionError('Bulk file loading failed.')
+
+            finally:
+                if loaded or not checkpoint:
+                    self.drop_table(schema=schema, table=stg_table, strict=False, internal=True)
+                if loaded and checkpoint:
+                    self.drop_table(schema=schema, table=checkpoint_table, strict=False, internal=True)
+                elif checkpoint:
+                    print(f'Progress is saved in {schema}.{checkpoint_table}; rerun with checkpoint=True to resume '
+                          f'after batch {progress["batch_id"]}.')
+
+        df = self.dfquery(f"SELECT COUNT(*) as cnt FROM {schema}.{table}", timeme=False, internal=True)
+        print(f'\n{df.cnt.values[0]} rows added to {schema}.{table}\n')
+
     def query_to_csv(self, query, output_file=None, strict=True, open_file=False, sep=',', quote_strings=True,
                      quiet=False, overwrite=False):
         """
@@ -1820,6 +3225,7 @@ class DbConnect:
         else:
             geo_j = df_to_geojson(query_df)
 
+        import plotly.express as px
         fig = px.choropleth(query_df,
                             geojson=geo_j,
                             locations=id_column,
@@ -1830,7 +3236,7 @@ class DbConnect:
         fig.show()
         return
 
-    def query_to_shp(self, query,  gpkg_tbl = None, path=None, shp_name=None, cmd=None, gdal_data_loc=GDAL_DATA_LOC,
+    def query_to_shp(self, query,  gpkg_tbl = None, path=None, shp_name=None, cmd=None, gdal_data_loc=None,
                      print_cmd=False, srid=2263, shp = True):
         """
         Exports query results to a shp file.
@@ -1973,7 +3379,7 @@ class DbConnect:
         self.allow_temp_tables = original_temp_flag
 
     def table_to_shp(self, table, schema=None, strict=True, path=None, shp_name=None, cmd=None,
-                     gdal_data_loc=GDAL_DATA_LOC, print_cmd=False, srid=2263):
+                     gdal_data_loc=None, print_cmd=False, srid=2263):
         """
         Exports table to a shp file. Generates query to query_to_shp.
         :param table: Database table name as string type
@@ -2042,7 +3448,7 @@ class DbConnect:
             self.disconnect(True)
 
     def shp_to_table(self, path=None, table=None, schema=None, shp_name=None, cmd=None,
-                     srid=2263, port=None, gdal_data_loc=GDAL_DATA_LOC, precision=False, private=False, temp=True,
+                     srid=2263, port=None, gdal_data_loc=None, precision=False, private=False, temp=True,
                      shp_encoding=None, print_cmd=False, days=7, zip=False):
         """
         Imports shape file to database. This uses GDAL to generate the table.
@@ -2088,13 +3494,14 @@ class DbConnect:
                         cmd=cmd, srid=srid, gdal_data_loc=gdal_data_loc, port=port)
 
         shp.read_shp(precision, private, shp_encoding, print_cmd, zip=zip)
+        self.__invalidate_catalog(schema)
 
         self.tables_created.append(f"{schema}.{table}")
 
         if temp:
             self.__run_table_logging([schema + "." + table], days=days)
 
-    def feature_class_to_table(self, path, table = None, schema=None, shp_name=None, gdal_data_loc=GDAL_DATA_LOC,
+    def feature_class_to_table(self, path, table = None, schema=None, shp_name=None, gdal_data_loc=None,
                                srid=2263, private=False, temp=True, fc_encoding=None, print_cmd=False,
                                days=7, skip_failures=''):
         """
@@ -2131,12 +3538,13 @@ class DbConnect:
                         skip_failures=skip_failures)
 
         shp.read_feature_class(private, fc_encoding=fc_encoding, print_cmd=print_cmd)
+        self.__invalidate_catalog(schema)
 
         if temp:
             self.__run_table_logging([schema + "." + table], days=days)
 
 
-    def query_to_gpkg(self, query, gpkg_tbl, gpkg_name = '', path=None, cmd=None,  gdal_data_loc=GDAL_DATA_LOC,
+    def query_to_gpkg(self, query, gpkg_tbl, gpkg_name = '', path=None, cmd=None,  gdal_data_loc=None,
                      print_cmd=False, srid=2263):
         """
         Exports query results to a geopackage (.gpkg) file.
@@ -2156,7 +3564,7 @@ class DbConnect:
         
 
     def table_to_gpkg(self, table, gpkg_name, gpkg_tbl = None, schema=None, path=None, cmd=None,
-                     gdal_data_loc=GDAL_DATA_LOC, print_cmd=False, srid=2263):
+                     gdal_data_loc=None, print_cmd=False, srid=2263):
         """
         Exports table to a geopackage file. Generates query to query_to_gpkg.
         :param table: Db table name as string type
@@ -2188,7 +3596,7 @@ class DbConnect:
                                  print_cmd=print_cmd, srid=srid)
     
     def gpkg_to_table(self, gpkg_name, gpkg_tbl, path=None, schema=None, table =None, 
-                     srid=2263, port=None, gdal_data_loc=GDAL_DATA_LOC, precision=False, private=False, temp=True,
+                     srid=2263, port=None, gdal_data_loc=None, precision=False, private=False, temp=True,
                      gpkg_encoding=None, print_cmd=False, days=7, bulk_upload = False):
         """
         Imports single geopackage table to database. This uses GDAL to generate the table.
@@ -2236,6 +3644,7 @@ class DbConnect:
             # bulk upload
             output_table_names = gpkg.read_gpkg_bulk(dbo = self, schema = schema, gpkg_encoding = gpkg_encoding, srid = srid,
                             gdal_data_loc=gdal_data_loc, precision = precision, private = private, print_cmd = print_cmd)
+            self.__invalidate_catalog(schema)
             
             for table in output_table_names.values():
 
@@ -2277,6 +3686,7 @@ class DbConnect:
         
             gpkg.read_gpkg(dbo = self, schema = schema, table = table, gpkg_tbl = gpkg_tbl, gpkg_encoding = gpkg_encoding, srid = srid,
                        gdal_data_loc=gdal_data_loc, precision = precision, private = private, print_cmd = print_cmd)
+            self.__invalidate_catalog(schema)
             
             if self.type == "MS":
             # rename geom columns if necessary (problem only identified in MS)
@@ -2312,7 +3722,7 @@ class DbConnect:
                 self.__run_table_logging([schema + "." + table], days=days)
 
     def gpkg_to_table_bulk(self, gpkg_name,  path=None, schema=None,
-                     srid=2263, port=None, gdal_data_loc=GDAL_DATA_LOC, precision=False, private=False, temp=True,
+                     srid=2263, port=None, gdal_data_loc=None, precision=False, private=False, temp=True,
                      gpkg_encoding=None, print_cmd=False, days=7):
 
         """
@@ -1,12 +1,19 @@
+import contextlib
 import csv
+import io
+import itertools
 import re
 import sys
+import threading
+import time
 
 import psycopg2
+import psycopg2.extras
 
 from .shapefile import *
 from .geopackage import *
-from .util import parse_table_string
+from .util import parse_table_string, batch_statements
+from .stats import approx_size
 import re
 import shlex
 import subprocess
@@ -17,6 +24,99 @@ RE_ENCAPSULATED_TABLE_NAME = r'((\[)([^#.])+?(\]))|((\")(.)+?(\"))'
 
 RE_NON_ENCAPSULATED_TABLE_NAME = r'([a-zA-Z_]+[\w]+)'
 
+# Server-side cursor names must be unique per connection so several iterators can be open at once
+SERVER_CURSOR_IDS = itertools.count(1)
+
+# T-SQL variable and cursor names must be unique within a bookkeeping batch
+BATCH_NAME_IDS = itertools.count(1)
+
+# INSERT ... VALUES %s templates can be sent with execute_values (many rows per statement)
+RE_VALUES_PLACEHOLDER = re.compile(r'\bvalues\s*%s', re.IGNORECASE)
+
+# COPY ... FROM STDIN statements are sent the parameter rows as csv
+RE_COPY_FROM_STDIN = re.compile(r'^\s*copy\b.+\bfrom\s+stdin\b', re.IGNORECASE | re.DOTALL)
+
+# INSERT BULK <table> statements bulk copy the parameter rows into every column of the table, in order (SQL Server)
+RE_INSERT_BULK = re.compile(r'^\s*insert\s+bulk\s+(\S+)\s*$', re.IGNORECASE)
+
+# Guards DbConnect.running_queries, which other threads read to cancel queries
+RUNNING_QUERIES_LOCK = threading.Lock()
+
+RE_CREATES_TEMP_TABLE = re.compile(r"""
+    (create\s+((global|local)\s+)?(temp|temporary)\s+table)  # PG create temp table
+    | (into\s+(temp|temporary)\s+)                          # PG select into temp
+    | ((create\s+table|into)\s+\[?\#)                        # MS #table
+""", re.VERBOSE | re.IGNORECASE)
+
+# Table detection patterns run after every non-internal query, so they are built and compiled once here
+RE_COMMENTS = re.compile(r'((/\*)+?[\w\W]+?(\*/)+)|(--.*)', re.IGNORECASE)
+
+RE_CREATE_TABLE = re.compile(r"""
+    (?<!\*)(?<!\*\s)(?<!--)(?<!--\s)
+    (create\s+table\s+)
+    (?!temp\s+|temporary|\s+)
+    (if\s+not\s+exists\s+)?
+    (
+        (({encaps} | {nonencaps})\.){sds}
+        (\[?\#{temp_mark}){tmp_time}
+        (({encapst} | {nonencaps})\s*){tbl_time}
+    )((as\s+select)|(\())\s?
+""".format(encaps=RE_ENCAPSULATED_SCHEMA_NAME, nonencaps=RE_NON_ENCAPSULATED_TABLE_NAME,
+           encapst=RE_ENCAPSULATED_TABLE_NAME, sds="{0,3}", tbl_time="{1}", tmp_time="{0}", temp_mark="{1,2}"),
+    re.VERBOSE | re.IGNORECASE)
+
+RE_SELECT_INTO = re.compile(r"""
+    (?<!\*)(?<!\*\s)(?<!--)(?<!--\s)                       # ignore comments
+    (select([.\n\w\*\s\",^,\[\],',!,=,+,(,)])+?into\s+)+?    # find select into
+    (?!temp\s+|temporary\s+)                                # lookahead for temp
+    (
+        (({encaps} | {nonencaps})\.){sds}
+        (\[?\#{temp_mark}){tmp_time}
+        (({encapst} | {nonencaps})\s+){tbl_time}
+    )
+    (?=from)                                                # lookahead for 'from'
+""".format(encaps=RE_ENCAPSULATED_SCHEMA_NAME, nonencaps=RE_NON_ENCAPSULATED_TABLE_NAME,
+           encapst=RE_ENCAPSULATED_TABLE_NAME, sds="{0,3}", tbl_time="{1}", tmp_time="{0}", temp_mark="{1,2}"),
+    re.VERBOSE | re.IGNORECASE)
+
+RE_DROP_TABLE = re.compile(r"""
+    (?<!--\s)(?<!--)(?<!\*\s)(?<!\*)
+    (\s?drop\s+table\s(if\s+exists\s+)?)
+    ((
+        (({encaps} | {nonencaps})\.)){sds}
+    (
+        (({encapst} | {nonencaps})){tbl_time}
+    ))(\s | \;)*?
+""".format(encaps=RE_ENCAPSULATED_SCHEMA_NAME, encapst=RE_ENCAPSULATED_TABLE_NAME,
+           nonencaps=RE_NON_ENCAPSULATED_TABLE_NAME, sds="{0,3}", tbl_time="{1}"),
+    re.VERBOSE | re.IGNORECASE)
+
+RE_RENAME_TABLE = re.compile(r"""
+    (?<!--\s)(?<!--)(?<!\*\s)(?<!\*)
+    (\s?alter\s+table\s+(if exists\s+)?)
+    ((
+        (({encaps} | {nonencaps})\.)){sds}
+    (
+        (({encaps} | {nonencaps})\s+){tbl_time}
+    ))
+    (rename\s+to\s+)
+    ((({encaps} | {nonencaps}))+)
+""".format(encaps=RE_ENCAPSULATED_SCHEMA_NAME, nonencaps=RE_NON_ENCAPSULATED_TABLE_NAME,
+           sds="{0,3}", tbl_time="{1}"),
+    re.VERBOSE | re.IGNORECASE)
+
+RE_SP_RENAME = re.compile(r"""
+    (?<!--\s)(?<!--)(?<!\*\s)(?<!\*)
+    (exec\s+sp_rename)(\s+?')
+    ((.)+?)
+    ('\s?,\s?')
+    ((.)*?)
+    ('\s?)(;)?
+    (?!,?\s*n?'(column|index)'?\s*)
+""", re.VERBOSE | re.IGNORECASE)
+
+RE_SP_RENAME_COLUMN_OR_INDEX = re.compile(r"""(,?\s*n?'(column|index)'?\s*)""", re.IGNORECASE)
+
 class Query:
     """
     Query class for use by DbConnect
@@ -35,13 +135,15 @@ class Query:
         if self.data:
             records = len(self.data)
 
-        return '- Query run {dt}\n Query time: {qt} \n * Returned {r} rows *'.format(
+        return '- Query run {dt}{c}\n Query time: {qt} \n * Returned {r} rows *'.format(
             dt=datetime.datetime.now(),
+            c=' (from cache)' if self.cached else '',
             r=records,
             qt=qt)
 
     def __init__(self, dbo, query_string, strict=True, permission=True, temp=True, comment='', no_comment=False,
-                 timeme=True, iterate=False, lock_table=None, internal=False, no_print_out=False):
+                 timeme=True, iterate=False, lock_table=None, internal=False, no_print_out=False, itersize=20000,
+                 cached_result=None, timeout=None, batches=None, page_size=1000):
         """
         :param dbo: DbConnect object
         :param query_string: String/unicode sql query to be run
@@ -51,8 +153,16 @@ class Query:
         :param comment: String to add to default comment
         :param no_comment:
         :param timeme: Flag for if table is temporary or permanent (defaults toTrue)
-        :param iterate:
+        :param iterate: if True, leaves the results on the cursor (server-side on PG) to be read with iter_data
         :param lock_table:
+        :param itersize: rows fetched per batch when iterate is True
+        :param cached_result: CachedResult from DbConnect's result cache; if given, the query is not run
+        :param timeout: seconds the query may run before it is cancelled (statement_timeout on PG, a timer that cancels
+        it on pymssql, the driver's query timeout on pyodbc); None for no limit
+        :param batches: list of (sql, param_rows) to run instead of query_string, in one transaction; param_rows is a
+        list of parameter tuples (the statement runs once per row, sent in bulk) or None for a plain statement.
+        query_string should then be the statements joined, and is used for new/dropped table detection.
+        :param page_size: rows sent per round trip when running batches
         """
         # Explicitly in __init__
         self.dbo = dbo
@@ -64,8 +174,12 @@ class Query:
         self.no_comment = no_comment
         self.timeme = timeme
         self.iterate = iterate
+        self.itersize = itersize
         self.lock_table = lock_table
         self.no_print_out = no_print_out
+        self.timeout = timeout
+        self.batches = batches
+        self.page_size = page_size
 
         # Other initialized variables
         self.query_start = datetime.datetime.now()
@@ -79,10 +193,275 @@ class Query:
         self.renamed_tables = list()
         self.dropped_tables = list()
         self.current_cur = None
+        self.cached = False
+        self.error = None
+        # Seconds spent per phase (see stats.PHASES), rows and approximate bytes fetched
+        self.timings = dict()
+        self.rows = 0
+        self.bytes_fetched = 0
+        self.cancel_requested = False
+        self.cancelled = False
+        self.timed_out = False
+        self.timeout_expired = False
+        self.running_conn = None
+        self.running_cur = None
+        # Notices/messages sent by the server while the query ran (see server_messages)
+        self.messages = list()
+        # Post-query statements (grants, comments, log and index renames), sent by DbConnect as one batch
+        self.bookkeeping = list()
+
+        if cached_result is not None:
+            self.__load_cached_result(cached_result)
+            return
 
         # Run (execute) query, comments, and logging.
-        self.__run_query(internal)
-        self.__auto_comment()
+        restore_timeout = self.__apply_timeout()
+        try:
+            self.__run_query(internal)
+        finally:
+            restore_timeout()
+        with self.timed('parse'):
+            self.__auto_comment()
+
+    @contextlib.contextmanager
+    def timed(self, phase):
+        """
+        Adds the time spent in the block to the phase's timing
+        :param phase: phase name (see stats.PHASES)
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[phase] = self.timings.get(phase, 0.0) + time.perf_counter() - start
+
+    @contextlib.contextmanager
+    def running(self, cur):
+        """
+        Marks the query as running on cur so DbConnect.cancel can reach it from another thread
+        :param cur: cursor the query is executing or fetching on
+        """
+        with RUNNING_QUERIES_LOCK:
+            self.running_conn = self.dbo.conn
+            self.running_cur = cur
+            self.dbo.running_queries.append(self)
+        try:
+            yield
+        finally:
+            with RUNNING_QUERIES_LOCK:
+                if self in self.dbo.running_queries:
+                    self.dbo.running_queries.remove(self)
+                self.running_cur = None
+
+    @contextlib.contextmanager
+    def server_messages(self, cur):
+        """
+        Adds the messages the server sends while the block runs (RAISE NOTICE on PG, PRINT on MS/AZ) to messages
+        :param cur: cursor the query is executing on
+        """
+        conn = self.dbo.conn
+        if self.dbo.type == PG:
+            del conn.notices[:]
+        elif hasattr(conn, '_conn'):
+            # pymssql only passes them to a message handler
+            conn._conn.set_msghandler(lambda *msg: self.messages.append(msg[-1]))
+        try:
+            yield
+        finally:
+            if self.dbo.type == PG:
+                self.messages += [n.strip() for n in conn.notices]
+            elif hasattr(conn, '_conn'):
+                conn._conn.set_msghandler(None)
+            else:
+                self.messages += [m[1] for m in getattr(cur, 'messages', None) or []]
+
+    def report_bookkeeping_failures(self):
+        # type: (Query) -> None
+        """
+        Prints the statements of a bookkeeping batch (see batch_statements) that failed. Each one catches its own error
+        so the others still run, and sends it back as a server message.
+        :return: None
+        """
+        if self.no_print_out:
+            return
+        for message in self.messages:
+            if BOOKKEEPING_FAILED in message:
+                print('- Query failed: ' + message.split(BOOKKEEPING_FAILED + ': ', 1)[-1] + '\n\t')
+
+    def cancel(self):
+        # type: (Query) -> bool
+        """
+        Asks the server to stop the query if it is executing or being fetched. Safe to call from another thread; the
+        query then fails (sys.exit if strict) with cancelled set.
+        :return: bool, True if a cancel request was sent
+        """
+        self.cancel_requested = True
+        return self.__send_cancel()
+
+    def __expire(self):
+        """
+        Cancels the query when its timeout runs out (see __apply_timeout)
+        :return: None
+        """
+        self.__send_cancel(timed_out=True)
+
+    def __send_cancel(self, timed_out=False):
+        # type: (Query, bool) -> bool
+        """
+        Sends a cancel request for the query if it is still running. The lock is held until the request is sent, so
+        the query can't finish and leave its connection to another query in between.
+        :param timed_out: if True, the query is cancelled because its timeout ran out
+        :return: bool, True if a cancel request was sent
+        """
+        with RUNNING_QUERIES_LOCK:
+            if self not in self.dbo.running_queries:
+                return False
+
+            if timed_out:
+                self.timeout_expired = True
+            conn, cur = self.running_conn, self.running_cur
+            try:
+                if self.dbo.type == PG:
+                    conn.cancel()
+                elif hasattr(conn, '_conn'):
+                    # pymssql
+                    conn._conn.cancel()
+                else:
+                    cur.cancel()
+                return True
+            except Exception as e:
+                if not self.no_print_out:
+                    print('- Query could not be cancelled: {}'.format(e))
+                return False
+
+    def __apply_timeout(self):
+        """
+        Sets the server/driver timeout for this query
+        :return: function that restores the previous timeout
+        """
+        if not self.timeout:
+            return lambda: None
+
+        conn = self.dbo.conn
+        if self.dbo.type == PG:
+            # Only lasts until this query's transaction is committed or rolled back
+            cur = conn.cursor()
+            cur.execute('SET LOCAL statement_timeout = {}'.format(int(self.timeout * 1000)))
+            cur.close()
+            return lambda: None
+
+        if hasattr(conn, '_conn'):
+            # pymssql; db-lib's query timeout is shared by every connection in the process, so a timer cancels this
+            # query instead
+            timer = threading.Timer(self.timeout, self.__expire)
+            timer.daemon = True
+            timer.start()
+            return timer.cancel
+
+        previous = conn.timeout
+        conn.timeout = max(int(self.timeout), 1)
+
+        def restore():
+            conn.timeout = previous
+        return restore
+
+    def __execute_batches(self, cur):
+        """
+        Runs each (sql, param_rows) of batches on cur. Consecutive plain statements are sent together.
+        :param cur: cursor
+        :return: None
+        """
+        plain = list()
+        for sql, param_rows in self.batches:
+            sql = clean_query_special_characters(sql)
+            if param_rows is None:
+                plain.append(sql.strip().rstrip(';'))
+                continue
+
+            if plain:
+                cur.execute(';\n'.join(plain))
+                plain = list()
+            self.__execute_many(cur, sql, param_rows)
+
+        if plain:
+            cur.execute(';\n'.join(plain))
+
+    def __execute_many(self, cur, sql, param_rows):
+        """
+        Runs sql once per parameter row, page_size rows per round trip: COPY FROM STDIN, execute_values
+        (INSERT ... VALUES %s) or execute_batch on PG, executemany with batch_size on pymssql, fast_executemany on pyodbc
+        :param cur: cursor
+        :param sql: statement with driver placeholders (%s for psycopg2/pymssql, ? for pyodbc), on PG a
+        COPY ... FROM STDIN WITH (FORMAT csv) statement, or on MS/Azure INSERT BULK <table>, which uses pymssql's bulk
+        copy (fast_executemany on pyodbc)
+        :param param_rows: iterable of parameter tuples
+        :return: None
+        """
+        insert_bulk = RE_INSERT_BULK.match(sql) if self.dbo.type != PG else None
+        if insert_bulk and hasattr(self.dbo.conn, 'bulk_copy'):
+            # pymssql; one bcp batch per page_size rows
+            self.dbo.conn.bulk_copy(insert_bulk.group(1), param_rows, batch_size=self.page_size)
+            return
+        if insert_bulk:
+            param_rows = list(param_rows)
+            if not param_rows:
+                return
+            placeholder = '%s' if hasattr(self.dbo.conn, '_conn') else '?'
+            sql = 'INSERT INTO {t} VALUES ({p})'.format(t=insert_bulk.group(1),
+                                                        p=', '.join([placeholder] * len(param_rows[0])))
+
+        if self.dbo.type == PG:
+            if RE_COPY_FROM_STDIN.search(sql):
+                self.__copy_rows(cur, sql, param_rows)
+            elif RE_VALUES_PLACEHOLDER.search(sql):
+                psycopg2.extras.execute_values(cur, sql, param_rows, page_size=self.page_size)
+            else:
+                psycopg2.extras.execute_batch(cur, sql, param_rows, page_size=self.page_size)
+        elif hasattr(self.dbo.conn, '_conn'):
+            # pymssql
+            cur.executemany(sql, list(param_rows), batch_size=self.page_size)
+        else:
+            cur.fast_executemany = True
+            cur.executemany(sql, list(param_rows))
+
+    def __copy_rows(self, cur, sql, param_rows):
+        """
+        Streams rows to a COPY ... FROM STDIN WITH (FORMAT csv) statement, one COPY per page_size rows. None is sent as
+        NULL and every other value is quoted, so empty strings stay empty strings.
+        :param cur: cursor
+        :param sql: COPY statement
+        :param param_rows: iterable of tuples of str or None
+        :return: None
+        """
+        param_rows = iter(param_rows)
+        while True:
+            page = list(itertools.islice(param_rows, self.page_size))
+            if not page:
+                return
+
+            buf = io.StringIO()
+            for row in page:
+                buf.write(','.join('' if v is None else '"' + str(v).replace('"', '""') + '"' for v in row) + '\n')
+            buf.seek(0)
+            cur.copy_expert(sql, buf)
+
+    def __record_cancellation(self, e):
+        """
+        Flags a failed query as cancelled or timed out
+        :param e: exception the query failed with
+        :return: None
+        """
+        if self.cancel_requested:
+            self.cancelled = True
+        elif self.timeout_expired or (self.timeout and (isinstance(e, psycopg2.extensions.QueryCanceledError) or
+                                                        'timeout' in str(e).lower() or 'HYT00' in str(e))):
+            self.timed_out = True
+
+        if not self.no_print_out:
+            if self.cancelled:
+                print('- Query cancelled.')
+            elif self.timed_out:
+                print('- Query timed out after {} seconds.'.format(self.timeout))
 
     def __query_time_format(self):
         # type: (Query) -> str
@@ -132,14 +511,46 @@ class Query:
         self.has_data = True
         self.data_description = cur.description
         self.data_columns = [desc[0] for desc in self.data_description]
-        self.data = cur.fetchall()
+        with self.timed('fetch'), self.running(cur):
+            self.data = cur.fetchall()
+        self.rows = len(self.data)
+        self.bytes_fetched = approx_size(self.data)
+
+    def __load_cached_result(self, cached_result):
+        """
+        Fills in the results from a cached run of the same query instead of running it
+        :param cached_result: CachedResult
+        :return: None
+        """
+        self.cached = True
+        self.has_data = True
+        self.data_description = cached_result.data_description
+        self.data_columns = cached_result.data_columns
+        # Copy so changes to the returned rows list don't change the cache
+        self.data = list(cached_result.data)
+        self.rows = len(self.data)
+        self.query_time = datetime.timedelta(0)
 
-    def __update_log_for_renamed_table(self, new_schema_table, old_table):
+        if self.timeme:
+            print(self)
+
+    def __renamed_table_log_statement(self, new_schema_table, old_table):
+        """
+        Gets the statement that points an existing temp log entry at a renamed table
+        :param new_schema_table: schema.new table name
+        :param old_table: original table name
+        :return: statement for the bookkeeping batch, or None
+        """
         _serv, _dab, schema, new_table = parse_table_string(new_schema_table, self.dbo.default_schema, self.dbo.type)
+        update = f"update {schema}.{self.dbo.log_table} set table_name = '{new_table}' where table_name = '{old_table}';"
 
-        if self.dbo.table_exists(self.dbo.log_table, schema=schema, internal=True):
-            self.dbo.query(f"update {schema}.{self.dbo.log_table} set table_name = '{new_table}' where table_name = '{old_table}'", internal=True, strict=False)
-            self.dbo.check_conn()
+        if self.dbo.type == PG:
+            return PG_IF_LOG_TABLE_EXISTS.format(s=get_unique_table_schema_string(schema, self.dbo.type),
+                                                 log=get_unique_table_schema_string(self.dbo.log_table,
+                                                                                    self.dbo.type), body=update)
+        elif self.dbo.type == MS:
+            return MS_IF_LOG_TABLE_EXISTS.format(db='', s=schema, log=self.dbo.log_table, body=update)
+        return None
 
     def __run_query(self, internal):
         # type: (Query) -> None
@@ -152,7 +563,8 @@ class Query:
 
         # 1. Get connection cursor
         if self.iterate and self.dbo.type == PG:
-            cur = self.dbo.conn.cursor(name='ss')
+            # withhold keeps the cursor open if other queries commit on this connection while iterating
+            cur = self.dbo.conn.cursor(name='pysqldb3_ss_{}'.format(next(SERVER_CURSOR_IDS)), withhold=True)
         else:
             cur = self.dbo.conn.cursor()
 
@@ -163,12 +575,20 @@ class Query:
         self.__perform_lock_routine(cur)
 
         # 4. Query Execution
+        execute_start = time.perf_counter()
         try:
             # 4.1 Attempt to execute query string
-            cur.execute(self.query_string)
+            with self.running(cur), self.server_messages(cur):
+                if self.batches is None:
+                    cur.execute(self.query_string)
+                else:
+                    self.__execute_batches(cur)
 
         except Exception as e:
+            self.timings['execute'] = time.perf_counter() - execute_start
             # 4.2.1 If failure, return failure reason and time
+            self.error = e
+            self.__record_cancellation(e)
             if self.dbo.type == MS:
                 if 'encode' in str(e).lower() or 'ascii' in str(e).lower():
                     if not self.no_print_out:
@@ -198,11 +618,14 @@ class Query:
 
             # 4.2.3 Exit
             if self.strict:
+                # Still counted in DbConnect.stats, which never sees this query
+                self.dbo.query_stats.record(self, internal)
                 sys.exit()
             else:
                 return
 
         # 5. Document times
+        self.timings['execute'] = time.perf_counter() - execute_start
         self.query_end = datetime.datetime.now()
         self.query_time = self.query_end - self.query_start
 
@@ -210,7 +633,7 @@ class Query:
         if self.iterate:
             # 6.1 Iterate if an iterating query
             if self.dbo.type == PG:
-                cur.itersize = 20000
+                cur.itersize = self.itersize
             self.current_cur = cur
         else:
             # 6.2 Query data if any has been returned
@@ -218,27 +641,34 @@ class Query:
                 self.__query_data(cur)
 
             # 6.3 Commit and run new/dropped/renamed tables routine
-            self.__safe_commit()
+            with self.timed('commit'):
+                self.__safe_commit()
             if not internal:
-                self.renamed_tables = self.query_renames_table(self.query_string, self.dbo.default_schema, self.dbo.type)
-                self.new_tables = self.query_creates_table(self.query_string, self.dbo.default_schema, self.dbo.type)
+                with self.timed('parse'):
+                    self.renamed_tables = self.query_renames_table(self.query_string, self.dbo.default_schema,
+                                                                   self.dbo.type)
+                    self.new_tables = self.query_creates_table(self.query_string, self.dbo.default_schema,
+                                                               self.dbo.type)
 
-                # Add renamed tables to query's new table list
-                # self.new_tables += [t for t in self.renamed_tables.keys()]
-                self.dropped_tables = self.query_drops_table(self.query_string, self.dbo.type)
+                    # Add renamed tables to query's new table list
+                    # self.new_tables += [t for t in self.renamed_tables.keys()]
+                    self.dropped_tables = self.query_drops_table(self.query_string, self.dbo.type)
 
                 if self.permission:
                     for row in self.new_tables:
                         obj = '.'.join([f'"{x}"' for x in row if x])
-                        self.dbo.query(f'grant select on {obj} to public;',
-                                       strict=False, timeme=False, internal=True)
+                        self.bookkeeping.append(f'grant select on {obj} to public;')
 
                 if self.renamed_tables:
                     for i in self.renamed_tables.keys():
-                        self.__update_log_for_renamed_table(i, self.renamed_tables[i])
+                        log_statement = self.__renamed_table_log_statement(i, self.renamed_tables[i])
+                        if log_statement:
+                            self.bookkeeping.append(log_statement)
 
                         # Rename index
-                        self.rename_index(i, self.renamed_tables[i])
+                        index_statement = self.rename_index_statement(i, self.renamed_tables[i])
+                        if index_statement:
+                            self.bookkeeping.append(index_statement)
 
                         # Add standardized previous table name to dropped tables to remove from log
                         server, database, sch, tbl = parse_table_string(i, self.dbo.default_schema, self.dbo.type)
@@ -265,6 +695,58 @@ class Query:
                 if self.timeme:
                     print(self)
 
+    def iter_data(self):
+        """
+        Yields the results of an iterate=True query in batches of itersize rows. Only one batch is held in memory at a
+        time. The cursor is closed when the results are exhausted or the generator is closed.
+        :return: generator of lists of rows
+        """
+        cur = self.current_cur
+        if cur is None:
+            return
+
+        try:
+            while True:
+                try:
+                    with self.timed('fetch'), self.running(cur):
+                        rows = cur.fetchmany(self.itersize)
+                except Exception as e:
+                    self.error = e
+                    self.__record_cancellation(e)
+                    raise
+
+                # Named cursors only have a description after the first fetch
+                if self.data_columns is None and cur.description:
+                    self.data_description = cur.description
+                    self.data_columns = [desc[0] for desc in self.data_description]
+
+                if not rows:
+                    break
+
+                self.has_data = True
+                self.rows += len(rows)
+                self.bytes_fetched += approx_size(rows)
+                yield rows
+        finally:
+            try:
+                cur.close()
+            except Exception:
+                pass
+            self.current_cur = None
+            self.query_end = datetime.datetime.now()
+            self.query_time = self.query_end - self.query_start
+
+    @staticmethod
+    def query_creates_temp_table(query_string):
+        """
+        Checks if query creates a session temp table (PG temp/temporary tables, MS #tables)
+        :return: bool
+        """
+        lowered = query_string.lower()
+        if 'temp' not in lowered and '#' not in lowered:
+            return False
+        return bool(RE_CREATES_TEMP_TABLE.search(query_string))
+
     def dfquery(self):
         """
         Returns data from query as a Pandas DataFrame
@@ -284,98 +766,29 @@ class Query:
         Checks if query generates new tables
         :return: list of sets of {schema.table}
         """
-        # remove lines after '--'
-        new_query_string = list()
-        parsed_tables = []
-
-        # remove multiline comments
-        comments = r'((/\*)+?[\w\W]+?(\*/)+)|(--.*)'
-        matches = re.findall(comments, query_string, re.IGNORECASE)
-        for m in matches:
-            if m:
-                m = [s for s in m if s!='']
-                query_string =''.join(query_string.split(m[0]))
-
-
-        # remove mulitple spaces
-        # _ = query_string.split()
-        # query_string = ' '.join(_)
-        new_tables = list()
-
-        # # OlD
-        # create_pattern =r"""
-        #     (?<!\*)(?<!\*\s)(?<!--)(?<!--\s)    # ignore comments
-        #     ((create\s+table\s+)(?!temp\s+|temporary\s+|#{0,2})(if\s+not\s+exists\s+)*)(\s+)*  # create non-temp table expression
-        #     (((([\[|\"])?)([\w!@#$%^&*()\s0-9-]+)(([\]|\"])?\.)){0,3}   # server.db.schema. 0-3 times
-        #     ((([\[|\"])?)([\w!@#$%^&*()\s0-9-]+)(([\]|\"])?\.?)\s+){1}){1} # table (whole thing only once
-        # """
-        # create_pattern =r"""
-        #     (?<!\*)(?<!\*\s)(?<!--)(?<!--\s)    # ignore comments
-        #     ((?<!\$BODY\$))
-        #     (create\s+table\s+)
-        #     (?!temp\s+|temporary\s+)
-        #     (if\s+not\s+exists\s+)?
-        #     (((([\[|\"])?)([\w!@$%^&*()\s0-9-]+)(([\]|\"])?\.)){0,3}
-        #     ((([\[|\"])?)((?!\#)[\w!@$%^&*()\s0-9-]+)(([\]|\"])?\.?)\s+){1})
-        #     (?=(as\s+select)|(\())\s?
-        #     ((?!\$BODY\$))
-        # """
-
-        create_pattern = """
-            (?<!\*)(?<!\*\s)(?<!--)(?<!--\s)
-            (create\s+table\s+)
-            (?!temp\s+|temporary|\s+)
-            (if\s+not\s+exists\s+)?
-            (
-                (({encaps} | {nonencaps})\.){sds}
-                (\[?\#{temp_mark}){tmp_time}
-                (({encapst} | {nonencaps})\s*){tbl_time}
-            )((as\s+select)|(\())\s?
-        """.format(encaps=RE_ENCAPSULATED_SCHEMA_NAME, nonencaps=RE_NON_ENCAPSULATED_TABLE_NAME,
-                          encapst=RE_ENCAPSULATED_TABLE_NAME,
-                          sds="{0,3}", tbl_time="{1}", tmp_time="{0}", temp_mark="{1,2}")
-
-        create_table = re.compile(create_pattern, re.VERBOSE | re.IGNORECASE)
-
-        # matches = re.findall(create_table, query_string, re.IGNORECASE)
-        matches = re.findall(create_table, query_string)
-
-        tables = [i[2].strip() for i in matches]
-        new_tables+=tables
-
-        into_pattern = r"""
-            (?<!\*)(?<!\*\s)(?<!--)(?<!--\s)                       # ignore comments
-            
-            (select([.\n\w\*\s\",^,\[\],',!,=,+,(,)])+?into\s+)+?    # find select into
-            (?!temp\s+|temporary\s+)                                # lookahead for temp
-            (
-               (({encaps} | {nonencaps})\.){sds}
-               (\[?\#{temp_mark}){tmp_time}
-               (({encapst} | {nonencaps})\s+){tbl_time}
-           )
-           (?=from)                                                # lookahead for 'from'
-            """.format(encaps=RE_ENCAPSULATED_SCHEMA_NAME, nonencaps=RE_NON_ENCAPSULATED_TABLE_NAME,
-                          encapst=RE_ENCAPSULATED_TABLE_NAME,
-                          sds="{0,3}", tbl_time="{1}", tmp_time="{0}", temp_mark="{1,2}")
+        # Skip the patterns entirely unless the query could create a table (create table / select into)
+        lowered = query_string.lower()
+        if 'create' not in lowered and 'into' not in lowered:
+            return []
 
+        parsed_tables = []
 
-        create_table_into = re.compile(into_pattern, re.VERBOSE | re.IGNORECASE)
-        into_matches = re.findall(create_table_into, query_string)
+        # remove multiline comments and lines after '--'
+        query_string = RE_COMMENTS.sub('', query_string)
 
-        into_tables = [i[2].strip() for i in into_matches]
-        new_tables += into_tables
+        new_tables = [i[2].strip() for i in RE_CREATE_TABLE.findall(query_string)]
+        new_tables += [i[2].strip() for i in RE_SELECT_INTO.findall(query_string)]
 
         if new_tables:
             all_tables = [i for i in new_tables if len(i) > 0]
 
             all_tables = [t if ('"' in t or "[" in t) else t.lower() for t in all_tables]
 
-        #     # Clean table names via parse_table_string, get_query_table_schema_name
+            # Clean table names via parse_table_string, get_query_table_schema_name
             parsed_tables = [parse_table_string(a, default_schema, db_type) for a in all_tables]
         return parsed_tables
             # TODO create table query tables will always be 1st in the list over select into queries... does order matter?
 
-
     @staticmethod
     def query_drops_table(query_string, db_type):
         """
@@ -384,39 +797,15 @@ class Query:
         avoid dropping tables with coincident names.
         :return: list of tables dropped (including any db/schema info)
         """
+        dropped_tables = list()
 
-        # remove multiline comments
-        comments = r'((/\*)+?[\w\W]+?(\*/)+)|(--.*)'
-        matches = re.findall(comments, query_string, re.IGNORECASE)
-        for m in matches:
-            if m:
-                m = [s for s in m if s != '']
-                query_string = ''.join(query_string.split(m[0]))
+        if 'drop' not in query_string.lower():
+            return dropped_tables
 
-        dropped_tables = list()
+        # remove multiline comments
+        query_string = RE_COMMENTS.sub('', query_string)
 
-        drop_pattern = r"""
-                   (?<!--\s)(?<!--)(?<!\*\s)(?<!\*)
-                   (\s?drop\s+table\s(if\s+exists\s+)?)
-                   ((
-                       (({encaps} | {nonencaps})\.)){sds}
-                   (
-                       (({encapst} | {nonencaps})){tbl_time}
-                   ))(\s | \;)*?
-                       """.format(encaps=RE_ENCAPSULATED_SCHEMA_NAME,
-                                  encapst=RE_ENCAPSULATED_TABLE_NAME,
-                                  nonencaps=RE_NON_ENCAPSULATED_TABLE_NAME,
-                                  sds="{0,3}", tbl_time="{1}")
-        drop_pattern = re.compile(drop_pattern, re.VERBOSE | re.IGNORECASE)
-
-        matches = re.findall(drop_pattern, query_string)
-
-
-        # drop_table = r'(?<!--\s)(?<!--)(?<!\*\s)(?<!\*)(drop\s+table\s+(if\s+exists\s+)?)((([\[][\w\s\.\"]*[\]])|' \
-        #              r'([\"][\w\s\.]*[\"])|([\w]+))([.](([\[][\w\s\.\"]*[\]])|([\"][\w\s\.]*[\"])|([\w]+)))?([.]' \
-        #              r'(([\[][\w\s\.\"]*[\]])|([\"][\w\s\.]*[\"])|([\w]+)))?([.](([\[][\w\s\.\"]*[\]])|([\"][\w\s\.]*' \
-        #              r'[\"])|([\w]+)))?)([\s\n\r\t]*(\;?)[\s\n\r\t]*)'
-        # matches = re.findall(drop_table, query_string, re.IGNORECASE)
+        matches = RE_DROP_TABLE.findall(query_string)
 
         if matches:
             for row in matches:
@@ -434,28 +823,17 @@ class Query:
         Checks if a rename query is run
         :return: Dict {schema.new table name: original table name}
         """
-        _ = query_string.split()
-        query_string = ' '.join(_)
         new_tables = dict()
 
-        rename_pattern = r"""
-            (?<!--\s)(?<!--)(?<!\*\s)(?<!\*)
-            (\s?alter\s+table\s+(if exists\s+)?)
-            ((
-                (({encaps} | {nonencaps})\.)){sds}                                           
-            (
-                (({encaps} | {nonencaps})\s+){tbl_time}
-            ))
-            (rename\s+to\s+)
-            ((({encaps} | {nonencaps}))+)
-                """.format(encaps=RE_ENCAPSULATED_SCHEMA_NAME,
-                           nonencaps=RE_NON_ENCAPSULATED_TABLE_NAME,
-                           sds="{0,3}", tbl_time="{1}")
-
-        rename_tables = re.compile(rename_pattern, re.VERBOSE | re.IGNORECASE)
+        # Only alter table ... rename to and exec sp_rename can rename a table
+        lowered = query_string.lower()
+        if 'alter' not in lowered and 'sp_rename' not in lowered:
+            return new_tables
 
+        _ = query_string.split()
+        query_string = ' '.join(_)
 
-        matches = re.findall(rename_tables, query_string)
+        matches = RE_RENAME_TABLE.findall(query_string)
         for row in matches:
             old_schema = row[5]
             old_table = row[17]
@@ -469,20 +847,8 @@ class Query:
                     get_unique_table_schema_string(old_table, db_type)
 
         if not matches:
-            if not re.search(r"""(,?\s*n?'(column|index)'?\s*)""", query_string, re.IGNORECASE):
-                rename_tables_sql = """
-                (?<!--\s)(?<!--)(?<!\*\s)(?<!\*)
-                (exec\s+sp_rename)(\s+?')
-                ((.)+?)
-                ('\s?,\s?')
-                ((.)*?)
-                ('\s?)(;)?
-                (?!,?\s*n?'(column|index)'?\s*)
-                """
-
-                rename_tables = re.compile(rename_tables_sql, re.VERBOSE | re.IGNORECASE)
-                matches = re.findall(rename_tables, query_string)
-
+            if not RE_SP_RENAME_COLUMN_OR_INDEX.search(query_string):
+                matches = RE_SP_RENAME.findall(query_string)
 
             for row in matches:
                 from_data = row[2].split('.')
@@ -532,7 +898,19 @@ class Query:
         :param old_table: original table name
         :return:
         """
-        # Get indices for new table
+        statement = self.rename_index_statement(new_table, old_table)
+        if statement:
+            self.dbo.query(batch_statements([statement], self.dbo.type), strict=False, timeme=False, internal=True)
+            self.dbo.internal_queries[-1].report_bookkeeping_failures()
+
+    def rename_index_statement(self, new_table, old_table):
+        """
+        Gets a statement that renames a table's indexes whose names contain the original table name, so the lookup and
+        the renames run server-side in one round trip
+        :param new_table: new table name
+        :param old_table: original table name
+        :return: statement for the bookkeeping batch, or None
+        """
         server, database, sch, tbl = parse_table_string(new_table, self.dbo.default_schema, self.dbo.type)
         if not database:
             database = self.dbo.database
@@ -540,47 +918,20 @@ class Query:
         if not server:
             server = self.dbo.server
 
-        if self.dbo.type == 'PG':
-            old_table = old_table.replace('"', '').replace('\n', '').strip()
-            new_table = new_table.replace('"', '').replace('\n', '').strip()
-            query = """
-                SELECT indexname
-                FROM pg_indexes
-                WHERE tablename = '{t}'
-                AND schemaname='{s}';
-            """.format(t=tbl, s=sch)
-        elif self.dbo.type == 'MS':
-            query = """      
-                SELECT a.name AS indexname
-                FROM {d}.sys.indexes AS a
-                INNER JOIN {d}.sys.index_columns AS b
-                    ON a.object_id = b.object_id AND a.index_id = b.index_id
-                WHERE
-                    a.is_hypothetical = 0 
-                    AND a.object_id = OBJECT_ID('{s}.{t}')
-            """.format(t=tbl, s=sch, d=database)
         # make sure looking in the right server, dont need to worry about db, since this is a sys table
-
         if not get_unique_table_schema_string(server, self.dbo.type) == self.dbo.server:
             print('Warning: any associated indexes will not be renamed on {ser}.{db}.{sch}.{tbl}'.format(
                 ser=server, db=database, sch=sch, tbl=tbl
             ))
-            indices = []
-        else:
-            self.dbo.query(query, strict=True, timeme=False, internal=True)
-            indices = self.dbo.internal_data or []
+            return None
 
-        for idx in indices:
-            if old_table in idx[0]:
-                new_idx = idx[0].replace(old_table, tbl)
-
-                if self.dbo.type == 'PG':
-                    new_idx_qry = 'ALTER INDEX IF EXISTS {s}."{i}" RENAME to "{i2}"'.format(s=sch, i=idx[0], i2=new_idx)
-                elif self.dbo.type == 'MS':
-                    new_idx_qry = "EXEC sp_rename '{t}.{i}', '{i2}', N'INDEX';".format(i=idx[0], i2=new_idx,
-                                                                                       t=new_table)
-
-                self.dbo.query(query=new_idx_qry, strict=False, timeme=False, internal=True)
+        if self.dbo.type == PG:
+            old_table = old_table.replace('"', '').replace('\n', '').strip()
+            return PG_RENAME_INDEXES_BLOCK.format(t=tbl, s=sch, old=old_table)
+        elif self.dbo.type == MS:
+            return MS_RENAME_INDEXES_BLOCK.format(t=tbl, s=sch, d=database, old=old_table, new_table=new_table,
+                                                  n=next(BATCH_NAME_IDS))
+        return None
 
     def __auto_comment(self):
         """
@@ -591,15 +942,14 @@ class Query:
             # tables in new_tables list will contain schema if provided, otherwise will default to public
             for row in self.new_tables:
                 obj = '.'.join([f'"{x}"' for x in row if x])
-                self.dbo.query(f'''COMMENT ON TABLE {obj} 
+                self.bookkeeping.append(f'''COMMENT ON TABLE {obj} 
                 IS 'Created by {self.dbo.user} 
                 on {self.query_start.strftime('%Y-%m-%d %H:%M')}
                 {self.comment}'
-                ''',
-                               strict=False, timeme=False, internal=True)
+                ''')
 
     @staticmethod
-    def query_to_shp(dbo, query, path=None, shp_name=None, cmd=None, gdal_data_loc=GDAL_DATA_LOC, print_cmd=False,
+    def query_to_shp(dbo, query, path=None, shp_name=None, cmd=None, gdal_data_loc=None, print_cmd=False,
                      srid=2263):
         """
         Writes results of the query to a shp file by calling Shapefile ogr command's in write_shp fn
@@ -635,7 +985,7 @@ class Query:
             print(_)
 
     @staticmethod
-    def query_to_gpkg(dbo, query, path, gpkg_tbl, gpkg_name = '', cmd=None, gdal_data_loc=GDAL_DATA_LOC, print_cmd=False, srid=2263):
+    def query_to_gpkg(dbo, query, path, gpkg_tbl, gpkg_name = '', cmd=None, gdal_data_loc=None, print_cmd=False, srid=2263):
         """
         Writes results of the query to a gpkg file by calling Geopackage ogr command's in write_gpkg fn
         :param dbo: Database connection for the query
@@ -11,7 +11,7 @@ class Shapefile:
         pass
 
     def __init__(self, dbo=None, path=None, table=None, schema=None, query=None, shp_name=None, cmd=None,
-                 srid='2263', port=5432, gdal_data_loc=GDAL_DATA_LOC, skip_failures=''):
+                 srid='2263', port=5432, gdal_data_loc=None, skip_failures=''):
         self.dbo = dbo
         self.path = path
         self.table = table
@@ -21,7 +21,7 @@ class Shapefile:
         self.cmd = cmd
         self.srid = srid
         self.port = port
-        self.gdal_data_loc = gdal_data_loc
+        self.gdal_data_loc = get_gdal_data_loc(gdal_data_loc)
         self.skip_failures=skip_failures
 
         # Use default schema from db object
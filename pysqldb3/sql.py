@@ -68,6 +68,128 @@ ON CONFLICT (table_schema, table_name) DO
 UPDATE SET expires = EXCLUDED.expires, created_on=EXCLUDED.created_on
 """
 
+PG_LOG_TABLE_SCHEMAS_QUERY = r"""
+SELECT schemaname
+FROM pg_catalog.pg_tables
+WHERE tablename = '{log}'
+"""
+
+MS_LOG_TABLE_SCHEMAS_QUERY = r"""
+SELECT s.name
+FROM sys.tables t
+JOIN sys.schemas s
+ON t.schema_id = s.schema_id
+WHERE t.name = '{log}'
+"""
+
+PG_REMOVE_STALE_LOG_ENTRIES_QUERY = r"""
+DELETE FROM "{s}".{log} l
+WHERE NOT EXISTS (
+    SELECT 1
+    FROM pg_catalog.pg_tables t
+    WHERE t.schemaname = '{s}'
+    AND t.tablename = l.table_name
+);
+"""
+
+MS_REMOVE_STALE_LOG_ENTRIES_QUERY = r"""
+DELETE l FROM [{s}].{log} l
+WHERE NOT EXISTS (
+    SELECT 1
+    FROM sys.tables t
+    JOIN sys.schemas s
+    ON t.schema_id = s.schema_id
+    WHERE s.name = '{s}'
+    AND t.name = l.table_name
+);
+"""
+
+# Post-query bookkeeping (grants, comments, temp log, index renames) is sent as one batch; each statement is wrapped so
+# a failure in one (ex. missing grant permission) does not stop the others, as when they were sent separately. The
+# error is sent back as a server message starting with BOOKKEEPING_FAILED.
+BOOKKEEPING_FAILED = 'pysqldb3 bookkeeping statement failed'
+
+PG_ISOLATED_STATEMENT = r"""
+DO $pysqldb3$
+BEGIN
+{body}
+EXCEPTION WHEN OTHERS THEN
+    RAISE NOTICE 'pysqldb3 bookkeeping statement failed: %', SQLERRM;
+END
+$pysqldb3$;
+"""
+
+MS_ISOLATED_STATEMENT = r"""
+BEGIN TRY
+{body}
+END TRY
+BEGIN CATCH
+    PRINT 'pysqldb3 bookkeeping statement failed: ' + ERROR_MESSAGE();
+END CATCH;
+"""
+
+PG_IF_LOG_TABLE_MISSING = r"""
+IF NOT EXISTS (SELECT 1 FROM pg_catalog.pg_tables WHERE schemaname = '{s}' AND tablename = '{log}') THEN
+{body}
+END IF;
+"""
+
+PG_IF_LOG_TABLE_EXISTS = r"""
+IF EXISTS (SELECT 1 FROM pg_catalog.pg_tables WHERE schemaname = '{s}' AND tablename = '{log}') THEN
+{body}
+END IF;
+"""
+
+MS_IF_LOG_TABLE_MISSING = r"""
+IF OBJECT_ID('{db}{s}.{log}', 'U') IS NULL
+{body}
+"""
+
+MS_IF_LOG_TABLE_EXISTS = r"""
+IF OBJECT_ID('{db}{s}.{log}', 'U') IS NOT NULL
+{body}
+"""
+
+PG_RENAME_INDEXES_BLOCK = r"""
+DECLARE
+    idx record;
+BEGIN
+    FOR idx IN
+        SELECT indexname
+        FROM pg_indexes
+        WHERE tablename = '{t}'
+        AND schemaname = '{s}'
+        AND strpos(indexname, '{old}') > 0
+    LOOP
+        EXECUTE format('ALTER INDEX IF EXISTS %I.%I RENAME TO %I', '{s}', idx.indexname,
+                       replace(idx.indexname, '{old}', '{t}'));
+    END LOOP;
+END;
+"""
+
+MS_RENAME_INDEXES_BLOCK = r"""
+DECLARE @pysqldb3_idx_{n} sysname, @pysqldb3_obj_{n} nvarchar(1035), @pysqldb3_new_{n} sysname;
+DECLARE pysqldb3_idx_cur_{n} CURSOR LOCAL FAST_FORWARD FOR
+    SELECT DISTINCT a.name
+    FROM {d}.sys.indexes AS a
+    INNER JOIN {d}.sys.index_columns AS b
+        ON a.object_id = b.object_id AND a.index_id = b.index_id
+    WHERE a.is_hypothetical = 0
+        AND a.object_id = OBJECT_ID('{s}.{t}')
+        AND CHARINDEX('{old}', a.name) > 0;
+OPEN pysqldb3_idx_cur_{n};
+FETCH NEXT FROM pysqldb3_idx_cur_{n} INTO @pysqldb3_idx_{n};
+WHILE @@FETCH_STATUS = 0
+BEGIN
+    SET @pysqldb3_obj_{n} = '{new_table}.' + @pysqldb3_idx_{n};
+    SET @pysqldb3_new_{n} = REPLACE(@pysqldb3_idx_{n}, '{old}', '{t}');
+    EXEC sp_rename @pysqldb3_obj_{n}, @pysqldb3_new_{n}, N'INDEX';
+    FETCH NEXT FROM pysqldb3_idx_cur_{n} INTO @pysqldb3_idx_{n};
+END;
+CLOSE pysqldb3_idx_cur_{n};
+DEALLOCATE pysqldb3_idx_cur_{n};
+"""
+
 PG_BLOCKING_QUERY = r"""
 SELECT blocked_locks.pid     AS blocked_pid,
      blocked_activity.usename  AS blocked_user,
@@ -182,6 +304,111 @@ PG_GET_SCHEMAS_QUERY = r"""
 SELECT schema_name FROM information_schema.schemata
 """
 
+PG_CATALOG_SNAPSHOT_QUERY = r"""
+SELECT t.tablename, c.column_name,
+    case when c.CHARACTER_MAXIMUM_LENGTH is not null then
+        c.DATA_TYPE || ' ('|| cast(c.CHARACTER_MAXIMUM_LENGTH as varchar) ||')'
+    when c.DATA_TYPE = 'USER-DEFINED' then c.udt_name
+    when c.DATA_TYPE = 'ARRAY' then c.array_type::varchar
+    else c.DATA_TYPE end as DATA_TYPE
+FROM pg_catalog.pg_tables t
+LEFT JOIN (
+    SELECT *, udt_name::regtype array_type
+    FROM information_schema.columns
+    WHERE table_schema = '{s}'
+) c
+ON c.table_name = t.tablename
+WHERE t.schemaname = '{s}'
+ORDER BY t.tablename, c.ordinal_position
+"""
+
+MS_CATALOG_SNAPSHOT_QUERY = r"""
+SELECT t.name, c.COLUMN_NAME,
+    case when c.DATA_TYPE = 'text' then c.DATA_TYPE
+    when c.CHARACTER_MAXIMUM_LENGTH is not null
+    then c.DATA_TYPE + ' ('+ cast(c.CHARACTER_MAXIMUM_LENGTH as varchar)+')'
+    when c.CHARACTER_MAXIMUM_LENGTH >= 3000 then c.DATA_TYPE + ' (3000)'
+    else c.DATA_TYPE end as DATA_TYPE
+FROM sys.tables t
+JOIN sys.schemas s
+ON t.schema_id = s.schema_id
+LEFT JOIN INFORMATION_SCHEMA.COLUMNS c
+ON c.TABLE_SCHEMA = s.name AND c.TABLE_NAME = t.name
+WHERE s.name = '{s}'
+ORDER BY t.name, c.ORDINAL_POSITION
+"""
+
+PG_SERVER_VERSION_QUERY = r"""
+SELECT current_setting('server_version_num')::int
+"""
+
+# One scan of a staging table: non-null count and count of values that won't cast, per column
+STAGING_PROFILE_QUERY = r"""
+SELECT {columns}
+FROM {schema}.{table}
+"""
+
+STAGING_NON_NULL_COLUMN = r"""count("{c}")"""
+
+STAGING_INVALID_COLUMN = r"""sum(case when {condition} then 1 else 0 end)"""
+
+# A few of the values that won't cast, for the message when a column is changed to varchar
+PG_STAGING_INVALID_VALUES_QUERY = r"""
+SELECT "{c}" FROM {schema}.{table} WHERE {condition} LIMIT {n}
+"""
+
+MS_STAGING_INVALID_VALUES_QUERY = r"""
+SELECT TOP {n} "{c}" FROM {schema}.{table} WHERE {condition}
+"""
+
+# Postgres 16+
+PG_STAGING_INVALID_CONDITION = r"""("{c}" is not null and not pg_input_is_valid("{c}"::text, '{t}'))"""
+
+# Older Postgres: numbers only, matched against what a float cast accepts
+PG_STAGING_INVALID_NUMBER_CONDITION = r"""("{c}" is not null and
+    "{c}"::text !~ '^\s*[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?\s*$')"""
+
+# Older Postgres: ISO (yyyy-mm-dd) and US (mm/dd/yy[yy]) dates, with an optional time and UTC offset
+PG_STAGING_INVALID_DATE_CONDITION = r"""("{c}" is not null and
+    "{c}"::text !~ '^\s*(\d{{4}}-(0?[1-9]|1[0-2])-(0?[1-9]|[12]\d|3[01])|(0?[1-9]|1[0-2])/(0?[1-9]|[12]\d|3[01])/(\d{{2}}|\d{{4}}))([ T]([01]?\d|2[0-3]):[0-5]\d(:[0-5]\d(\.\d+)?)?)?\s*(Z|[+-]\d{{2}}(:?\d{{2}})?)?\s*$')"""
+
+# Older Postgres: the spellings boolean input accepts
+PG_STAGING_INVALID_BOOLEAN_CONDITION = r"""("{c}" is not null and
+    "{c}"::text !~* '^\s*(t|tr|tru|true|y|ye|yes|on|1|f|fa|fal|fals|false|n|no|off|0)\s*$')"""
+
+# Older Postgres, other types: no check, so every staged value counts as one that may not cast
+PG_STAGING_UNCHECKED_CONDITION = r"""("{c}" is not null)"""
+
+MS_STAGING_INVALID_CONDITION = r"""("{c}" is not null and try_cast("{c}" as {t}) is null)"""
+
+# Progress of a checkpointed load; updated in the same transaction as each batch it counts
+CHECKPOINT_CREATE_QUERY = r"""
+CREATE TABLE {schema}.{table} (
+    input_file varchar(1000),
+    file_size bigint,
+    batch_size int,
+    batch_id int,
+    rows_read bigint,
+    rows_staged bigint,
+    finished int
+)
+"""
+
+CHECKPOINT_INSERT_QUERY = r"""
+INSERT INTO {schema}.{table} (input_file, file_size, batch_size, batch_id, rows_read, rows_staged, finished)
+VALUES ('{input_file}', {file_size}, {batch_size}, 0, 0, 0, 0)
+"""
+
+CHECKPOINT_SELECT_QUERY = r"""
+SELECT input_file, file_size, batch_size, batch_id, rows_read, rows_staged, finished
+FROM {schema}.{table}
+"""
+
+CHECKPOINT_UPDATE_QUERY = r"""
+UPDATE {schema}.{table}
+SET batch_id = {batch_id}, rows_read = {rows_read}, rows_staged = {rows_staged}, finished = {finished}
+"""
+
 """
 Shapefile
 """
@@ -0,0 +1,162 @@
+import collections
+import math
+import sys
+import threading
+
+# Phases timed on each Query, in the order they run
+PHASES = ('connect', 'execute', 'fetch', 'commit', 'parse', 'bookkeeping', 'log_reconcile')
+
+# Rows measured to estimate the size of a result
+SIZE_SAMPLE_ROWS = 100
+
+
+def approx_size(rows):
+    """
+    Estimates the in-memory size of fetched rows from the size of the first few
+    :param rows: list of rows
+    :return: int, bytes
+    """
+    if not rows:
+        return 0
+
+    sample = rows[:SIZE_SAMPLE_ROWS]
+    sampled = sum(sys.getsizeof(v) for row in sample for v in row)
+    return int(sampled * len(rows) / len(sample))
+
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile
+    :param values: sorted list of numbers
+    :param pct: percentile, 0-100
+    :return: number or None if values is empty
+    """
+    if not values:
+        return None
+    rank = max(int(math.ceil(pct / 100.0 * len(values))) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+
+class QueryStats:
+    """
+    Aggregates per-phase timings, row counts and bytes fetched of the queries run by a DbConnect. The most recent
+    max_samples timings per phase are kept for percentiles; counts and totals cover every query.
+    """
+
+    def __str__(self):
+        return 'Query stats - {q} queries ({u} user, {i} internal)'.format(
+            q=self.user_queries + self.internal_queries, u=self.user_queries, i=self.internal_queries)
+
+    def __init__(self, max_samples=10000, callback=None):
+        """
+        :param max_samples: number of timings kept per phase for percentiles
+        :param callback: function called with the record (dict) of every query, ex. to ship to monitoring
+        """
+        self.max_samples = max_samples
+        self.callback = callback
+
+        # Other initialized variables
+        self.__lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        Clears every count and timing
+        :return: None
+        """
+        with self.__lock:
+            self.user_queries = 0
+            self.internal_queries = 0
+            self.cached = 0
+            self.failed = 0
+            self.cancelled = 0
+            self.timed_out = 0
+            self.rows = 0
+            self.bytes_fetched = 0
+            self.samples = collections.defaultdict(lambda: collections.deque(maxlen=self.max_samples))
+            self.totals = collections.defaultdict(float)
+            self.counts = collections.defaultdict(int)
+
+    @staticmethod
+    def record_for(qry, internal):
+        """
+        Gets the record shared with the callback for a Query
+        :param qry: Query object
+        :param internal: Boolean flag for internal processes
+        :return: dict
+        """
+        return {
+            'query': qry.query_string,
+            'internal': internal,
+            'cached': qry.cached,
+            'failed': qry.error is not None,
+            'cancelled': qry.cancelled,
+            'timed_out': qry.timed_out,
+            'rows': qry.rows,
+            'bytes_fetched': qry.bytes_fetched,
+            'timings': dict(qry.timings)
+        }
+
+    def record(self, qry, internal=False):
+        """
+        Adds a finished query
+        :param qry: Query object
+        :param internal: Boolean flag for internal processes
+        :return: dict, the record passed to the callback
+        """
+        record = self.record_for(qry, internal)
+
+        with self.__lock:
+            if internal:
+                self.internal_queries += 1
+            else:
+                self.user_queries += 1
+            self.cached += record['cached']
+            self.failed += record['failed']
+            self.cancelled += record['cancelled']
+            self.timed_out += record['timed_out']
+            self.rows += record['rows']
+            self.bytes_fetched += record['bytes_fetched']
+
+            for phase, seconds in record['timings'].items():
+                self.samples[phase].append(seconds)
+                self.totals[phase] += seconds
+                self.counts[phase] += 1
+
+        if self.callback is not None:
+            try:
+                self.callback(record)
+            except Exception as e:
+                print('- Query stats callback failed: {}'.format(e))
+
+        return record
+
+    def summary(self):
+        """
+        :return: dict of query counts (including failed, cancelled and timed out), rows, bytes_fetched and, per phase, count, total, mean, p50, p95 and max seconds
+        """
+        with self.__lock:
+            phases = dict()
+            for phase in sorted(self.samples, key=lambda p: PHASES.index(p) if p in PHASES else len(PHASES)):
+                values = sorted(self.samples[phase])
+                phases[phase] = {
+                    'count': self.counts[phase],
+                    'total': self.totals[phase],
+                    'mean': self.totals[phase] / self.counts[phase],
+                    'p50': percentile(values, 50),
+                    'p95': percentile(values, 95),
+                    'max': values[-1]
+                }
+
+            return {
+                'queries': self.user_queries + self.internal_queries,
+                'user_queries': self.user_queries,
+                'internal_queries': self.internal_queries,
+                'cached': self.cached,
+                'failed': self.failed,
+                'cancelled': self.cancelled,
+                'timed_out': self.timed_out,
+                'rows': self.rows,
+                'bytes_fetched': self.bytes_fetched,
+                'phases': phases
+            }
@@ -0,0 +1,82 @@
+import asyncio
+import os
+
+import configparser
+
+from ..asyncdb import AsyncDbConnect
+
+config = configparser.ConfigParser()
+config.read(os.path.dirname(os.path.abspath(__file__)) + "\\db_config.cfg")
+
+
+def async_db(**kwargs):
+    return AsyncDbConnect(type=config.get('PG_DB', 'TYPE'),
+                          server=config.get('PG_DB', 'SERVER'),
+                          database=config.get('PG_DB', 'DB_NAME'),
+                          user=config.get('PG_DB', 'DB_USER'),
+                          password=config.get('PG_DB', 'DB_PASSWORD'),
+                          **kwargs)
+
+
+class TestAsyncDbConnectPG:
+    def test_async_dfquery_concurrent(self):
+        async def run():
+            async with async_db(max_workers=4) as adb:
+                dfs = await asyncio.gather(*[adb.dfquery('select {} as n'.format(i)) for i in range(20)])
+                assert len(adb.workers) <= 4
+                return [int(df.n[0]) for df in dfs]
+
+        assert asyncio.run(run()) == list(range(20))
+
+    @staticmethod
+    def run_concurrent_writes(**kwargs):
+        async def run():
+            async with async_db(max_workers=4, **kwargs) as adb:
+                test_table = 'pytest_async_writes_{}'.format(adb.db.user)
+                await adb.query('drop table if exists working.{t}; create table working.{t} (id int)'.format(
+                    t=test_table), timeme=False)
+
+                # Each insert commits on its own worker; none may be lost to another worker's connection
+                await asyncio.gather(*[adb.query('insert into working.{t} values ({i})'.format(t=test_table, i=i),
+                                                 timeme=False) for i in range(40)])
+                df = await adb.dfquery('select id from working.{} order by id'.format(test_table))
+
+                await adb.query('drop table if exists working.{}'.format(test_table), timeme=False)
+                return [int(i) for i in df.id]
+
+        assert asyncio.run(run()) == list(range(40))
+
+    def test_async_query_concurrent_writes(self):
+        self.run_concurrent_writes()
+
+    def test_async_query_concurrent_writes_pooled(self):
+        self.run_concurrent_writes(pooled=True)
+
+    def test_async_query_logs_new_table(self):
+        async def run():
+            async with async_db(max_workers=2) as adb:
+                test_table = 'pytest_async_{}'.format(adb.db.user)
+                await adb.query('drop table if exists working.{t}; create table working.{t} (id int)'.format(
+                    t=test_table), timeme=False)
+                exists = await adb.table_exists(test_table, schema='working')
+                created = adb.tables_created
+
+                await adb.query('drop table if exists working.{}'.format(test_table), timeme=False)
+                return test_table, exists, created, await adb.table_exists(test_table, schema='working')
+
+        test_table, exists, created, exists_after_drop = asyncio.run(run())
+        assert exists
+        assert (None, None, 'working', test_table) in created
+        assert not exists_after_drop
+
+    def test_async_iter_query(self):
+        async def run():
+            async with async_db(max_workers=2) as adb:
+                batches = list()
+                async for rows in adb.iter_query('select generate_series(1, 25) as n', batch_size=10):
+                    batches.append(rows)
+                return batches
+
+        batches = asyncio.run(run())
+        assert [len(b) for b in batches] == [10, 10, 5]
+        assert batches[-1][-1][0] == 25
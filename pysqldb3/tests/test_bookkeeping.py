@@ -0,0 +1,33 @@
+from types import SimpleNamespace
+
+from .. import pysqldb3 as pysqldb
+from ..query import Query
+from ..sql import BOOKKEEPING_FAILED
+
+
+def make_db(monkeypatch, user):
+    for method in ('_DbConnect__get_credentials', '_DbConnect__cleanup_subroutine'):
+        monkeypatch.setattr(pysqldb.DbConnect, method, lambda self: None)
+    return pysqldb.DbConnect(type='PG', server='bookkeeping-test', database='db', user=user, password='p', quiet=True)
+
+
+class TestBookkeepingStatements:
+    def test_log_table_guards_mixed_case_user(self, monkeypatch):
+        db = make_db(monkeypatch, 'JSmith')
+        statements, separate = db._DbConnect__table_logging_statements(['working.new_table'])
+        dropped = db._DbConnect__dropped_table_log_statements(['working.old_table'])
+
+        # PG stores the unquoted log table name in lower case, so the guards must look for that name
+        assert separate == []
+        assert "tablename = '__temp_log_table_jsmith__'" in statements[0]
+        assert "tablename = '__temp_log_table_jsmith__'" in dropped[0]
+        assert '"__temp_log_table_JSmith__"' not in dropped[0]
+
+    def test_report_failures(self, capsys):
+        qry = SimpleNamespace(no_print_out=False, messages=[
+            'NOTICE:  {}: permission denied for table t'.format(BOOKKEEPING_FAILED), 'NOTICE:  something else'])
+        Query.report_bookkeeping_failures(qry)
+
+        out = capsys.readouterr().out
+        assert '- Query failed: permission denied for table t' in out
+        assert 'something else' not in out
@@ -0,0 +1,104 @@
+import time
+
+from .. import pysqldb3 as pysqldb
+from ..catalog import CatalogCache, ddl_schemas, changes_schemas
+
+ROWS = [('node', 'id', 'integer'), ('node', 'name', 'character varying (10)'), ('empty_table', None, None)]
+
+
+class TestCatalogHelpers:
+    def test_ddl_schemas(self):
+        assert ddl_schemas('create table working.node (id int)', 'public', 'PG') == {'working'}
+        assert ddl_schemas('drop table if exists "Working"."Node"; create table node2 (id int)', 'public', 'PG') == \
+            {'Working', 'public'}
+        assert ddl_schemas('alter table [dbo].[Node] add x int', 'dbo', 'MS') == {'dbo'}
+        assert ddl_schemas('create or replace view working.v as select 1', 'public', 'PG') == {'working'}
+        assert ddl_schemas('select * from working.node', 'public', 'PG') == set()
+        # Targets can't be read from sp_rename
+        assert ddl_schemas("exec sp_rename 'dbo.node.x', 'y', 'COLUMN'", 'dbo', 'MS') is None
+
+    def test_changes_schemas(self):
+        assert changes_schemas('create schema working')
+        assert not changes_schemas('create table working.node (id int)')
+
+
+class TestCatalogCache:
+    def test_load_and_lookup(self):
+        catalog = CatalogCache()
+        assert catalog.get('working') is None
+
+        catalog.load('working', ROWS)
+        snapshot = catalog.get('working')
+        assert snapshot['node'] == [('id', 'integer'), ('name', 'character varying (10)')]
+        assert snapshot['empty_table'] == []
+        assert 'other' not in snapshot
+        assert catalog.stats()['hits'] == 1
+        assert catalog.stats()['misses'] == 1
+
+    def test_case_insensitive(self):
+        catalog = CatalogCache(case_sensitive=False)
+        catalog.load('DBO', [('Node', 'ID', 'int')])
+        assert catalog.key('NODE') in catalog.get('dbo')
+
+    def test_ttl(self):
+        catalog = CatalogCache(ttl=0.05)
+        catalog.load('working', ROWS)
+        catalog.load_schemas(['working', 'public'])
+        assert catalog.get('working') is not None
+        time.sleep(0.1)
+        assert catalog.get('working') is None
+        assert catalog.get_schemas() is None
+
+    def test_invalidate(self):
+        catalog = CatalogCache()
+        catalog.load('working', ROWS)
+        catalog.load('public', ROWS)
+        catalog.load_schemas(['working', 'public'])
+
+        assert catalog.invalidate({'working'}) == 1
+        assert catalog.get('working') is None
+        assert catalog.get('public') is not None
+        assert catalog.get_schemas() == ['working', 'public']
+
+        assert catalog.invalidate(None, schema_list=True) == 2
+        assert catalog.get('public') is None
+        assert catalog.get_schemas() is None
+
+    def test_refresh(self):
+        catalog = CatalogCache()
+        catalog.load('working', ROWS)
+        catalog.load('public', ROWS)
+        catalog.refresh('working')
+        assert catalog.get('working') is None
+        assert catalog.get('public') is not None
+
+        catalog.refresh()
+        assert len(catalog) == 0
+
+
+class TestOgrLoads:
+    def test_loads_invalidate_schema(self, monkeypatch):
+        for method in ('_DbConnect__get_credentials', '_DbConnect__cleanup_subroutine'):
+            monkeypatch.setattr(pysqldb.DbConnect, method, lambda self: None)
+        # ogr2ogr runs in a subprocess, outside of query
+        for cls, method in ((pysqldb.Shapefile, 'read_shp'), (pysqldb.Shapefile, 'read_feature_class'),
+                            (pysqldb.Geopackage, 'read_gpkg')):
+            monkeypatch.setattr(cls, method, lambda *args, **kwargs: None)
+        monkeypatch.setattr(pysqldb.DbConnect, 'dfquery', lambda *args, **kwargs: None)
+
+        db = pysqldb.DbConnect(type='PG', server='catalog-test', database='db', user='u', password='p',
+                               cache_catalog=True, quiet=True)
+        loads = (
+            lambda: db.shp_to_table(path='/data', shp_name='node.shp', schema='working', gdal_data_loc='gdal',
+                                    temp=False),
+            lambda: db.feature_class_to_table('/data/db.gdb', shp_name='node', schema='working', gdal_data_loc='gdal',
+                                              temp=False),
+            lambda: db.gpkg_to_table('node.gpkg', 'node', path='/data', schema='working', gdal_data_loc='gdal',
+                                     temp=False),
+        )
+        for load in loads:
+            db.catalog.load('working', ROWS)
+            db.catalog.load('public', ROWS)
+            load()
+            assert db.catalog.get('working') is None
+            assert db.catalog.get('public') is not None
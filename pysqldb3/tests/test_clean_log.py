@@ -1,4 +1,5 @@
 import configparser
+import time
 
 from .. import pysqldb3 as pysqldb
 from ..data_io import *
@@ -24,6 +25,34 @@ test_clean_up_new_table = 'test_new_table_testing_{}'.format(db.user)
 test_clean_up_new_table2 = 'test_new_table_testing_{}_2'.format(db.user)
 
 
+def connect(section, **kwargs):
+    return pysqldb.DbConnect(type=config.get(section, 'TYPE'),
+                             server=config.get(section, 'SERVER'),
+                             database=config.get(section, 'DB_NAME'),
+                             user=config.get(section, 'DB_USER'),
+                             password=config.get(section, 'DB_PASSWORD'),
+                             allow_temp_tables=True, **kwargs)
+
+
+def create_logged(dbc, schema, table):
+    dbc.drop_table(table=table, schema=schema, strict=False, internal=True)
+    dbc.query('CREATE TABLE {s}.{t} (id int);'.format(s=schema, t=table))
+
+
+def drop_unlogged(dbc, schema, table):
+    # Drops the table the way another client would, without removing it from the log
+    cur = dbc.conn.cursor()
+    cur.execute('DROP TABLE {s}.{t}'.format(s=schema, t=table))
+    dbc.conn.commit()
+    cur.close()
+
+
+def logged(dbc, schema, table):
+    # Internal queries don't count toward log_reconcile_every
+    return not dbc.dfquery("select * from {s}.__temp_log_table_{u}__ where table_name = '{t}'".format(
+        s=schema, u=dbc.user, t=table), internal=True).empty
+
+
 class TestCleanUpNewTablesPg:
     def test_clean_up_new_tables_basic(self):
         schema = 'public'
@@ -350,3 +379,127 @@ class TestCleanUpNewTablesMs:
         ))
         print(sql.data)
         assert not sql.data
+
+
+class TestReconcileLogsPg:
+    def test_reconcile_logs(self):
+        schema = 'public'
+        create_logged(db, schema, test_clean_up_new_table)
+        create_logged(db, schema, test_clean_up_new_table2)
+        drop_unlogged(db, schema, test_clean_up_new_table)
+        assert logged(db, schema, test_clean_up_new_table)
+
+        db.reconcile_logs()
+        # The dropped table's row is removed; the live table's is kept
+        assert not logged(db, schema, test_clean_up_new_table)
+        assert logged(db, schema, test_clean_up_new_table2)
+
+        db.drop_table(table=test_clean_up_new_table2, schema=schema)
+
+    def test_reconcile_every(self):
+        schema = 'public'
+        dbc = connect('PG_DB', log_reconcile_every=2, log_reconcile_seconds=None,
+                      log_reconcile_on_disconnect=False)
+        # The create is the first user query
+        create_logged(dbc, schema, test_clean_up_new_table)
+        drop_unlogged(dbc, schema, test_clean_up_new_table)
+        assert logged(dbc, schema, test_clean_up_new_table)
+
+        dbc.query('select 1 as x')
+        assert not logged(dbc, schema, test_clean_up_new_table)
+        dbc.disconnect(True)
+
+    def test_reconcile_seconds(self):
+        schema = 'public'
+        dbc = connect('PG_DB', log_reconcile_every=None, log_reconcile_seconds=2,
+                      log_reconcile_on_disconnect=False)
+        create_logged(dbc, schema, test_clean_up_new_table)
+        drop_unlogged(dbc, schema, test_clean_up_new_table)
+        dbc.query('select 1 as x')
+        assert logged(dbc, schema, test_clean_up_new_table)
+
+        time.sleep(2.5)
+        dbc.query('select 1 as x')
+        assert not logged(dbc, schema, test_clean_up_new_table)
+        dbc.disconnect(True)
+
+    def test_reconcile_on_disconnect(self):
+        schema = 'public'
+        dbc = connect('PG_DB', log_reconcile_every=None, log_reconcile_seconds=None,
+                      log_reconcile_on_disconnect=False)
+        create_logged(dbc, schema, test_clean_up_new_table)
+        drop_unlogged(dbc, schema, test_clean_up_new_table)
+        dbc.disconnect(True)
+        assert logged(db, schema, test_clean_up_new_table)
+
+        dbc = connect('PG_DB', log_reconcile_every=None, log_reconcile_seconds=None,
+                      log_reconcile_on_disconnect=True)
+        create_logged(dbc, schema, test_clean_up_new_table2)
+        drop_unlogged(dbc, schema, test_clean_up_new_table2)
+        dbc.disconnect(True)
+        assert not logged(db, schema, test_clean_up_new_table2)
+
+        db.reconcile_logs()
+        assert not logged(db, schema, test_clean_up_new_table)
+
+
+class TestReconcileLogsMs:
+    def test_reconcile_logs(self):
+        schema = sql.default_schema
+        create_logged(sql, schema, test_clean_up_new_table)
+        create_logged(sql, schema, test_clean_up_new_table2)
+        drop_unlogged(sql, schema, test_clean_up_new_table)
+        assert logged(sql, schema, test_clean_up_new_table)
+
+        sql.reconcile_logs()
+        # The dropped table's row is removed; the live table's is kept
+        assert not logged(sql, schema, test_clean_up_new_table)
+        assert logged(sql, schema, test_clean_up_new_table2)
+
+        sql.drop_table(table=test_clean_up_new_table2, schema=schema)
+
+    def test_reconcile_every(self):
+        schema = sql.default_schema
+        dbc = connect('SQL_DB', log_reconcile_every=2, log_reconcile_seconds=None,
+                      log_reconcile_on_disconnect=False)
+        # The create is the first user query
+        create_logged(dbc, schema, test_clean_up_new_table)
+        drop_unlogged(dbc, schema, test_clean_up_new_table)
+        assert logged(dbc, schema, test_clean_up_new_table)
+
+        dbc.query('select 1 as x')
+        assert not logged(dbc, schema, test_clean_up_new_table)
+        dbc.disconnect(True)
+
+    def test_reconcile_seconds(self):
+        schema = sql.default_schema
+        dbc = connect('SQL_DB', log_reconcile_every=None, log_reconcile_seconds=2,
+                      log_reconcile_on_disconnect=False)
+        create_logged(dbc, schema, test_clean_up_new_table)
+        drop_unlogged(dbc, schema, test_clean_up_new_table)
+        dbc.query('select 1 as x')
+        assert logged(dbc, schema, test_clean_up_new_table)
+
+        time.sleep(2.5)
+        dbc.query('select 1 as x')
+        assert not logged(dbc, schema, test_clean_up_new_table)
+        dbc.disconnect(True)
+
+    def test_reconcile_on_disconnect(self):
+        schema = sql.default_schema
+        dbc = connect('SQL_DB', log_reconcile_every=None, log_reconcile_seconds=None,
+                      log_reconcile_on_disconnect=False)
+        create_logged(dbc, schema, test_clean_up_new_table)
+        drop_unlogged(dbc, schema, test_clean_up_new_table)
+        dbc.disconnect(True)
+        assert logged(sql, schema, test_clean_up_new_table)
+
+        dbc = connect('SQL_DB', log_reconcile_every=None, log_reconcile_seconds=None,
+                      log_reconcile_on_disconnect=True)
+        create_logged(dbc, schema, test_clean_up_new_table2)
+        drop_unlogged(dbc, schema, test_clean_up_new_table2)
+        dbc.disconnect(True)
+        assert not logged(sql, schema, test_clean_up_new_table2)
+
+        sql.reconcile_logs()
+        assert not logged(sql, schema, test_clean_up_new_table)
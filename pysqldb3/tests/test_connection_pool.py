@@ -0,0 +1,40 @@
+from types import SimpleNamespace
+
+from .. import pysqldb3 as pysqldb
+from ..pool import close_all_pools
+
+
+class TestSharedPool:
+    def test_two_instances_share_key(self, monkeypatch):
+        opened = list()
+
+        def connect(**params):
+            conn = SimpleNamespace(closed=0, params=params, close=lambda: None)
+            opened.append(conn)
+            return conn
+
+        monkeypatch.setattr(pysqldb.psycopg2, 'connect', connect)
+        for method in ('_DbConnect__get_credentials', '_DbConnect__cleanup_subroutine'):
+            monkeypatch.setattr(pysqldb.DbConnect, method, lambda self: None)
+
+        def make():
+            return pysqldb.DbConnect(type='PG', server='pool-test', database='db', user='u', password='p',
+                                     pooled=True, quiet=True)
+
+        try:
+            a, b = make(), make()
+            a.connect(quiet=True)
+            b.connect(quiet=True)
+
+            # Both share one pool, but each keeps the connection it checked out
+            assert a.pool is b.pool
+            assert len(opened) == 2
+            assert a.conn is opened[0]
+            assert b.conn is opened[1]
+            assert set(a.pool.in_use) == {id(a.conn), id(b.conn)}
+
+            a.pool.checkin(a.conn)
+            assert list(a.pool.in_use) == [id(b.conn)]
+            assert b.conn is opened[1]
+        finally:
+            close_all_pools()
@@ -0,0 +1,79 @@
+import time
+from types import SimpleNamespace
+
+from ..pool import ConnectionRegistry
+
+
+class Sessions:
+    def __init__(self):
+        self.created = list()
+        self.closed = list()
+
+    def factory(self, name):
+        def make():
+            session = SimpleNamespace(name=name)
+            self.created.append(session)
+            return session
+        return make
+
+    def close(self, session):
+        self.closed.append(session.name)
+
+
+class TestConnectionRegistry:
+    def test_reuse(self):
+        sessions = Sessions()
+        registry = ConnectionRegistry(sessions.close)
+
+        first = registry.get(('server', 'db1'), sessions.factory('db1'))
+        assert registry.get(('server', 'db1'), sessions.factory('db1')) is first
+        registry.get(('server', 'db2'), sessions.factory('db2'))
+
+        assert len(sessions.created) == 2
+        assert registry.reused == 1
+        assert len(registry) == 2
+
+    def test_max_age(self):
+        sessions = Sessions()
+        registry = ConnectionRegistry(sessions.close, max_age=0.05)
+
+        first = registry.get('db1', sessions.factory('db1'))
+        time.sleep(0.1)
+        assert registry.get('db1', sessions.factory('db1')) is not first
+        assert sessions.closed == ['db1']
+
+    def test_idle_timeout(self):
+        sessions = Sessions()
+        registry = ConnectionRegistry(sessions.close, max_age=None, idle_timeout=0.05)
+
+        registry.get('db1', sessions.factory('db1'))
+        time.sleep(0.1)
+        registry.get('db2', sessions.factory('db2'))
+        assert sessions.closed == ['db1']
+        assert len(registry) == 1
+
+    def test_max_size(self):
+        sessions = Sessions()
+        registry = ConnectionRegistry(sessions.close, max_size=2)
+
+        registry.get('db1', sessions.factory('db1'))
+        registry.get('db2', sessions.factory('db2'))
+        registry.get('db1', sessions.factory('db1'))
+        registry.get('db3', sessions.factory('db3'))
+
+        # db2 was least recently used
+        assert sessions.closed == ['db2']
+        assert len(registry) == 2
+
+    def test_close_all(self):
+        sessions = Sessions()
+        registry = ConnectionRegistry(sessions.close)
+        registry.get('db1', sessions.factory('db1'))
+        registry.get('db2', sessions.factory('db2'))
+
+        registry.close('db1')
+        assert sessions.closed == ['db1']
+
+        registry.close_all()
+        assert sorted(sessions.closed) == ['db1', 'db2']
+        assert len(registry) == 0
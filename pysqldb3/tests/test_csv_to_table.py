@@ -473,6 +473,34 @@ class TestBulkCSVToTablePG:
         # Cleanup
         db.drop_table(schema=pg_schema, table=pg_table_name)
 
+    def test_bulk_csv_to_table_staging_profile(self):
+        # bulk_csv_to_table
+        db.query('drop table if exists {}.{}'.format(pg_schema, create_table_name))
+
+        fp = helpers.DIR + "\\bulk_staging_profile.csv"
+        pd.DataFrame({'id': [1, 2, 3], 'amount': ['1.5', 'n/a', '2'], 'empty': [None] * 3}).to_csv(fp, index=False)
+        input_schema = [['id', 'bigint'], ['amount', 'float'], ['empty', 'bigint']]
+        db.query('create table {}.{} (id bigint, amount float, empty bigint)'.format(pg_schema, create_table_name))
+
+        queries = len(db.internal_queries)
+        db._bulk_csv_to_table(input_file=fp, table=create_table_name, schema=pg_schema, table_schema=input_schema)
+
+        # The staging table is profiled in one scan
+        profiles = [q for q in list(db.internal_queries)[queries:] if 'count("amount")' in q.query_string]
+        assert len(profiles) == 1
+
+        # Values that won't cast and empty columns make the column varchar
+        types = dict(db.get_table_columns(create_table_name, schema=pg_schema))
+        assert types['id'] == 'bigint'
+        assert types['amount'].startswith('character varying')
+        assert types['empty'].startswith('character varying')
+        db_df = db.dfquery("select * from {}.{} order by id".format(pg_schema, create_table_name))
+        assert list(db_df['amount']) == ['1.5', 'n/a', '2']
+
+        # Cleanup
+        db.drop_table(schema=pg_schema, table=create_table_name)
+        os.remove(fp)
+
     def test_bulk_csv_to_table_basic_kwargs(self):
         # csv_to_table
         db.query('drop table if exists {}.{}'.format(pg_schema, create_table_name))
@@ -537,6 +565,140 @@ class TestBulkCSVToTablePG:
         # Cleanup
         db.drop_table(schema=pg_schema, table=create_table_name)
 
+    def test_bulk_csv_to_table_unconvertible_rows(self, capsys):
+        # csv_to_table
+        if db.table_exists(schema=pg_schema, table=create_table_name):
+            db.drop_table(schema=pg_schema, table=create_table_name)
+
+        fp = helpers.DIR + "\\bulk_bad_rows.csv"
+        df = pd.DataFrame({'id': [str(i) for i in range(2000)], 'name': ["it's, \"{}\"".format(i) for i in range(2000)]})
+        df.loc[1500, 'id'] = 'not a number'
+        df.to_csv(fp, index=False)
+
+        # Force a type the file doesn't fit; the row that fails is loaded through staging
+        db.csv_to_table(input_file=fp, table=create_table_name, schema=pg_schema, batch_size=500,
+                        column_type_overrides={'id': 'bigint'})
+
+        db_df = db.dfquery("select * from {}.{} order by name".format(pg_schema, create_table_name))
+        assert len(db_df) == 2000
+        assert 'not a number' in set(db_df['id'])
+        assert set(db_df['name']) == set(df['name'])
+        assert not db.table_exists(table='stg_' + create_table_name, schema=pg_schema)
+
+        # Only the failing count and a few examples are fetched for the column that changed
+        assert '1 values in "id" can\'t be cast to bigint (ex. \'not a number\')' in capsys.readouterr().out
+
+        # Cleanup
+        db.drop_table(schema=pg_schema, table=create_table_name)
+        os.remove(fp)
+
+    def test_bulk_csv_to_table_checkpoint_resume(self, monkeypatch):
+        # csv_to_table
+        if db.table_exists(schema=pg_schema, table=create_table_name):
+            db.drop_table(schema=pg_schema, table=create_table_name)
+
+        fp = helpers.DIR + "\\bulk_checkpoint.csv"
+        df = pd.DataFrame({'id': range(2000), 'note': ['two\nlines' if i % 3 else 'n{}'.format(i) for i in range(2000)]})
+        df.to_csv(fp, index=False)
+
+        # Stop the load while it reads its fourth batch
+        bulk_text_rows = pysqldb.bulk_text_rows
+        batches = list()
+
+        def interrupted(chunk, column_types):
+            batches.append(len(chunk))
+            if len(batches) == 4:
+                raise RuntimeError('connection lost')
+            return bulk_text_rows(chunk, column_types)
+
+        monkeypatch.setattr(pysqldb, 'bulk_text_rows', interrupted)
+        try:
+            db.csv_to_table(input_file=fp, table=create_table_name, schema=pg_schema, batch_size=500, checkpoint=True)
+        except AssertionError:
+            pass
+        monkeypatch.setattr(pysqldb, 'bulk_text_rows', bulk_text_rows)
+
+        assert db.dfquery("select count(*) as cnt from {}.{}".format(pg_schema, create_table_name)).cnt[0] == 1500
+        progress = db.dfquery("select * from {}.stg_{}_checkpoint".format(pg_schema, create_table_name))
+        assert (progress.batch_id[0], progress.rows_read[0]) == (3, 1500)
+
+        # Picks up at row 1500 without loading any batch twice
+        db.csv_to_table(input_file=fp, table=create_table_name, schema=pg_schema, batch_size=500, checkpoint=True)
+
+        db_df = db.dfquery("select * from {}.{} order by id".format(pg_schema, create_table_name))
+        assert list(db_df['id']) == list(range(2000))
+        assert list(db_df['note']) == list(df['note'])
+        assert not db.table_exists(table='stg_{}_checkpoint'.format(create_table_name), schema=pg_schema)
+
+        # Cleanup
+        db.drop_table(schema=pg_schema, table=create_table_name)
+        os.remove(fp)
+
+    def test_bulk_csv_to_table_checkpoint_resume_blank_lines(self, monkeypatch):
+        # csv_to_table
+        if db.table_exists(schema=pg_schema, table=create_table_name):
+            db.drop_table(schema=pg_schema, table=create_table_name)
+
+        # CRLF file with blank and whitespace-only lines, which pandas skips
+        fp = helpers.DIR + "\\bulk_checkpoint_blank.csv"
+        with open(fp, 'w', newline='') as f:
+            f.write('id,note\r\n')
+            for i in range(2000):
+                f.write('{i},n{i}\r\n'.format(i=i))
+                if i % 7 == 0:
+                    f.write('   \r\n')
+                if i % 11 == 0:
+                    f.write('\r\n \t\r\n')
+
+        # Stop the load while it reads its fourth batch
+        bulk_text_rows = pysqldb.bulk_text_rows
+        batches = list()
+
+        def interrupted(chunk, column_types):
+            batches.append(len(chunk))
+            if len(batches) == 4:
+                raise RuntimeError('connection lost')
+            return bulk_text_rows(chunk, column_types)
+
+        monkeypatch.setattr(pysqldb, 'bulk_text_rows', interrupted)
+        try:
+            db.csv_to_table(input_file=fp, table=create_table_name, schema=pg_schema, batch_size=500, checkpoint=True)
+        except AssertionError:
+            pass
+        monkeypatch.setattr(pysqldb, 'bulk_text_rows', bulk_text_rows)
+
+        assert db.dfquery("select count(*) as cnt from {}.{}".format(pg_schema, create_table_name)).cnt[0] == 1500
+
+        # Every row is loaded exactly once
+        db.csv_to_table(input_file=fp, table=create_table_name, schema=pg_schema, batch_size=500, checkpoint=True)
+
+        db_df = db.dfquery("select * from {}.{} order by id".format(pg_schema, create_table_name))
+        assert list(db_df['id']) == list(range(2000))
+        assert list(db_df['note']) == ['n{}'.format(i) for i in range(2000)]
+
+        # Cleanup
+        db.drop_table(schema=pg_schema, table=create_table_name)
+        os.remove(fp)
+
+    def test_bulk_csv_to_table_compressed_workers(self):
+        # csv_to_table
+        if db.table_exists(schema=pg_schema, table=create_table_name):
+            db.drop_table(schema=pg_schema, table=create_table_name)
+
+        # Compressed files can't be split on newlines; they are loaded with one worker
+        fp = helpers.DIR + "\\bulk_compressed.csv.gz"
+        df = pd.DataFrame({'id': range(5000), 'note': ['n{}'.format(i) for i in range(5000)]})
+        df.to_csv(fp, index=False)
+        db.csv_to_table(input_file=fp, table=create_table_name, schema=pg_schema, workers=4)
+
+        db_df = db.dfquery("select * from {}.{} order by id".format(pg_schema, create_table_name))
+        assert list(db_df['id']) == list(range(5000))
+        assert list(db_df['note']) == list(df['note'])
+
+        # Cleanup
+        db.drop_table(schema=pg_schema, table=create_table_name)
+        os.remove(fp)
+
     def test_bulk_csv_to_table_input_schema(self):
         # Test input schema
         return
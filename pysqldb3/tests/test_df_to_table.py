@@ -492,6 +492,27 @@ class TestDfToTablePG:
         # Cleanup
         db.drop_table(table=table_name, schema='working')
 
+    def test_df_to_table_pg_bulk_matches_row_by_row(self):
+        # Quotes, commas, NULLs and empty strings
+        test_df = pd.DataFrame([{"a": 1, "b": "it's, \"quoted\"", "c": None},
+                                {"a": 2, "b": "", "c": 1.5}])
+        table_schema = [['a', 'bigint'], ['b', 'varchar(500)'], ['c', 'float']]
+
+        db.dataframe_to_table_schema(df=test_df, table=table_name, schema='working', overwrite=True)
+        db.dataframe_to_table(df=test_df, table=table_name, schema='working', table_schema=table_schema, bulk=False)
+        row_by_row = db.dfquery('select * from working.{} order by a'.format(table_name))
+
+        db.dataframe_to_table_schema(df=test_df, table=table_name, schema='working', overwrite=True)
+        db.dataframe_to_table(df=test_df, table=table_name, schema='working', table_schema=table_schema,
+                              batch_size=1)
+        bulk = db.dfquery('select * from working.{} order by a'.format(table_name))
+
+        pd.testing.assert_frame_equal(row_by_row, bulk)
+        assert bulk.b[0] == "it's, \"quoted\""
+
+        # Cleanup
+        db.drop_table(table=table_name, schema='working')
+
     # Log tests are in test_dbconnect
 
 
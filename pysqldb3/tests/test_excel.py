@@ -0,0 +1,52 @@
+import datetime
+
+import openpyxl
+import pytest
+
+from ..excel import XlsxSheet, excel_cell_text
+
+
+def write_xlsx(path):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = 'first'
+    ws.append([])
+    ws.append(['id', 'amount', None, 'amount', 'when'])
+    ws.append([1, 2.0, 'a', 'x', datetime.datetime(2020, 1, 2, 3, 4)])
+    ws.append([])
+    ws.append([2, 2.5, None, None, datetime.date(2020, 1, 3), 'past the header'])
+    ws.append([3, '#N/A'])
+    ws['B6'].data_type = 'e'
+    wb.create_sheet('second').append(['b'])
+    wb.save(path)
+
+
+class TestXlsxSheet:
+    def test_cell_text(self):
+        assert [excel_cell_text(v) for v in (None, 3, 3.0, 0.1, True, 'a')] == [None, '3', '3', '0.1', 'True', 'a']
+        assert excel_cell_text(datetime.datetime(2020, 1, 2, 3, 4)) == '2020-01-02 03:04:00'
+        assert excel_cell_text(datetime.date(2020, 1, 2)) == '2020-01-02'
+
+    def test_rows(self, tmp_path):
+        fp = str(tmp_path / 'sheet_test.xlsx')
+        write_xlsx(fp)
+
+        with XlsxSheet(fp) as sheet:
+            assert sheet.sheet_names == ['first', 'second']
+            assert sheet.columns == ['id', 'amount', 'Unnamed: 2', 'amount.1', 'when']
+
+            # Blank rows are skipped, error values are missing and cells past the header aren't read
+            assert list(sheet.batches(2)) == [
+                [('1', '2', 'a', 'x', '2020-01-02 03:04:00'), ('2', '2.5', None, None, '2020-01-03 00:00:00')],
+                [('3', None, None, None, None)]]
+
+    def test_sheet_name(self, tmp_path):
+        fp = str(tmp_path / 'sheet_test.xlsx')
+        write_xlsx(fp)
+
+        with XlsxSheet(fp, sheet_name='second') as sheet:
+            assert sheet.columns == ['b'] and list(sheet.batches()) == []
+        with XlsxSheet(fp, sheet_name=1) as sheet:
+            assert sheet.columns == ['b']
+        with pytest.raises(ValueError):
+            XlsxSheet(fp, sheet_name='missing')
@@ -0,0 +1,44 @@
+import os
+
+import pandas as pd
+
+from ..partition import csv_partitions
+
+
+def write_csv(path):
+    df = pd.DataFrame({'id': range(1000),
+                       'note': ['two\nlines, "quoted"' if i % 3 == 0 else 'n{}'.format(i) for i in range(1000)]})
+    df.to_csv(path, index=False)
+    return df
+
+
+class TestCsvPartitions:
+    def test_partitions_cover_file(self, tmp_path):
+        fp = str(tmp_path / 'partition_test.csv')
+        df = write_csv(fp)
+
+        parts = csv_partitions(fp, 4, min_size=1000)
+        assert len(parts) == 4
+        assert parts[-1].end == os.path.getsize(fp)
+        assert all(a.end == b.start for a, b in zip(parts, parts[1:]))
+
+        # Every part parses with the header and no row is split, even with quoted line breaks
+        frames = list()
+        for part in parts:
+            with part.open() as f:
+                frames.append(pd.read_csv(f))
+        assert all(list(frame.columns) == ['id', 'note'] for frame in frames)
+        pd.testing.assert_frame_equal(pd.concat(frames, ignore_index=True), df)
+
+    def test_small_files_are_not_split(self, tmp_path):
+        fp = str(tmp_path / 'partition_test.csv')
+        write_csv(fp)
+
+        assert len(csv_partitions(fp, 4)) == 1
+        assert len(csv_partitions(fp, 4, min_size=os.path.getsize(fp) // 2)) == 2
+
+    def test_header_only(self, tmp_path):
+        fp = str(tmp_path / 'partition_header.csv')
+        with open(fp, 'w') as f:
+            f.write('a,b\n')
+        assert csv_partitions(fp, 4, min_size=1) == []
@@ -2,6 +2,8 @@
 Joint testing script for DbConnect and Query classes
 """
 import os
+import threading
+import time
 from collections.abc import Iterable
 from decimal import Decimal
 
@@ -452,3 +454,147 @@ class TestDfQuery:
         print(db_df)
         print(df)
         pd.testing.assert_frame_equal(db_df, df, check_column_type=False)
+
+
+
+PG_SERIES = 'select n from generate_series(1, {}) n order by n'
+MS_SERIES = 'with s as (select 1 as n union all select n + 1 from s where n < {}) select n from s order by n'
+
+
+class TestIterQuery:
+    def test_iter_query_batches_pg(self):
+        batches = list(db.iter_query(PG_SERIES.format(25), batch_size=10))
+        assert [len(b) for b in batches] == [10, 10, 5]
+        assert [r[0] for b in batches for r in b] == list(range(1, 26))
+
+        # No empty batch when the rows divide evenly
+        assert [len(b) for b in db.iter_query(PG_SERIES.format(20), batch_size=10)] == [10, 10]
+        assert not db.open_iterators
+
+    def test_dfquery_chunksize_pg(self):
+        chunks = list(db.dfquery(PG_SERIES.format(25), chunksize=10))
+        assert [len(c) for c in chunks] == [10, 10, 5]
+        assert all(list(c.columns) == ['n'] for c in chunks)
+        pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), db.dfquery(PG_SERIES.format(25)))
+
+    def test_iter_query_close_early_pg(self):
+        batches = db.iter_query(PG_SERIES.format(25), batch_size=10)
+        assert len(next(batches)) == 10
+        assert db.open_iterators == 1
+
+        batches.close()
+        assert not db.open_iterators
+        assert db.queries[-1].current_cur is None
+        assert db.queries[-1].rows == 10
+
+        # The connection is still usable
+        assert db.dfquery('select 1 as x').x.values[0] == 1
+
+    def test_iter_query_commit_while_open_pg(self):
+        db.drop_table(table=test_query_table, schema='working')
+        db.query('create table working.{} (n int)'.format(test_query_table))
+
+        batches = db.iter_query(PG_SERIES.format(30), batch_size=10)
+        rows = list(next(batches))
+
+        # Commits on the connection the cursor is reading from; the held cursor stays open
+        db.query('insert into working.{} values (1)'.format(test_query_table))
+        for b in batches:
+            rows += b
+
+        assert [r[0] for r in rows] == list(range(1, 31))
+        assert db.dfquery('select count(*) as cnt from working.{}'.format(test_query_table)).cnt.values[0] == 1
+
+        db.drop_table(table=test_query_table, schema='working')
+
+    def test_iter_query_batches_ms(self):
+        batches = list(sql.iter_query(MS_SERIES.format(25), batch_size=10))
+        assert [len(b) for b in batches] == [10, 10, 5]
+        assert [r[0] for b in batches for r in b] == list(range(1, 26))
+
+        chunks = list(sql.dfquery(MS_SERIES.format(25), chunksize=10))
+        assert [len(c) for c in chunks] == [10, 10, 5]
+        assert list(pd.concat(chunks, ignore_index=True).n) == list(range(1, 26))
+
+    def test_iter_query_close_early_ms(self):
+        batches = sql.iter_query(MS_SERIES.format(25), batch_size=10)
+        assert len(next(batches)) == 10
+
+        # SQL Server streams one result at a time
+        try:
+            next(sql.iter_query(MS_SERIES.format(5)))
+            assert False
+        except RuntimeError:
+            pass
+
+        batches.close()
+        assert not sql.open_iterators
+        assert [len(b) for b in sql.iter_query(MS_SERIES.format(5), batch_size=10)] == [5]
+
+class TestQueryCancel:
+    def test_query_timeout_pg(self):
+        start = time.time()
+        db.query('select pg_sleep(5)', strict=False, timeout=1)
+
+        assert time.time() - start < 4
+        assert db.queries[-1].timed_out
+        assert not db.queries[-1].cancelled
+        assert not db.running_queries
+
+        # The timeout only applied to that query
+        db.query('select pg_sleep(1.5)', timeout=None)
+        assert not db.queries[-1].timed_out
+
+    def test_query_cancel_from_thread_pg(self):
+        canceller = threading.Timer(1, db.cancel)
+        canceller.start()
+        start = time.time()
+        db.query('select pg_sleep(5)', strict=False)
+        canceller.join()
+
+        assert time.time() - start < 4
+        assert db.queries[-1].cancelled
+        assert not db.queries[-1].timed_out
+        assert not db.running_queries
+
+        # Nothing is running, so nothing is cancelled
+        assert db.cancel() == 0
+
+    def test_query_timeout_ms(self):
+        start = time.time()
+        sql.query("waitfor delay '00:00:05'", strict=False, timeout=1)
+
+        assert time.time() - start < 4
+        assert sql.queries[-1].timed_out
+        assert not sql.running_queries
+
+    def test_query_timeouts_overlap_ms(self):
+        # A timeout on one connection doesn't cut short a query without one on another
+        other = pysqldb.DbConnect(inherits_from=sql, quiet=True)
+        results = dict()
+
+        def run(dbconn, name, timeout):
+            dbconn.query("waitfor delay '00:00:03'", strict=False, timeout=timeout)
+            results[name] = dbconn.queries[-1]
+
+        threads = [threading.Thread(target=run, args=(sql, 'timed', 1)),
+                   threading.Thread(target=run, args=(other, 'untimed', None))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert results['timed'].timed_out
+        assert not results['untimed'].timed_out and not results['untimed'].error
+        other.disconnect(True)
+
+    def test_query_cancel_from_thread_ms(self):
+        canceller = threading.Timer(1, sql.cancel)
+        canceller.start()
+        start = time.time()
+        sql.query("waitfor delay '00:00:05'", strict=False)
+        canceller.join()
+
+        assert time.time() - start < 4
+        assert sql.queries[-1].cancelled
+        assert not sql.running_queries
@@ -0,0 +1,33 @@
+from ..batch import QueryBatch
+from ..query import RE_VALUES_PLACEHOLDER
+
+
+class TestQueryBatch:
+    def test_merges_same_statement(self):
+        batch = QueryBatch()
+        for i in range(3):
+            batch.query('update working.node set name = %s where id = %s', ('n{}'.format(i), i))
+        batch.query('delete from working.node where id = 0')
+        batch.query('update working.node set name = %s where id = %s', ('x', 9))
+
+        assert len(batch) == 3
+        assert batch.batches[0][1] == [('n0', 0), ('n1', 1), ('n2', 2)]
+        assert batch.batches[1] == ['delete from working.node where id = 0', None]
+        assert batch.batches[2][1] == [('x', 9)]
+        assert batch.statement_count() == 5
+
+    def test_execute_many(self):
+        batch = QueryBatch()
+        batch.execute_many('insert into working.node values (%s, %s)', ((i, 'n') for i in range(5)))
+        batch.query('insert into working.node values (%s, %s)', (5, 'n'))
+
+        assert len(batch) == 1
+        assert len(batch.batches[0][1]) == 6
+
+    def test_empty(self):
+        assert not QueryBatch()
+
+    def test_values_placeholder(self):
+        assert RE_VALUES_PLACEHOLDER.search('insert into working.node (id, name) VALUES %s')
+        assert RE_VALUES_PLACEHOLDER.search('insert into working.node values%s')
+        assert not RE_VALUES_PLACEHOLDER.search('insert into working.node values (%s, %s)')
@@ -0,0 +1,88 @@
+from types import SimpleNamespace
+
+import pytest
+
+from ..history import QueryHistory
+
+
+def make_query(i):
+    return SimpleNamespace(query_string='select {}'.format(i), data=[(i, 'row {}'.format(i))])
+
+
+class TestQueryHistory:
+    def test_keep_all(self):
+        history = QueryHistory()
+        for i in range(5):
+            history.append(make_query(i))
+
+        assert len(history) == 5
+        assert [q.data for q in history] == [[(i, 'row {}'.format(i))] for i in range(5)]
+
+    def test_ring_buffer(self):
+        history = QueryHistory(max_size=3)
+        for i in range(10):
+            history.append(make_query(i))
+
+        assert len(history) == 3
+        assert [q.query_string for q in history] == ['select 7', 'select 8', 'select 9']
+        assert history[-1].data == [(9, 'row 9')]
+        assert [q.query_string for q in history[:2]] == ['select 7', 'select 8']
+
+    def test_keep_last(self):
+        history = QueryHistory(data_mode='last')
+        queries = [make_query(i) for i in range(3)]
+        for q in queries:
+            history.append(q)
+
+        assert queries[0].data is None
+        assert queries[1].data is None
+        assert history[-1].data == [(2, 'row 2')]
+        assert history[0].query_string == 'select 0'
+
+    def test_spill(self):
+        history = QueryHistory(data_mode='spill')
+        queries = [make_query(i) for i in range(3)]
+        for q in queries:
+            history.append(q)
+
+        # Older data is off the in-memory objects but still readable through the history
+        assert queries[0].data is None
+        assert history[0].data == [(0, 'row 0')]
+        assert history[1].data == [(1, 'row 1')]
+        assert history[-1].data == [(2, 'row 2')]
+        assert [q.data for q in history][0] == [(0, 'row 0')]
+
+        history.clear()
+        assert len(history) == 0
+        assert history.spill_file is None
+
+    def test_spill_file_compacted(self):
+        history = QueryHistory(max_size=3, data_mode='spill')
+        for i in range(200):
+            history.append(make_query(i))
+
+        # Only the two older queries still in the history are spilled; evicted data doesn't pile up
+        assert [q.data for q in history] == [[(i, 'row {}'.format(i))] for i in range(197, 200)]
+        size = history.spill_file.seek(0, 2)
+        assert history.spilled_bytes <= size < 2 * history.spilled_bytes
+
+    def test_spill_file_truncated(self):
+        history = QueryHistory(max_size=2, data_mode='spill')
+        for i in range(5):
+            history.append(make_query(i))
+        history.append(SimpleNamespace(query_string='select', data=None))
+        history.append(SimpleNamespace(query_string='select', data=None))
+
+        # Nothing spilled is left in the history, so neither is anything in the file
+        assert history.spilled_bytes == 0
+        assert history.spill_file.seek(0, 2) == 0
+
+    def test_invalid_mode(self):
+        with pytest.raises(ValueError):
+            QueryHistory(data_mode='none')
+
+    def test_empty(self):
+        history = QueryHistory(max_size=2)
+        assert not history
+        with pytest.raises(IndexError):
+            history[-1]
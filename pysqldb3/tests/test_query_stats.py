@@ -0,0 +1,76 @@
+from types import SimpleNamespace
+
+from ..stats import QueryStats, approx_size, percentile
+
+
+def make_query(execute, rows=0, cached=False, error=None, cancelled=False, timed_out=False):
+    return SimpleNamespace(query_string='select 1', cached=cached, error=error, rows=rows, bytes_fetched=rows * 10,
+                           cancelled=cancelled, timed_out=timed_out,
+                           timings={'execute': execute, 'bookkeeping': execute * 2})
+
+
+class TestQueryStats:
+    def test_percentile(self):
+        values = list(range(1, 101))
+        assert percentile(values, 50) == 50
+        assert percentile(values, 95) == 95
+        assert percentile([3], 95) == 3
+        assert percentile([], 50) is None
+
+    def test_approx_size(self):
+        assert approx_size([]) == 0
+        rows = [(1, 'abc')] * 1000
+        assert approx_size(rows) == approx_size(rows[:10]) * 100
+
+    def test_summary(self):
+        stats = QueryStats()
+        for i in range(1, 21):
+            stats.record(make_query(i / 100.0, rows=i))
+        stats.record(make_query(0.5), internal=True)
+        stats.record(make_query(0.0, cached=True))
+        stats.record(make_query(0.01, error=Exception('failed')))
+        stats.record(make_query(0.01, error=Exception('canceling statement'), cancelled=True))
+        stats.record(make_query(0.01, error=Exception('canceling statement'), timed_out=True))
+
+        summary = stats.summary()
+        assert summary['user_queries'] == 24
+        assert summary['internal_queries'] == 1
+        assert summary['cached'] == 1
+        assert summary['failed'] == 3
+        assert summary['cancelled'] == 1
+        assert summary['timed_out'] == 1
+        assert summary['rows'] == sum(range(1, 21))
+        assert list(summary['phases']) == ['execute', 'bookkeeping']
+        assert summary['phases']['execute']['count'] == 25
+        assert summary['phases']['execute']['max'] == 0.5
+        assert summary['phases']['bookkeeping']['p50'] == 2 * summary['phases']['execute']['p50']
+
+    def test_max_samples(self):
+        stats = QueryStats(max_samples=5)
+        for i in range(10):
+            stats.record(make_query(float(i)))
+
+        execute = stats.summary()['phases']['execute']
+        # Totals cover every query, percentiles the most recent
+        assert execute['count'] == 10
+        assert execute['total'] == 45.0
+        assert execute['p50'] == 7.0
+
+    def test_callback(self):
+        records = list()
+        stats = QueryStats(callback=records.append)
+        stats.record(make_query(0.1, rows=3))
+        assert records[0]['rows'] == 3
+        assert records[0]['timings']['execute'] == 0.1
+
+        # A failing callback does not stop the query
+        stats.callback = lambda record: 1 / 0
+        stats.record(make_query(0.1))
+        assert stats.summary()['queries'] == 2
+
+    def test_reset(self):
+        stats = QueryStats()
+        stats.record(make_query(0.1))
+        stats.reset()
+        assert stats.summary()['queries'] == 0
+        assert stats.summary()['phases'] == {}
@@ -0,0 +1,87 @@
+import time
+
+from ..cache import ResultCache, normalize_sql, is_cacheable, is_ddl, referenced_tables, touches_catalog
+
+
+class TestResultCacheHelpers:
+    def test_normalize_sql(self):
+        assert normalize_sql("""
+            select *
+            from   working.node ;
+        """) == 'select * from working.node'
+        # Whitespace inside literals is kept
+        assert normalize_sql("select * from t where a = 'x  y'") == "select * from t where a = 'x  y'"
+
+    def test_is_cacheable(self):
+        assert is_cacheable('select * from working.node')
+        assert is_cacheable('  WITH t as (select 1) select * from t')
+        assert is_cacheable('select last_update, created_at from working.node')
+        assert not is_cacheable('select * into working.node_copy from working.node')
+        assert not is_cacheable('insert into working.node select 1')
+        assert not is_cacheable('select * from working.node for update')
+        assert not is_cacheable('drop table working.node')
+
+    def test_is_ddl(self):
+        assert is_ddl('alter table working.node rename to node2')
+        assert not is_ddl('select created from working.node')
+
+    def test_referenced_tables(self):
+        assert referenced_tables('select * from working.node n join [dbo].[Street] s on n.id = s.id') == \
+            {'node', 'street'}
+        assert referenced_tables('delete from "working"."Node_Copy" where id = 1') == {'node_copy'}
+        assert referenced_tables('select 1') == set()
+
+    def test_touches_catalog(self):
+        assert touches_catalog("select * from information_schema.columns where table_name = 'node'")
+        assert touches_catalog('select nspname from pg_namespace')
+        assert not touches_catalog('select * from working.node')
+
+
+class TestResultCache:
+    def test_hit_miss(self):
+        cache = ResultCache()
+        assert cache.get('a') is None
+        cache.put('a', 'select * from working.node', [(1,)], (('id', 20),), ['id'])
+
+        entry = cache.get('a')
+        assert entry.data == [(1,)]
+        assert entry.data_columns == ['id']
+        assert cache.stats()['hits'] == 1
+        assert cache.stats()['misses'] == 1
+        assert cache.stats()['hit_rate'] == 0.5
+
+    def test_lru(self):
+        cache = ResultCache(max_entries=2)
+        for k in ('a', 'b'):
+            cache.put(k, 'select 1', [(1,)], None, ['x'])
+        cache.get('a')
+        cache.put('c', 'select 1', [(1,)], None, ['x'])
+
+        # b was least recently used
+        assert cache.get('b') is None
+        assert cache.get('a') is not None
+        assert cache.get('c') is not None
+        assert cache.evictions == 1
+
+    def test_ttl(self):
+        cache = ResultCache(ttl=0.05)
+        cache.put('a', 'select 1', [(1,)], None, ['x'])
+        assert cache.get('a') is not None
+        time.sleep(0.1)
+        assert cache.get('a') is None
+
+    def test_invalidate(self):
+        cache = ResultCache()
+        cache.put('node', 'select * from working.node', [(1,)], None, ['x'])
+        cache.put('street', 'select * from working.street', [(1,)], None, ['x'])
+        cache.put('columns', "select * from information_schema.columns where table_name = 'node'", [(1,)], None,
+                  ['x'])
+
+        assert cache.invalidate([(None, None, 'working', 'Node')]) == 1
+        assert cache.get('node') is None
+        assert cache.get('street') is not None
+
+        # Catalog lookups are dropped on DDL
+        assert cache.invalidate(['working.other'], catalog=True) == 1
+        assert cache.get('columns') is None
+        assert cache.invalidations == 2
@@ -0,0 +1,63 @@
+import os
+
+import configparser
+import pandas as pd
+
+from .. import pysqldb3 as pysqldb
+
+config = configparser.ConfigParser()
+config.read(os.path.dirname(os.path.abspath(__file__)) + "\\db_config.cfg")
+
+db = pysqldb.DbConnect(type=config.get('PG_DB', 'TYPE'),
+                       server=config.get('PG_DB', 'SERVER'),
+                       database=config.get('PG_DB', 'DB_NAME'),
+                       user=config.get('PG_DB', 'DB_USER'),
+                       password=config.get('PG_DB', 'DB_PASSWORD'))
+
+test_table = 'pytest_parallel_{}'.format(db.user)
+
+
+class TestRunParallelPG:
+    def test_run_parallel_ordered_results(self):
+        results = db.run_parallel(['select {} as n, pg_sleep(0.1)'.format(i) for i in range(8)], max_workers=4)
+
+        assert [int(r.data.n[0]) for r in results] == list(range(8))
+        assert all(isinstance(r.data, pd.DataFrame) for r in results)
+        assert all(r.error is None and r.seconds > 0 for r in results)
+        assert db.queries[-1].query_string == 'select 7 as n, pg_sleep(0.1)'
+
+    def test_run_parallel_sessions_skip_cleanup(self, monkeypatch):
+        # Expired tables and the temp logs are left to db, which cleaned them up when it was created
+        cleaned = list()
+        cleanup = pysqldb.DbConnect._DbConnect__cleanup_subroutine
+
+        def counted(dbconn):
+            cleaned.append(dbconn)
+            return cleanup(dbconn)
+
+        monkeypatch.setattr(pysqldb.DbConnect, '_DbConnect__cleanup_subroutine', counted)
+        results = db.run_parallel(['select {} as n'.format(i) for i in range(4)], max_workers=4)
+
+        assert [int(r.data.n[0]) for r in results] == list(range(4))
+        assert cleaned == []
+
+    def test_run_parallel_errors(self):
+        results = db.run_parallel(['select 1 as n', 'select * from working.table_that_does_not_exist_{}'.format(
+            db.user)], max_workers=2, return_df=False)
+
+        assert results[0].data == [(1,)]
+        assert results[0].error is None
+        assert results[1].data is None
+        assert results[1].error is not None
+
+    def test_run_parallel_tables_created(self):
+        db.query('drop table if exists working.{t}_0; drop table if exists working.{t}_1'.format(t=test_table))
+        db.run_parallel(['create table working.{}_{} as select 1 as id'.format(test_table, i) for i in range(2)])
+
+        for i in range(2):
+            assert db.table_exists('{}_{}'.format(test_table, i), schema='working')
+            assert (None, None, 'working', '{}_{}'.format(test_table, i)) in db.tables_created
+            assert db.check_table_in_log('{}_{}'.format(test_table, i), schema='working')
+
+        db.cleanup_new_tables()
+        assert not db.table_exists('{}_0'.format(test_table), schema='working')
@@ -0,0 +1,48 @@
+import re
+
+from .. import pysqldb3 as pysqldb
+
+
+def make_db(monkeypatch, version):
+    for method in ('_DbConnect__get_credentials', '_DbConnect__cleanup_subroutine'):
+        monkeypatch.setattr(pysqldb.DbConnect, method, lambda self: None)
+    monkeypatch.setattr(pysqldb.DbConnect, '_DbConnect__get_server_version', lambda self: version)
+    return pysqldb.DbConnect(type='PG', server='staging-test', database='db', user='u', password='p', quiet=True)
+
+
+class TestStagingChecks:
+    def test_pre_16_conditions(self, monkeypatch):
+        db = make_db(monkeypatch, 150000)
+        condition = db._DbConnect__staging_invalid_condition
+
+        assert condition('c', 'varchar (500)') is None
+        assert condition('c', 'bigint') == pysqldb.PG_STAGING_INVALID_NUMBER_CONDITION.format(c='c')
+        assert condition('c', 'date') == pysqldb.PG_STAGING_INVALID_DATE_CONDITION.format(c='c')
+        assert condition('c', 'timestamp without time zone') == pysqldb.PG_STAGING_INVALID_DATE_CONDITION.format(c='c')
+        assert condition('c', 'boolean') == pysqldb.PG_STAGING_INVALID_BOOLEAN_CONDITION.format(c='c')
+        assert condition('c', 'uuid') == pysqldb.PG_STAGING_UNCHECKED_CONDITION.format(c='c')
+
+        assert db._DbConnect__staging_unchecked('uuid')
+        assert not db._DbConnect__staging_unchecked('date')
+        assert not db._DbConnect__staging_unchecked('text')
+
+    def test_16_conditions(self, monkeypatch):
+        db = make_db(monkeypatch, 160002)
+        condition = db._DbConnect__staging_invalid_condition
+
+        assert condition('c', 'uuid') == pysqldb.PG_STAGING_INVALID_CONDITION.format(c='c', t='uuid')
+        assert not db._DbConnect__staging_unchecked('uuid')
+
+    def test_pre_16_patterns(self):
+        # Postgres regexes use the same syntax as re for these patterns
+        date = re.search(r"'(\^.*\$)'", pysqldb.PG_STAGING_INVALID_DATE_CONDITION.format(c='c')).group(1)
+        boolean = re.search(r"'(\^.*\$)'", pysqldb.PG_STAGING_INVALID_BOOLEAN_CONDITION.format(c='c')).group(1)
+
+        for value in ('2024-01-31', '2024-01-31 12:30:00', '2024-01-31T12:30:00.5+02', '1/31/2024'):
+            assert re.match(date, value)
+        for value in ('Jan 31', '31.01.2024', 'n/a'):
+            assert not re.match(date, value)
+        for value in ('true', 'F', ' yes ', '0'):
+            assert re.match(boolean, value, re.IGNORECASE)
+        for value in ('maybe', '2'):
+            assert not re.match(boolean, value, re.IGNORECASE)
@@ -0,0 +1,112 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pyarrow
+
+from ..inference import ColumnProfile, profile_csv, profile_dataframe, merge_profiles, join_kinds, NULL, BOOLEAN, INTEGER, NUMERIC, \
+    DATE, TIMESTAMP, TEXT
+
+
+def profile(*chunks):
+    p = ColumnProfile('c')
+    for chunk in chunks:
+        p.update(pd.Series(chunk, dtype=object))
+    return p
+
+
+class TestTypeLattice:
+    def test_join_kinds(self):
+        assert join_kinds(NULL, INTEGER) == INTEGER
+        assert join_kinds(INTEGER, NUMERIC) == NUMERIC
+        assert join_kinds(DATE, TIMESTAMP) == TIMESTAMP
+        assert join_kinds(NUMERIC, DATE) == TEXT
+        assert join_kinds(TEXT, NULL) == TEXT
+        assert join_kinds(BOOLEAN, INTEGER) == TEXT
+
+    def test_profile_merges_chunks(self):
+        assert profile(['1', '2'], [None, ' 3 ']).sql_type() == 'bigint'
+        assert profile(['1', '2'], ['2.5']).sql_type() == 'float'
+        assert profile(['1'], ['abc']).kind == TEXT
+        assert profile(['2020-01-01'], ['1/2/2020 10:11']).kind == TIMESTAMP
+        assert profile([None], [None]).kind == NULL
+
+        # Once a column is text it stays text
+        assert profile(['abc'], ['1']).kind == TEXT
+
+    def test_profile_ranges_and_lengths(self):
+        p = profile(['1', '-5'], ['99999999999999999999'])
+        assert not p.fits_bigint()
+        assert p.sql_type() == 'numeric'
+
+        p = profile(['ab', None], ['abcd'])
+        assert (p.rows, p.nulls, p.max_length) == (3, 1, 4)
+        assert p.sql_type(varchar_length=10) == 'varchar (10)'
+
+    def test_profile_csv(self):
+        f = io.StringIO('id,x,d,s,e\n1,1.5,2020-01-01,a,\n2,2,2020-02-01,bc,\n,3e5,,"d,e",\n')
+        profiles = profile_csv(f, chunksize=1)
+        assert [p.name for p in profiles] == ['id', 'x', 'd', 's', 'e']
+        assert [p.kind for p in profiles] == [INTEGER, NUMERIC, DATE, TEXT, NULL]
+        assert [p.sql_type() for p in profiles] == ['bigint', 'float', 'varchar (500)', 'varchar (500)',
+                                                    'varchar (500)']
+        assert profiles[3].max_length == 3
+
+    def test_merge_profiles(self):
+        parts = [profile_csv(io.StringIO('a,b,c\n1,x,\n')), profile_csv(io.StringIO('a,b,c\n-70000,yy,2.5\n'))]
+        merged = merge_profiles(parts)
+        assert [(p.kind, p.rows, p.nulls, p.max_length) for p in merged] == [
+            (INTEGER, 2, 0, 6), (TEXT, 2, 0, 2), (NUMERIC, 2, 1, 3)]
+        assert [p.sql_type(tight=True) for p in merged] == ['int', 'varchar (2)', 'numeric (2, 1)']
+
+    def test_profile_csv_header_only(self):
+        profiles = profile_csv(io.StringIO('a,b\n'))
+        assert [(p.name, p.kind, p.rows) for p in profiles] == [('a', NULL, 0), ('b', NULL, 0)]
+
+
+class TestTightTypes:
+    def tight(self, *chunks, db_type='PG'):
+        return profile(*chunks).sql_type(tight=True, db_type=db_type)
+
+    def test_integers(self):
+        assert self.tight(['1', '-32768'], ['32767']) == 'smallint'
+        assert self.tight(['1', ' +40000 ']) == 'int'
+        assert self.tight(['-2147483649']) == 'bigint'
+        assert self.tight(['9223372036854775807']) == 'bigint'
+        assert self.tight(['9223372036854775808', '0012']) == 'numeric (19, 0)'
+        assert self.tight(['1' * 40]) == 'numeric'
+        assert self.tight(['1' * 40], db_type='MS') == 'float'
+
+    def test_numerics(self):
+        assert self.tight(['1.25', '-100.5'], ['7']) == 'numeric (5, 2)'
+        assert self.tight(['.5', '0.75']) == 'numeric (2, 2)'
+        assert self.tight(['1.5', '2e10']) == 'float'
+
+    def test_booleans_dates_and_text(self):
+        assert self.tight(['True', ' false'], [None]) == 'boolean'
+        assert self.tight(['TRUE'], db_type='MS') == 'bit'
+        assert self.tight(['2020-01-31', '12/1/20']) == 'date'
+        assert self.tight(['2020-01-31', '2020-01-31T10:11:12.5']) == 'timestamp'
+        assert self.tight(['2020-01-31 10:11 PM'], db_type='MS') == 'datetime2'
+
+        # Not a valid month/day: text, sized to the longest value
+        assert self.tight(['2020-13-01', 'abc']) == 'varchar (10)'
+        assert profile(['abcdef']).sql_type(varchar_length=4, tight=True) == 'varchar (4)'
+
+    def test_profile_dataframe(self):
+        df = pd.DataFrame({'b': [True, False], 'i': [1, 70000], 'f': [1.5, np.nan],
+                           'd': pd.to_datetime(['2020-01-01', '2020-01-02']),
+                           't': pd.to_datetime(['2020-01-01 00:00', '2020-01-02 10:00']), 's': ['12', None]})
+        assert [p.sql_type(tight=True) for p in profile_dataframe(df, workers=2)] == [
+            'boolean', 'int', 'float', 'date', 'timestamp', 'smallint']
+
+    def test_arrow_columns(self):
+        table = pyarrow.table({'i': [1, None, 3], 's': ['a', 'bcd', None]})
+        assert ColumnProfile('i').update(table.column(0)).sql_type(tight=True) == 'smallint'
+        p = ColumnProfile('s').update(table.column(1))
+        assert (p.sql_type(tight=True), p.nulls) == ('varchar (3)', 1)
+
+    def test_profile_csv_workers(self):
+        f = io.StringIO('a,b\n1,x\n2.5,\n')
+        assert [p.sql_type(tight=True) for p in profile_csv(f, chunksize=1, workers=2)] == ['numeric (2, 1)',
+                                                                                           'varchar (1)']
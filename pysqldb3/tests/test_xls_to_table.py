@@ -344,6 +344,78 @@ class TestBulkXLSToTablePG:
         db.drop_table(schema=db.default_schema, table=xls_table_name)
         # os.remove(fp_xlsx)  # TODO: this is failing and i have no idea why...
 
+    def test_bulk_xls_to_table_streaming(self):
+        fp = helpers.DIR + "\\Test_streaming.xlsx"
+
+        if db.table_exists(schema=pg_schema, table=xls_table_name):
+            db.query('drop table {}.{}'.format(pg_schema, xls_table_name))
+
+        raw_df = pd.DataFrame({'id': range(2500),
+                               'speed': [i * 0.5 for i in range(2500)],
+                               'street name': ["it's, \"{}\"".format(i) if i % 7 else None for i in range(2500)],
+                               'crash_time': pd.Timestamp('2020-01-01') + pd.to_timedelta(range(2500), unit='h')})
+        raw_df.to_excel(fp, index=False)
+
+        # Read and staged batch_size rows at a time, with no temp csv
+        db.xls_to_table(input_file=fp, table=xls_table_name, schema=pg_schema, batch_size=1000)
+
+        assert not db.table_exists(schema=pg_schema, table='stg_' + xls_table_name)
+        assert not [f for f in os.listdir(helpers.DIR) if f.startswith('_temp_data_')]
+
+        assert [tuple(c) for c in db.get_table_columns(xls_table_name, schema=pg_schema)] == [
+            ('id', 'bigint'), ('speed', 'double precision'), ('street_name', 'character varying (500)'),
+            ('crash_time', 'timestamp without time zone')]
+
+        sql_df = db.dfquery("select * from {}.{} order by id".format(pg_schema, xls_table_name))
+        raw_df.columns = ['id', 'speed', 'street_name', 'crash_time']
+        pd.testing.assert_frame_equal(sql_df, raw_df, check_dtype=False)
+
+        # Cleanup
+        db.drop_table(schema=pg_schema, table=xls_table_name)
+        os.remove(fp)
+
+    def test_bulk_xls_to_table_checkpoint_resume(self, monkeypatch):
+        fp = helpers.DIR + "\\Test_checkpoint.xlsx"
+        stg_table = 'stg_' + xls_table_name
+
+        if db.table_exists(schema=pg_schema, table=xls_table_name):
+            db.drop_table(schema=pg_schema, table=xls_table_name)
+
+        raw_df = pd.DataFrame({'id': range(2000), 'name': ['n{}'.format(i) for i in range(2000)]})
+        raw_df.to_excel(fp, index=False)
+
+        # Stop the load while it reads its fourth batch
+        update_profiles = pysqldb.update_profiles
+        batches = list()
+
+        def interrupted(profiles, columns):
+            batches.append(len(columns[0]))
+            if len(batches) == 4:
+                raise RuntimeError('connection lost')
+            return update_profiles(profiles, columns)
+
+        monkeypatch.setattr(pysqldb, 'update_profiles', interrupted)
+        db.xls_to_table(input_file=fp, table=xls_table_name, schema=pg_schema, batch_size=500, checkpoint=True)
+        monkeypatch.setattr(pysqldb, 'update_profiles', update_profiles)
+
+        # The staged batches are kept; the table is only created once every row is staged
+        assert not db.table_exists(schema=pg_schema, table=xls_table_name)
+        assert db.dfquery("select count(*) as cnt from {}.{}".format(pg_schema, stg_table)).cnt[0] == 1500
+        progress = db.dfquery("select * from {}.{}_checkpoint".format(pg_schema, stg_table))
+        assert (progress.batch_id[0], progress.rows_read[0]) == (3, 1500)
+
+        # Picks up at row 1500 without staging any batch twice
+        db.xls_to_table(input_file=fp, table=xls_table_name, schema=pg_schema, batch_size=500, checkpoint=True)
+
+        sql_df = db.dfquery("select * from {}.{} order by id".format(pg_schema, xls_table_name))
+        pd.testing.assert_frame_equal(sql_df, raw_df, check_dtype=False)
+        assert not db.table_exists(schema=pg_schema, table=stg_table)
+        assert not db.table_exists(schema=pg_schema, table=stg_table + '_checkpoint')
+
+        # Cleanup
+        db.drop_table(schema=pg_schema, table=xls_table_name)
+        os.remove(fp)
+
     def test_bulk_xls_to_table_input_schema(self):
         # Test input schema
         return
@@ -3,25 +3,24 @@ import decimal
 import re
 import os
 import configparser
+import threading
 import pyarrow
 
 import numpy as np
 import pandas as pd
-from shapely import wkb
 from .Config import write_config
-write_config(confi_path=os.path.dirname(os.path.abspath(__file__)) + "\\config.cfg")
+from .sql import PG_ISOLATED_STATEMENT, MS_ISOLATED_STATEMENT
 
-config = configparser.ConfigParser()
-config.read(os.path.dirname(os.path.abspath(__file__)) + "\\config.cfg")
+CONFIG_PATH = os.path.dirname(os.path.abspath(__file__)) + "\\config.cfg"
 
 POSTGRES_TYPES = ['PG', 'POSTGRESQL', 'POSTGRES']
 SQL_SERVER_TYPES = ['MS', 'SQL', 'MSSQL', 'SQLSERVER']
 AZURE_SERVER_TYPES = ['AZ', 'AZURE', 'SYNAPSE']
 TEMP_LOG_TABLE = '__temp_log_table_{}__'
 
-GDAL_DATA_LOC = config.get('GDAL DATA', 'GDAL_DATA_LOC')
-
-os.environ['GDAL_DATA'] = GDAL_DATA_LOC
+# config.cfg is written (if sections are missing) and parsed on first use, then reused
+_CONFIG = None
+_CONFIG_LOCK = threading.Lock()
 
 UNICODE_REPLACEMENTS = {
     u'\xc4': 'A'
@@ -36,6 +35,59 @@ VARCHAR_MAX = {
 }
 
 
+def get_config():
+    # type: () -> configparser.ConfigParser
+    """
+    Gets the parsed config.cfg, writing any missing sections (ex. ODBC drivers) the first time it is needed
+    :return: ConfigParser
+    """
+    global _CONFIG
+
+    with _CONFIG_LOCK:
+        if _CONFIG is None:
+            write_config(confi_path=CONFIG_PATH)
+            config = configparser.ConfigParser()
+            config.read(CONFIG_PATH)
+            _CONFIG = config
+    return _CONFIG
+
+
+def get_gdal_data_loc(gdal_data_loc=None):
+    # type: (str) -> str
+    """
+    Gets the location of GDAL data and sets GDAL_DATA for ogr2ogr
+    :param gdal_data_loc: location passed by the caller; defaults to GDAL_DATA_LOC in config.cfg
+    :return: str
+    """
+    if gdal_data_loc:
+        return gdal_data_loc
+
+    gdal_data_loc = get_config().get('GDAL DATA', 'GDAL_DATA_LOC')
+    os.environ['GDAL_DATA'] = gdal_data_loc
+    return gdal_data_loc
+
+
+def __getattr__(name):
+    # GDAL_DATA_LOC used to be read from config.cfg at import
+    if name == 'GDAL_DATA_LOC':
+        return get_gdal_data_loc()
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
+def batch_statements(statements, db_type):
+    # type(list, str) -> str
+    """
+    Joins statements into one batch so they are sent in a single round trip. Each statement is wrapped so that if it
+    fails the rest still run.
+    :param statements: list of sql statements (PG statements may be PL/pgSQL blocks)
+    :param db_type: database type (PG, MS)
+    :return: batch query string
+    """
+    template = PG_ISOLATED_STATEMENT if db_type == PG else MS_ISOLATED_STATEMENT
+    bodies = [s.strip() if s.strip().endswith(';') else s.strip() + ';' for s in statements]
+    return '\n'.join(template.format(body=b) for b in bodies)
+
+
 def clean_query_special_characters(query_string):
     # type(str) -> str
     """
@@ -251,22 +303,138 @@ def type_decoder_pyarrow(typ, varchar_length=500):
     else:
         return 'varchar ({})'.format(varchar_length)
 
-def clean_cell(x):
+# psycopg2 type codes are PG type OIDs
+PG_ARROW_TYPES = {
+    16: pyarrow.bool_(),
+    20: pyarrow.int64(),
+    21: pyarrow.int16(),
+    23: pyarrow.int32(),
+    700: pyarrow.float32(),
+    701: pyarrow.float64(),
+    25: pyarrow.string(),
+    1042: pyarrow.string(),
+    1043: pyarrow.string(),
+    1082: pyarrow.date32(),
+    1114: pyarrow.timestamp('us'),
+}
+
+# pymssql only reports STRING/BINARY/NUMBER/DATETIME/DECIMAL
+MS_ARROW_TYPES = {
+    1: pyarrow.string(),
+}
+
+# pyodbc type codes are python types
+AZ_ARROW_TYPES = {
+    bool: pyarrow.bool_(),
+    int: pyarrow.int64(),
+    float: pyarrow.float64(),
+    str: pyarrow.string(),
+    datetime.datetime: pyarrow.timestamp('us'),
+    datetime.date: pyarrow.date32(),
+}
+
+
+def arrow_type_from_type_code(type_code, db_type):
     """
-    Formats csv cells for SQL to add to database
+    Maps a cursor.description type code to a pyarrow type. Returns None when the type should be inferred from the data.
 
-    :param x: Raw csv cell value
-    :return: Formatted csv cell value as python object
+    :param type_code: Type code from cursor.description
+    :param db_type: Type of DB
+    :return: pyarrow DataType or None
+    """
+    if db_type == PG:
+        return PG_ARROW_TYPES.get(type_code)
+    elif db_type == MS:
+        return MS_ARROW_TYPES.get(type_code)
+    elif db_type == AZ:
+        return AZ_ARROW_TYPES.get(type_code)
+    return None
+
+
+def rows_to_arrow_arrays(rows, types):
+    """
+    Transposes one batch of rows into one pyarrow array per column, using the given type where one is known.
+    Falls back to inference if the values do not fit the declared type.
+
+    :param rows: List of row tuples from a single fetch
+    :param types: List of pyarrow types (or None) per column
+    :return: List of pyarrow arrays
+    """
+    arrays = []
+    for values, typ in zip(zip(*rows), types):
+        try:
+            arrays.append(pyarrow.array(values, type=typ))
+        except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError, TypeError, OverflowError):
+            arrays.append(pyarrow.array(values))
+    return arrays
+
+
+def _unify_arrow_chunks(chunks):
+    """
+    Casts per-batch arrays of one column to a single type so they can be combined
+
+    :param chunks: List of pyarrow arrays for one column
+    :return: List of pyarrow arrays with the same type
+    """
+    types = []
+    for c in chunks:
+        if not pyarrow.types.is_null(c.type) and c.type not in types:
+            types.append(c.type)
+
+    if not types:
+        return chunks
+    elif len(types) == 1:
+        candidates = types
+    elif all(pyarrow.types.is_decimal(t) for t in types):
+        scale = max(t.scale for t in types)
+        precision = min(38, max(t.precision - t.scale for t in types) + scale)
+        candidates = [pyarrow.decimal128(precision, scale)]
+    else:
+        candidates = types
+
+    for target in candidates:
+        try:
+            return [c.cast(target) for c in chunks]
+        except (pyarrow.ArrowInvalid, pyarrow.ArrowNotImplementedError):
+            continue
+
+    return [pyarrow.array([None if v is None else str(v) for v in c.to_pylist()], type=pyarrow.string())
+            for c in chunks]
+
+
+def arrow_table_from_chunks(column_chunks, column_names):
+    """
+    Builds a pyarrow Table from per-column lists of batch arrays
+
+    :param column_chunks: List (per column) of lists of pyarrow arrays (per batch)
+    :param column_names: List of column names
+    :return: pyarrow Table
+    """
+    columns = []
+    for chunks in column_chunks:
+        chunks = _unify_arrow_chunks(chunks)
+        if chunks:
+            columns.append(pyarrow.chunked_array(chunks))
+        else:
+            columns.append(pyarrow.chunked_array([], type=pyarrow.null()))
+    return pyarrow.Table.from_arrays(columns, names=column_names)
+
+
+def bulk_cell(x):
+    """
+    Formats a cell as text for bulk loading (COPY / executemany), with the same values clean_cell writes into an
+    INSERT statement
+
+    :param x: Raw cell value
+    :return: Formatted cell value as str, or None for NULL
     """
     if pd.isnull(x):
-        return "None"
+        return None
     elif type(x) == int:
         return str(int(x))
     elif type(x) == decimal.Decimal:
         return str(float(x))
     elif type(x) == str:
-        x = x.replace("'", '-qte-chr-')
-
         # Try to first decode as utf-8; otherwise, try as latin1
         try:
             x = bytes(x, 'utf-8').decode('utf-8')
@@ -285,14 +453,124 @@ def clean_cell(x):
     elif type(x) == datetime.datetime:
         x = x.strftime('%Y-%m-%d %H:%M')
     elif type(x) == pd.Timestamp:
-        x.to_pydatetime()
         x = x.strftime('%Y-%m-%d %H:%M')
 
-    try:
-        return "'" + str(x) + "'"
-    except Exception as e:
-        print(e)
-        return "'" + x + "'"
+    return str(x)
+
+
+def clean_cell(x):
+    """
+    Formats csv cells for SQL to add to database
+
+    :param x: Raw csv cell value
+    :return: Formatted csv cell value as python object
+    """
+    value = bulk_cell(x)
+    if value is None:
+        return "None"
+    elif type(x) in (int, decimal.Decimal):
+        return value
+    elif type(x) == str:
+        value = value.replace("'", '-qte-chr-')
+    return "'" + value + "'"
+
+
+def dataframe_bulk_rows(df):
+    """
+    Yields the rows of a DataFrame as tuples of bulk_cell values
+
+    :param df: Pandas DataFrame
+    :return: generator of tuples
+    """
+    for row in df.itertuples(index=False, name=None):
+        yield tuple(bulk_cell(v) for v in row)
+
+
+# SQL types checked client-side before bulk loading csv text
+BULK_INT_TYPES = ('bigint', 'int', 'integer', 'smallint', 'tinyint')
+BULK_FLOAT_TYPES = ('float', 'double', 'real', 'numeric', 'decimal', 'money')
+BULK_DATE_TYPES = ('timestamp', 'datetime', 'datetime2', 'smalldatetime', 'date')
+BULK_BOOL_TYPES = ('boolean', 'bool', 'bit')
+RE_BULK_CHAR_TYPE = re.compile(r'^(?:n?var)?char(?:acter(?: varying)?)?\s*\((\d+)\)$')
+
+# Column types that hold any staged text, so staging values are never checked against them
+RE_TEXT_TYPE = re.compile(r'^(?:n?(?:var)?char|character|text)\b', re.IGNORECASE)
+# Column types an older Postgres server can check with a regex (others need pg_input_is_valid)
+STAGING_NUMBER_TYPES = ('bigint', 'int', 'integer', 'smallint', 'float', 'double precision', 'real', 'numeric',
+                        'decimal')
+STAGING_DATE_TYPES = ('date', 'timestamp')
+STAGING_BOOLEAN_TYPES = ('boolean', 'bool')
+
+
+def bulk_text_column(values, col_type):
+    """
+    Converts a column of csv text to the text the database reads for col_type (ex. '1.0' for a bigint is sent as '1')
+    and flags the values it would reject. Dates and types not listed above are sent unchanged.
+
+    :param values: pandas Series of str, NaN for missing values
+    :param col_type: SQL data type, as returned by dataframe_to_table_schema
+    :return: (Series of str or None, boolean Series of values that can't be converted)
+    """
+    t = re.sub(r'\s+', ' ', col_type.strip().lower())
+    missing = values.isnull()
+    text = values.astype(object).where(~missing, None)
+    invalid = pd.Series(False, index=values.index)
+
+    if t in BULK_INT_TYPES:
+        stripped = text.str.strip()
+        digits = stripped.str.fullmatch(r'[+-]?\d+').fillna(False).astype(bool)
+        nums = pd.to_numeric(stripped.where(~digits), errors='coerce')
+        whole = nums.notnull() & (nums % 1 == 0)
+        text = stripped.where(digits, nums.where(whole).map(lambda v: str(int(v)) if pd.notnull(v) else None))
+        invalid = ~missing & ~digits & ~whole
+
+    elif t.startswith(BULK_FLOAT_TYPES):
+        stripped = text.str.strip()
+        invalid = ~missing & pd.to_numeric(stripped, errors='coerce').isnull()
+        text = stripped
+
+    elif t.startswith(BULK_DATE_TYPES):
+        # Sent as read so the server parses them (two-digit years, UTC offsets) just as it casts staged values. Only
+        # values that aren't dates at all are flagged; anything else the server rejects fails its batch, which is
+        # staged.
+        try:
+            parsed = pd.to_datetime(text, errors='coerce', format='mixed', utc=True)
+            invalid = ~missing & parsed.isnull()
+        except (TypeError, ValueError, OverflowError):
+            pass
+
+    elif t in BULK_BOOL_TYPES:
+        # Sent as 1/0, which both boolean and bit read
+        flags = text.str.strip().str.lower().map({'true': '1', 't': '1', '1': '1', 'false': '0', 'f': '0', '0': '0'})
+        invalid = ~missing & flags.isnull()
+        text = flags
+
+    elif RE_BULK_CHAR_TYPE.match(t):
+        invalid = ~missing & (text.str.len() > int(RE_BULK_CHAR_TYPE.match(t).group(1)))
+
+    return text.astype(object).where(text.notnull(), None), invalid.astype(bool)
+
+
+def bulk_text_rows(df, column_types):
+    """
+    Splits a chunk of csv text into rows ready for bulk loading and rows with values the database would reject
+
+    :param df: Pandas DataFrame read with dtype=str
+    :param column_types: SQL data types, one per column
+    :return: (list of converted row tuples, list of raw row tuples that can't be converted)
+    """
+    converted, invalid = list(), pd.Series(False, index=df.index)
+    for (_, values), col_type in zip(df.items(), column_types):
+        text, bad = bulk_text_column(values, col_type)
+        converted.append(text.tolist())
+        invalid |= bad
+
+    raw = df.astype(object).where(df.notnull(), None)
+    rows, raw_rows = zip(*converted), raw.itertuples(index=False, name=None)
+    good, failed = list(), list()
+    for row, raw_row, bad in zip(rows, raw_rows, invalid.tolist()):
+        (failed if bad else good).append(raw_row if bad else row)
+    return good, failed
 
 
 def clean_column(x):
@@ -324,6 +602,7 @@ def convert_geom_col(df, geom_name="geom"):
     geom_name: column of geom to be converted, defaulted to "geom"
     """
     if geom_name in df.columns:
+        from shapely import wkb
         df[geom_name] = df[geom_name].apply(lambda x: wkb.loads(x, hex=True).wkt if x else None)
 
     return df